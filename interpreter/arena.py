@@ -0,0 +1,289 @@
+from __future__ import annotations
+from array import array
+
+from interpreter import expr, stmt
+from interpreter.expr import Expr
+from interpreter.lazy_parser import LazyFunction
+from interpreter.quicken import CELL_NODES, UPVALUE_NODES
+from interpreter.stmt import Stmt
+from interpreter.token_ import Token
+from interpreter.token_table import TYPE_OF_CODE
+
+# 扁平的语法树: 所有节点放在几个数组里, 节点之间用下标互相引用, 不再是一棵对象树
+# 和TokenTable一样是struct-of-arrays的布局, 序列化时只有几个数组和两个列表, 不用逐个对象处理
+
+# 节点类, 在数组中用它在这个列表里的下标表示
+NODE_CLASSES: list[type] = [
+    c for module, base in [(expr, Expr), (stmt, Stmt)]
+    for c in vars(module).values()
+    if isinstance(c, type) and issubclass(c, base) and c is not base and c is not LazyFunction
+]
+KIND_OF: dict[type, int] = {c: i for i, c in enumerate(NODE_CLASSES)}
+# 扁平闭包读写Cell和捕获的变量的节点, 只记深度和槽位表示不了, 见Resolver.flatten_closures
+FLAT_CLOSURE_NODES: set[type] = {*CELL_NODES.values(), *UPVALUE_NODES.values()}
+
+# 字段的种类: 子节点, 子节点列表, token, token列表, 常量(Literal的值)
+NODE, NODES, TOKEN, TOKENS, CONSTANT = range(5)
+# 没有子节点(比如没有else分支)
+NONE = -1
+
+
+def _field_kind(annotation: str) -> int:
+    if annotation == 'Token':
+        return TOKEN
+    if annotation == 'list[Token]':
+        return TOKENS
+    if annotation.startswith('list['):
+        return NODES
+    if annotation == 'object':
+        return CONSTANT
+    return NODE
+
+
+# 每种节点的字段: (字段名, 字段种类), 顺序同生成的节点类中的FIELDS
+FIELDS: list[tuple[tuple[str, int], ...]] = [
+    tuple((name, _field_kind(c.__annotations__[name])) for name in c.FIELDS) for c in NODE_CLASSES
+]
+
+
+class Arena:
+    # 每个节点的种类, NODE_CLASSES中的下标
+    kinds: array
+    # 每个节点的第一个操作数在operands中的位置, 每种节点的操作数个数固定, 见FIELDS
+    firsts: array
+    # 操作数: 子节点下标, token下标, 常量下标, 或者列表在items中的位置
+    operands: array
+    # 列表: 长度, 后面跟着各个元素(子节点下标或token下标)
+    items: array
+    # 变量绑定深度, 不是局部变量时为-1, 相当于interpreter.local_map
+    depths: array
+    # 局部变量和局部声明的槽位, 相当于interpreter.slot_map
+    slots: array
+    # Block和函数的作用域有多少个槽位, 相当于interpreter.frame_sizes
+    sizes: array
+    # 节点引用到的token, 同一行上同类型同名的token只存一份
+    tokens: list[Token]
+    # Literal的值
+    constants: list[object]
+    # 顶层语句列表在items中的位置
+    program: int
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.firsts = array('I')
+        self.operands = array('i')
+        self.items = array('i')
+        self.depths = array('i')
+        self.slots = array('i')
+        self.sizes = array('i')
+        self.tokens = []
+        self.constants = []
+        self.program = NONE
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    # 把Parser生成的语法树和Resolver的绑定结果转换成扁平的表示
+    # 只记录深度和槽位, 闭包通过外层的环境读变量, 有闭包的语法树要用flat_closures=False编译,
+    # 否则遇到扁平闭包的节点时抛出ValueError
+    @staticmethod
+    def from_tree(stmts: list[Stmt], local_map: dict[Expr, int], slot_map: dict[object, int] = None,
+                  frame_sizes: dict[Stmt, int] = None) -> 'Arena':
+        return _Builder(local_map, slot_map or {}, frame_sizes or {}).build(stmts)
+
+    # 转换回对象树, 返回语法树和对应的local_map, slot_map, frame_sizes
+    def to_tree(self) -> tuple[list[Stmt], dict[Expr, int], dict[object, int], dict[Stmt, int]]:
+        kinds, firsts, operands, items, depths = self.kinds, self.firsts, self.operands, self.items, self.depths
+        slots, sizes = self.slots, self.sizes
+        tokens, constants = self.tokens, self.constants
+        nodes: list = [None] * len(kinds)
+        local_map = {}
+        slot_map = {}
+        frame_sizes = {}
+
+        def load_list(at: int, pool: list) -> list:
+            return [pool[items[k]] for k in range(at + 1, at + 1 + items[at])]
+
+        # 子节点的下标总是比父节点大, 倒着构造时子节点已经构造好了
+        for i in range(len(kinds) - 1, -1, -1):
+            kind = kinds[i]
+            base = firsts[i]
+            args = []
+            for k, (name, field) in enumerate(FIELDS[kind]):
+                value = operands[base + k]
+                if field == NODE:
+                    args.append(None if value == NONE else nodes[value])
+                elif field == NODES:
+                    args.append(load_list(value, nodes))
+                elif field == TOKEN:
+                    args.append(None if value == NONE else tokens[value])
+                elif field == TOKENS:
+                    args.append(load_list(value, tokens))
+                else:
+                    args.append(constants[value])
+            node = nodes[i] = NODE_CLASSES[kind](*args)
+            if depths[i] != NONE:
+                local_map[node] = depths[i]
+            if slots[i] != NONE:
+                slot_map[node] = slots[i]
+            if sizes[i] != NONE:
+                frame_sizes[node] = sizes[i]
+        return load_list(self.program, nodes), local_map, slot_map, frame_sizes
+
+    # 序列化时token也按列存, 不逐个pickle Token对象
+    def __getstate__(self) -> dict:
+        state = dict(vars(self))
+        tokens = state.pop('tokens')
+        state['token_types'] = array('H', [t.type.value for t in tokens])
+        state['token_lexemes'] = [t.lexeme for t in tokens]
+        state['token_lines'] = array('I', [t.line for t in tokens])
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        types, lexemes, lines = state.pop('token_types'), state.pop('token_lexemes'), state.pop('token_lines')
+        state['tokens'] = [Token(TYPE_OF_CODE[t], lexeme, None, line) for t, lexeme, line in zip(types, lexemes, lines)]
+        vars(self).update(state)
+
+    def node(self, i: int) -> 'NodeView':
+        return NodeView(self, i)
+
+    def statements(self) -> list['NodeView']:
+        return [NodeView(self, i) for i in self.list_at(self.program)]
+
+    # items中at位置的列表
+    def list_at(self, at: int) -> array:
+        return self.items[at + 1:at + 1 + self.items[at]]
+
+
+# 转换时用显式的栈, 嵌套再深也不会超出递归上限
+class _Builder:
+    arena: Arena
+    local_map: dict[Expr, int]
+    slot_map: dict[object, int]
+    frame_sizes: dict[Stmt, int]
+    # token去重
+    token_ids: dict[tuple, int]
+    # 已经分配了下标, 但还没有写入操作数的节点
+    pending: list[tuple[object, int]]
+
+    def __init__(self, local_map, slot_map, frame_sizes):
+        self.arena = Arena()
+        self.local_map = local_map
+        self.slot_map = slot_map
+        self.frame_sizes = frame_sizes
+        self.token_ids = {}
+        self.pending = []
+
+    def build(self, stmts: list[Stmt]) -> Arena:
+        arena = self.arena
+        arena.program = self._list([self._allocate(s) for s in stmts])
+        while self.pending:
+            node, i = self.pending.pop()
+            self._fill(node, i)
+        return arena
+
+    # 先分配下标, 操作数之后再写, 这样父节点写操作数时就知道子节点的下标了
+    def _allocate(self, node) -> int:
+        if node is None:
+            return NONE
+        if isinstance(node, LazyFunction) and not node.loaded:
+            raise ValueError(f"function '{node.name.lexeme}' has not been parsed yet")
+        if type(node) in FLAT_CLOSURE_NODES:
+            raise ValueError('closures compiled with flat_closures=True can not be stored in an arena')
+        arena = self.arena
+        i = len(arena.kinds)
+        # LazyFunction和quicken中的特化节点按父类存
+        kind = KIND_OF.get(type(node))
+        if kind is None:
+            kind = next(KIND_OF[c] for c in type(node).__mro__ if c in KIND_OF)
+        arena.kinds.append(kind)
+        arena.firsts.append(len(arena.operands))
+        arena.operands.extend([NONE] * len(FIELDS[kind]))
+        arena.depths.append(self.local_map.get(node, NONE))
+        arena.slots.append(self.slot_map.get(node, NONE))
+        arena.sizes.append(self.frame_sizes.get(node, NONE))
+        self.pending.append((node, i))
+        return i
+
+    def _fill(self, node, i: int) -> None:
+        arena = self.arena
+        base = arena.firsts[i]
+        for k, (name, field) in enumerate(FIELDS[arena.kinds[i]]):
+            value = getattr(node, name)
+            if field == NODE:
+                operand = self._allocate(value)
+            elif field == NODES:
+                operand = self._list([self._allocate(v) for v in value])
+            elif field == TOKEN:
+                operand = self._token(value)
+            elif field == TOKENS:
+                operand = self._list([self._token(v) for v in value])
+            else:
+                operand = len(arena.constants)
+                arena.constants.append(value)
+            arena.operands[base + k] = operand
+
+    def _list(self, values: list[int]) -> int:
+        items = self.arena.items
+        at = len(items)
+        items.append(len(values))
+        items.extend(values)
+        return at
+
+    def _token(self, token: Token) -> int:
+        if token is None:
+            return NONE
+        key = (token.type, token.lexeme, token.line)
+        i = self.token_ids.get(key)
+        if i is None:
+            i = self.token_ids[key] = len(self.arena.tokens)
+            self.arena.tokens.append(Token(token.type, token.lexeme, None, token.line))
+        return i
+
+
+# 扁平语法树中一个节点的只读视图, 字段访问方式和节点类一样: view.left, view.operator ...
+class NodeView:
+    __slots__ = ('arena', 'index')
+    arena: Arena
+    index: int
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    # 对应的节点类
+    @property
+    def kind(self) -> type:
+        return NODE_CLASSES[self.arena.kinds[self.index]]
+
+    # 变量绑定深度, 不是局部变量时为None
+    @property
+    def depth(self) -> int | None:
+        depth = self.arena.depths[self.index]
+        return None if depth == NONE else depth
+
+    def __getattr__(self, name: str) -> object:
+        arena = self.arena
+        fields = FIELDS[arena.kinds[self.index]]
+        for k, (field_name, field) in enumerate(fields):
+            if field_name == name:
+                value = arena.operands[arena.firsts[self.index] + k]
+                if field == NODE:
+                    return None if value == NONE else NodeView(arena, value)
+                if field == NODES:
+                    return [NodeView(arena, i) for i in arena.list_at(value)]
+                if field == TOKEN:
+                    return None if value == NONE else arena.tokens[value]
+                if field == TOKENS:
+                    return [arena.tokens[i] for i in arena.list_at(value)]
+                return arena.constants[value]
+        raise AttributeError(f"'{self.kind.__name__}' node has no field '{name}'")
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, NodeView) and other.arena is self.arena and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.arena), self.index))
+
+    def __repr__(self):
+        return f'<{self.kind.__name__} #{self.index}>'
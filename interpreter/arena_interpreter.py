@@ -0,0 +1,243 @@
+from array import array
+
+from interpreter.arena import Arena, NODE_CLASSES, NONE
+from interpreter.env import Env
+from interpreter.error import RuntimeException, BreakException, ReturnException
+from interpreter.interpreter_ import Interpreter
+from interpreter.stmt import Function
+from interpreter.token_ import Token, TokenType
+
+
+# 直接在扁平语法树上执行, 语句和表达式都用节点下标表示
+# 按节点种类查表分派, 操作数从arena的数组中读, 运算规则复用Interpreter
+class ArenaInterpreter(Interpreter):
+    arena: Arena
+    # arena中的数组, 直接放在解释器上, 少一次属性访问
+    kinds: array
+    firsts: array
+    operands: array
+    depths: array
+    slots: array
+    sizes: array
+    tokens: list[Token]
+    constants: list[object]
+    # 节点种类 -> 执行函数
+    dispatch: list
+    # 函数节点下标 -> 函数声明, body中是语句下标, 给LoxFunction用
+    functions: dict[int, Function]
+
+    def __init__(self):
+        super().__init__()
+        self.arena = None
+        self.kinds = self.firsts = self.operands = self.depths = self.slots = self.sizes = None
+        self.tokens = self.constants = None
+        self.dispatch = [getattr(self, '_run_' + c.__name__.lower()) for c in NODE_CLASSES]
+        self.functions = {}
+
+    def interpret_arena(self, arena: Arena) -> None:
+        self.arena = arena
+        self.kinds, self.firsts, self.operands, self.depths = arena.kinds, arena.firsts, arena.operands, arena.depths
+        self.slots, self.sizes = arena.slots, arena.sizes
+        self.tokens, self.constants = arena.tokens, arena.constants
+        self.functions = {}
+        self.interpret(list(arena.list_at(arena.program)))
+
+    def execute(self, i: int) -> None:
+        self.dispatch[self.kinds[i]](i)
+
+    def evaluate(self, i: int) -> object:
+        return self.dispatch[self.kinds[i]](i)
+
+    # 第k个操作数
+    def _operand(self, i: int, k: int) -> int:
+        return self.operands[self.firsts[i] + k]
+
+    def _token(self, i: int, k: int) -> Token:
+        return self.tokens[self.operands[self.firsts[i] + k]]
+
+    def _lookup_at(self, i: int, name: Token) -> object:
+        depth = self.depths[i]
+        if depth != NONE:
+            return self.env.get_at(depth, self.slots[i])
+        return self.outermost.get(name)
+
+    # 声明节点i定义的变量, 同Interpreter._define
+    def _define_at(self, i: int, name: Token, value: object) -> None:
+        slot = self.slots[i]
+        if slot == NONE:
+            self.env.define(name.lexeme, value)
+        else:
+            self.env.values[slot] = value
+
+    def _function(self, i: int) -> Function:
+        function = self.functions.get(i)
+        if function is None:
+            first = self.firsts[i]
+            name, params, body = self.operands[first:first + 3]
+            tokens = self.tokens
+            function = Function(tokens[name], [tokens[t] for t in self.arena.list_at(params)],
+                                list(self.arena.list_at(body)))
+            self.functions[i] = function
+            self.frame_sizes[function] = self.sizes[i]
+        return function
+
+    # 语句
+
+    # 没有大小的Block和外层共用帧
+    def _run_block(self, i: int) -> None:
+        stmts = self.arena.list_at(self._operand(i, 0))
+        if self.sizes[i] == NONE:
+            for stmt in stmts:
+                self.execute(stmt)
+        else:
+            self.execute_block(stmts, Env(self.env, self.sizes[i]))
+
+    def _run_class(self, i: int) -> None:
+        from interpreter.callable import LoxClass, LoxFunction
+        first = self.firsts[i]
+        name, super_node, methods_at = self.operands[first:first + 3]
+        name = self.tokens[name]
+        self._define_at(i, name, None)
+
+        super_class = None
+        if super_node != NONE:
+            super_class = self.evaluate(super_node)
+            if not isinstance(super_class, LoxClass):
+                raise RuntimeException(self._token(super_node, 0), 'super class must be a class')
+            self.env = Env(self.env, 1)
+            self.env.values[0] = super_class
+
+        methods = {}
+        for m in self.arena.list_at(methods_at):
+            declaration = self._function(m)
+            methods[declaration.name.lexeme] = LoxFunction(declaration, self.env, declaration.name.lexeme == 'init')
+
+        klass = LoxClass(name.lexeme, super_class, methods)
+        if super_node != NONE:
+            self.env = self.env.parent
+        self._define_at(i, name, klass)
+
+    def _run_expression(self, i: int) -> None:
+        self.evaluate(self.operands[self.firsts[i]])
+
+    def _run_function(self, i: int) -> None:
+        from interpreter.callable import LoxFunction
+        declaration = self._function(i)
+        self._define_at(i, declaration.name, LoxFunction(declaration, self.env, False))
+
+    def _run_break(self, i: int) -> None:
+        raise BreakException()
+
+    def _run_continue(self, i: int) -> None:
+        pass
+
+    def _run_if(self, i: int) -> None:
+        first = self.firsts[i]
+        condition, then_branch, else_branch = self.operands[first:first + 3]
+        if self._is_true(self.evaluate(condition)):
+            self.execute(then_branch)
+        elif else_branch != NONE:
+            self.execute(else_branch)
+
+    def _run_print(self, i: int) -> None:
+        print(self.stringify(self.evaluate(self.operands[self.firsts[i]])))
+
+    def _run_while(self, i: int) -> None:
+        first = self.firsts[i]
+        condition, body = self.operands[first:first + 2]
+        while self._is_true(self.evaluate(condition)):
+            try:
+                self.execute(body)
+            except BreakException:
+                break
+
+    def _run_return(self, i: int) -> None:
+        value = self.operands[self.firsts[i] + 1]
+        raise ReturnException(None if value == NONE else self.evaluate(value))
+
+    def _run_var(self, i: int) -> None:
+        first = self.firsts[i]
+        name, initializer = self.operands[first:first + 2]
+        value = None if initializer == NONE else self.evaluate(initializer)
+        self._define_at(i, self.tokens[name], value)
+
+    # 表达式
+
+    def _run_assign(self, i: int) -> object:
+        first = self.firsts[i]
+        name, value = self.operands[first:first + 2]
+        name = self.tokens[name]
+        value = self.evaluate(value)
+        depth = self.depths[i]
+        if depth != NONE:
+            self.env.assign_at(depth, self.slots[i], value)
+        else:
+            self.outermost.assign(name, value)
+        return value
+
+    def _run_binary(self, i: int) -> object:
+        first = self.firsts[i]
+        left, operator, right = self.operands[first:first + 3]
+        return self._binary(self.tokens[operator], self.evaluate(left), self.evaluate(right))
+
+    def _run_call(self, i: int) -> object:
+        first = self.firsts[i]
+        callee, paren, args_at = self.operands[first:first + 3]
+        callee = self.evaluate(callee)
+        args = [self.evaluate(a) for a in self.arena.list_at(args_at)]
+        return self._call(callee, self.tokens[paren], args)
+
+    def _run_get(self, i: int) -> object:
+        from interpreter.callable import LoxInstance
+        obj = self.evaluate(self._operand(i, 0))
+        name = self._token(i, 1)
+        if not isinstance(obj, LoxInstance):
+            raise RuntimeException(name, 'only instance have properties')
+        return obj.get(name)
+
+    def _run_super(self, i: int) -> object:
+        depth = self.depths[i]
+        super_class = self.env.get_at(depth, 0)
+        obj = self.env.get_at(depth - 1, 0)
+        method = super_class.find_method(self._token(i, 1).lexeme)
+        return method.bind(obj)
+
+    def _run_set(self, i: int) -> object:
+        from interpreter.callable import LoxInstance
+        first = self.firsts[i]
+        obj, name, value = self.operands[first:first + 3]
+        obj = self.evaluate(obj)
+        name = self.tokens[name]
+        if not isinstance(obj, LoxInstance):
+            raise RuntimeException(name, 'only instance have fields')
+        value = self.evaluate(value)
+        obj.set(name, value)
+        return value
+
+    def _run_grouping(self, i: int) -> object:
+        return self.evaluate(self.operands[self.firsts[i]])
+
+    def _run_literal(self, i: int) -> object:
+        return self.constants[self.operands[self.firsts[i]]]
+
+    def _run_logical(self, i: int) -> object:
+        first = self.firsts[i]
+        left, operator, right = self.operands[first:first + 3]
+        left = self.evaluate(left)
+        if self.tokens[operator].type == TokenType.OR:
+            if self._is_true(left):
+                return left
+        elif not self._is_true(left):
+            return left
+        return self.evaluate(right)
+
+    def _run_this(self, i: int) -> object:
+        return self._lookup_at(i, self._token(i, 0))
+
+    def _run_unary(self, i: int) -> object:
+        first = self.firsts[i]
+        operator, right = self.operands[first:first + 2]
+        return self._unary(self.tokens[operator], self.evaluate(right))
+
+    def _run_variable(self, i: int) -> object:
+        return self._lookup_at(i, self._token(i, 0))
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import copyreg
+import gc
+import hashlib
+import io
+import operator
+import os
+import pickle
+import struct
+import zlib
+from contextlib import contextmanager
+from typing import Callable
+
+from interpreter import expr, stmt
+from interpreter.expr import Expr
+from interpreter.stmt import Stmt
+from interpreter.token_ import Token
+
+# 类似__pycache__: 把解析和变量绑定的结果存到磁盘上, 源码没变时直接加载, 不用再跑一遍前端
+# 缓存文件 = 文件头 + 压缩后的pickle(语法树, 绑定结果), 绑定结果见Interpreter.bindings
+# 和.pyc一样, 缓存目录要和脚本本身一样可信
+
+# 文件头: 魔数, 版本号, 源码的sha256
+MAGIC = b'LOXC'
+# 语法树节点的定义或者前端的行为变了就要加一, 旧的缓存自然失效
+VERSION = 6
+HEADER = struct.Struct('<4sH32s')
+CACHE_DIR = '__loxcache__'
+
+
+# 节点按构造参数序列化, 不保存每个对象的属性名, 文件小, 加载时直接调用构造函数
+# 生成的节点类和Token的字段注解顺序就是构造参数的顺序
+def _make_reducer(cls: type) -> Callable:
+    names = list(cls.__annotations__)
+    getter = operator.attrgetter(*names)
+    if len(names) == 1:
+        return lambda node: (cls, (getter(node),))
+    return lambda node: (cls, getter(node))
+
+
+def _node_classes() -> list[type]:
+    classes = [Token]
+    for module, base in [(expr, Expr), (stmt, Stmt)]:
+        classes += [c for c in vars(module).values()
+                    if isinstance(c, type) and issubclass(c, base) and c is not base]
+    return classes
+
+
+DISPATCH_TABLE = copyreg.dispatch_table.copy()
+DISPATCH_TABLE.update({c: _make_reducer(c) for c in _node_classes()})
+
+
+# 一次创建/遍历几十万个节点时, 分代gc会反复扫描已有的节点, 比序列化本身还慢
+@contextmanager
+def _gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# 默认放在脚本旁边的__loxcache__目录中
+def cache_path(path: str, cache_dir: str = None) -> str:
+    directory, name = os.path.split(os.path.abspath(path))
+    if cache_dir is None:
+        cache_dir = os.path.join(directory, CACHE_DIR)
+    return os.path.join(cache_dir, f'{name}.v{VERSION}.astc')
+
+
+# 缓存不存在, 版本不对, 或者源码变了, 都返回None
+def load(path: str, source: bytes, cache_dir: str = None) -> tuple[list[Stmt], dict] | None:
+    try:
+        with open(cache_path(path, cache_dir), 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, digest = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or digest != hashlib.sha256(source).digest():
+        return None
+    try:
+        with _gc_paused():
+            return pickle.loads(zlib.decompress(memoryview(data)[HEADER.size:]))
+    except Exception:
+        # 损坏的缓存当作没有缓存
+        return None
+
+
+# 写缓存失败不影响运行, 返回是否写成功
+# bindings: interpreter.bindings()
+def dump(path: str, source: bytes, stmts: list[Stmt], bindings: dict, cache_dir: str = None) -> bool:
+    target = cache_path(path, cache_dir)
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = DISPATCH_TABLE
+    try:
+        # 绑定结果的key是语法树中的节点, 和语法树一起序列化才能保持对应关系
+        with _gc_paused():
+            pickler.dump((stmts, bindings))
+    except RecursionError:
+        return False
+    payload = zlib.compress(buffer.getbuffer(), 1)
+    header = HEADER.pack(MAGIC, VERSION, hashlib.sha256(source).digest())
+    tmp = f'{target}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(header)
+            f.write(payload)
+        # 先写临时文件再改名, 其他进程不会读到写了一半的缓存
+        os.replace(tmp, target)
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,29 @@
+from __future__ import annotations
+from typing import Iterator
+
+from interpreter.expr import Expr
+from interpreter.stmt import Stmt
+
+
+# 节点的直接子节点, 列表字段展开成其中的节点, Token和None等不是节点的字段跳过
+def children(node: Expr | Stmt) -> list[Expr | Stmt]:
+    result = []
+    for name in type(node).FIELDS:
+        value = getattr(node, name)
+        if isinstance(value, (Expr, Stmt)):
+            result.append(value)
+        elif isinstance(value, list):
+            result.extend(v for v in value if isinstance(v, (Expr, Stmt)))
+    return result
+
+
+# 遍历语法树中的所有节点, 用显式的栈, 嵌套再深也不会超出递归上限
+def walk(nodes: list) -> Iterator[Expr | Stmt]:
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, (Expr, Stmt)):
+            yield node
+            stack.extend(children(node))
@@ -0,0 +1,81 @@
+import gc
+import io
+import pickle
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from interpreter.arena import Arena
+from interpreter.arena_interpreter import ArenaInterpreter
+from interpreter.ast_cache import DISPATCH_TABLE
+from interpreter.benchmark.workloads import large_program
+from interpreter.interpreter_ import Interpreter
+from interpreter.lox import Lox
+
+FIB_SOURCE = """
+fun fib(n) {
+    if (n <= 1) return n;
+    return fib(n - 2) + fib(n - 1);
+}
+print fib(20);
+"""
+
+
+def timed(fn) -> tuple[float, object]:
+    begin = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - begin, result
+
+
+def dumps_tree(tree) -> bytes:
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = DISPATCH_TABLE
+    pickler.dump(tree)
+    return buffer.getvalue()
+
+
+# 反序列化后的结构占用的内存
+def loaded_size(data: bytes) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = pickle.loads(data)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def serialize(source: str) -> None:
+    stmts, interpreter = Lox.compile(source, flat_closures=False)
+    bindings = (interpreter.local_map, interpreter.slot_map, interpreter.frame_sizes)
+    tree = (stmts, *bindings)
+    seconds, arena = timed(lambda: Arena.from_tree(stmts, *bindings))
+    print(f'{len(arena)} nodes, convert {seconds:.3f}s')
+    for name, dumps in [('tree', lambda: dumps_tree(tree)), ('arena', lambda: pickle.dumps(arena, 5))]:
+        dump_seconds, data = timed(dumps)
+        load_seconds, _ = timed(lambda: pickle.loads(data))
+        print(f'{name:>6}: {len(data) / 1024 / 1024:.2f} MiB pickled, dump {dump_seconds:.3f}s, '
+              f'load {load_seconds:.3f}s, {loaded_size(data) / 1024 / 1024:.2f} MiB in memory')
+
+
+def execute(source: str) -> None:
+    stmts, interpreter = Lox.compile(source, flat_closures=False)
+    arena = Arena.from_tree(stmts, interpreter.local_map, interpreter.slot_map, interpreter.frame_sizes)
+
+    def run_tree():
+        tree_interpreter = Interpreter()
+        tree_interpreter.local_map = interpreter.local_map
+        tree_interpreter.slot_map = interpreter.slot_map
+        tree_interpreter.frame_sizes = interpreter.frame_sizes
+        tree_interpreter.interpret(stmts)
+
+    for name, run in [('tree', run_tree), ('arena', lambda: ArenaInterpreter().interpret_arena(arena))]:
+        with redirect_stdout(io.StringIO()):
+            seconds, _ = timed(run)
+        print(f'{name:>6}: fib(20) {seconds:.3f}s')
+
+
+if __name__ == '__main__':
+    serialize(large_program(2000))
+    execute(FIB_SOURCE)
@@ -0,0 +1,28 @@
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from interpreter import ast_cache
+from interpreter.benchmark.workloads import library_program
+from interpreter.lox import Lox
+
+
+def run(path: str, **kwargs) -> float:
+    begin = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        Lox.run_file(path, 'regex', **kwargs)
+    return time.perf_counter() - begin
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'library.lox')
+        with open(path, 'w') as f:
+            f.write(library_program(3000))
+        print(f'source: {os.path.getsize(path) / 1024 / 1024:.2f} MiB')
+        print(f'  no cache: {run(path):.3f}s')
+        print(f'      cold: {run(path, cache=True):.3f}s')
+        print(f'      warm: {run(path, cache=True):.3f}s')
+        print(f'cache file: {os.path.getsize(ast_cache.cache_path(path)) / 1024 / 1024:.2f} MiB')
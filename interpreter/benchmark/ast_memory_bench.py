@@ -0,0 +1,47 @@
+import gc
+import tracemalloc
+
+from interpreter.benchmark.workloads import large_program
+from interpreter.compact_ast import compact_tokens
+from interpreter.expr import Expr
+from interpreter.interpreter_ import Interpreter
+from interpreter.parser import Parser
+from interpreter.resolver import Resolver
+from interpreter.scanner import Scanner
+from interpreter.stmt import Stmt
+
+
+def count_nodes(stmts: list[Stmt]) -> int:
+    count = 0
+    stack = list(stmts)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, (Expr, Stmt)):
+            count += 1
+            stack.extend(getattr(node, name) for name in type(node).__annotations__)
+    return count
+
+
+# 扫描, 解析, 绑定之后, token列表已经释放, 统计语法树(连同节点引用的token)还占用的字节数
+def measure(source: str, compact: bool) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    stmts = Parser(Scanner(source).iter_tokens()).parse()
+    Resolver(Interpreter()).resolve(stmts)
+    if compact:
+        compact_tokens(stmts)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # 解释器和local_map已经释放, 剩下的就是语法树
+    return size, count_nodes(stmts)
+
+
+if __name__ == '__main__':
+    source = large_program(1000)
+    print(f'source: {len(source)} chars')
+    for name, compact in [('tokens', False), ('compact', True)]:
+        size, count = measure(source, compact)
+        print(f'{name:>8}: {size / 1024 / 1024:.2f} MiB for {count} nodes, {size / count:.1f} bytes/node')
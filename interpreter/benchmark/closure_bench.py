@@ -0,0 +1,93 @@
+import io
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 闭包读写外层函数的变量: 计数器, 和隔着两层函数的累加
+ACCESS_SOURCE = """
+fun makeCounter() {
+  var count = 0;
+  fun counter() {
+    count = count + 1;
+    return count;
+  }
+  return counter;
+}
+var counter = makeCounter();
+for (var j = 0; j < 20000; j = j + 1) {
+  counter();
+}
+print counter();
+
+fun outer() {
+  var total = 0;
+  fun middle() {
+    fun inner(n) {
+      for (var i = 0; i < n; i = i + 1) {
+        total = total + i;
+      }
+      return total;
+    }
+    return inner;
+  }
+  return middle();
+}
+print outer()(30000);
+"""
+
+# 留下很多小闭包, 每个只用到一个变量, 创建它的函数中还有一个很长的字符串
+RETAIN_SOURCE = """
+class Link {
+  init(counter, next) {
+    this.counter = counter;
+    this.next = next;
+  }
+}
+fun makeCounter(n) {
+  var text = "counter";
+  for (var i = 0; i < 6; i = i + 1) {
+    text = text + text;
+  }
+  var count = n;
+  fun counter() {
+    count = count + 1;
+    return count;
+  }
+  return counter;
+}
+var head = nil;
+for (var k = 0; k < 3000; k = k + 1) {
+  head = Link(makeCounter(k), head);
+}
+print head.counter();
+"""
+
+
+def bench(source: str, flat_closures: bool) -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        Lox.run(source, flat_closures=flat_closures)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+# 执行结束后闭包还占着多少内存, 不含语法树
+def retained(source: str, flat_closures: bool) -> int:
+    stmts, interpreter = Lox.compile(source, flat_closures=flat_closures)
+    tracemalloc.start()
+    with redirect_stdout(io.StringIO()):
+        interpreter.interpret(stmts)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+if __name__ == '__main__':
+    for flat_closures in [False, True]:
+        seconds, out = min(bench(ACCESS_SOURCE, flat_closures) for _ in range(5))
+        print(f'access flat_closures={flat_closures}: {seconds:.3f}s, output {out.split()}')
+    for flat_closures in [False, True]:
+        size = retained(RETAIN_SOURCE, flat_closures)
+        print(f'retain flat_closures={flat_closures}: {size / 1024:.0f} KiB')
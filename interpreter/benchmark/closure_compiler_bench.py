@@ -0,0 +1,59 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.benchmark.closure_bench import ACCESS_SOURCE
+from interpreter.benchmark.frame_bench import LOOP_SOURCE
+from interpreter.benchmark.quicken_bench import FIB_SOURCE
+from interpreter.closure_compiler import ClosureCompiler
+from interpreter.lox import Lox
+
+# 方法调用, 属性读写, 继承
+CLASS_SOURCE = """
+class Vector {
+  init(x, y) {
+    this.x = x;
+    this.y = y;
+  }
+  add(other) {
+    return Vector(this.x + other.x, this.y + other.y);
+  }
+}
+class Scaled < Vector {
+  add(other) {
+    var sum = super.add(other);
+    sum.x = sum.x * 0.5;
+    return sum;
+  }
+}
+var v = Scaled(0, 0);
+var step = Vector(1, 2);
+for (var i = 0; i < 10000; i = i + 1) {
+  v = Scaled(v.x, v.y).add(step);
+}
+print v.x;
+print v.y;
+"""
+
+SOURCES = [('fib', FIB_SOURCE), ('loop', LOOP_SOURCE), ('closure', ACCESS_SOURCE), ('class', CLASS_SOURCE)]
+
+
+# 只计执行的时间, 闭包编译的时间也算在内
+def bench(source: str, backend: str, infer: bool = False) -> tuple[float, str]:
+    stmts, interpreter = Lox.compile(source, infer=infer)
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        if backend == 'closures':
+            ClosureCompiler(interpreter).run(stmts)
+        else:
+            interpreter.interpret(stmts)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    for name, source in SOURCES:
+        for infer in [False, True]:
+            for backend in ['visitor', 'closures']:
+                seconds, out = min(bench(source, backend, infer) for _ in range(5))
+                print(f'{name} infer={infer!s:>5} {backend:>8}: {seconds:.3f}s, output {out.split()}')
@@ -0,0 +1,45 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 嵌套的计数循环做数值计算
+NESTED_SOURCE = """
+fun matmul(n) {
+    var sum = 0;
+    for (var i = 0; i < n; i = i + 1) {
+        for (var j = 0; j < n; j = j + 1) {
+            for (var k = 0; k < n; k = k + 1) {
+                sum = sum + (i + k) * (k - j);
+            }
+        }
+    }
+    return sum;
+}
+
+var total = 0;
+for (var y = 0; y < 200; y = y + 1) {
+    for (var x = 0; x < 200; x = x + 1) {
+        total = total + x * y;
+    }
+}
+print total;
+print matmul(30);
+"""
+
+
+def bench(fast_loops: bool) -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        stmts, interpreter = Lox.compile(NESTED_SOURCE)
+        interpreter.fast_loops = fast_loops
+        interpreter.interpret(stmts)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    for fast_loops in (False, True):
+        seconds, out = bench(fast_loops)
+        print(f'fast_loops={fast_loops!s:>5}: {seconds:.3f}s, output {out.split()}')
@@ -0,0 +1,47 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 大量调用顶层函数和类
+CALL_SOURCE = """
+fun fib(n) {
+  if (n < 2) return n;
+  return fib(n - 1) + fib(n - 2);
+}
+
+fun max(a, b) {
+  if (a > b) return a;
+  return b;
+}
+
+class Pair {
+  init(a, b) {
+    this.a = a;
+    this.b = b;
+  }
+}
+
+print fib(20);
+var best = 0;
+for (var i = 0; i < 20000; i = i + 1) {
+  var p = Pair(i, 20000 - i);
+  best = max(best, max(p.a, p.b));
+}
+print best;
+"""
+
+
+def bench(direct_calls: bool) -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        Lox.run(CALL_SOURCE, direct_calls=direct_calls)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    for direct_calls in (False, True):
+        seconds, out = bench(direct_calls)
+        print(f'direct_calls={direct_calls!s:>5}: {seconds:.3f}s, output {out.split()}')
@@ -0,0 +1,54 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 读写各层局部变量的循环, 和读写外层变量的闭包
+ENV_SOURCE = """
+fun sum(n) {
+  var total = 0;
+  var a = 1;
+  var b = 2;
+  var i = 0;
+  while (i < n) {
+    var c = a + b;
+    {
+      var d = c * 2;
+      total = total + d - a - b;
+    }
+    i = i + 1;
+  }
+  return total;
+}
+print sum(30000);
+
+fun makeCounter() {
+  var count = 0;
+  var step = 1;
+  fun counter() {
+    count = count + step;
+    return count;
+  }
+  return counter;
+}
+var counter = makeCounter();
+var last = 0;
+for (var k = 0; k < 30000; k = k + 1) {
+  last = counter();
+}
+print last;
+"""
+
+
+def bench() -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        Lox.run(ENV_SOURCE)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    seconds, out = min(bench() for _ in range(3))
+    print(f'{seconds:.3f}s, output {out.split()}')
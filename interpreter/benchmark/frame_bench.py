@@ -0,0 +1,78 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.env import Env
+from interpreter.lox import Lox
+
+# 循环体中有多层Block的循环, 循环中不是计数循环, 也不在函数中
+LOOP_SOURCE = """
+var total = 0;
+for (var i = 0; i < 20000; i = i + 1) {
+  var a = i * 2;
+  {
+    var b = a + 1;
+    if (b > 10) {
+      var c = b - 10;
+      total = total + c;
+    }
+  }
+}
+print total;
+"""
+
+# 递归调用和循环中的调用, 函数中都没有闭包
+CALL_SOURCE = """
+fun fib(n) {
+  if (n < 2) return n;
+  return fib(n - 1) + fib(n - 2);
+}
+print fib(18);
+
+fun add(a, b) {
+  var sum = a + b;
+  return sum;
+}
+var acc = 0;
+var j = 0;
+while (j < 20000) {
+  acc = add(acc, j);
+  j = j + 1;
+}
+print acc;
+"""
+
+
+# 执行过程中创建了多少个Env
+def count_frames(source: str, share_frames: bool) -> int:
+    init = Env.__init__
+    count = 0
+
+    def counting_init(env, parent=None, size=0):
+        nonlocal count
+        count += 1
+        init(env, parent, size)
+
+    Env.__init__ = counting_init
+    try:
+        with redirect_stdout(io.StringIO()):
+            Lox.run(source, share_frames=share_frames)
+    finally:
+        Env.__init__ = init
+    return count
+
+
+def bench(source: str, share_frames: bool) -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        Lox.run(source, share_frames=share_frames)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    for name, source in [('loop', LOOP_SOURCE), ('call', CALL_SOURCE)]:
+        for share_frames in [False, True]:
+            seconds, out = min(bench(source, share_frames) for _ in range(3))
+            frames = count_frames(source, share_frames)
+            print(f'{name} share_frames={share_frames}: {seconds:.3f}s, {frames} frames, output {out.split()}')
@@ -0,0 +1,44 @@
+import time
+
+from interpreter.benchmark.workloads import large_program
+from interpreter.fused_parser import FusedParser
+from interpreter.interpreter_ import Interpreter
+from interpreter.parser import Parser
+from interpreter.pratt_parser import PrattParser
+from interpreter.resolver import Resolver
+from interpreter.scanner import Scanner
+
+
+# 解析 + 变量绑定, 先解析再遍历一遍语法树
+def two_pass(parser_class, tokens: list) -> None:
+    interpreter = Interpreter()
+    stmts = parser_class(tokens).parse()
+    Resolver(interpreter).resolve(stmts)
+
+
+# 解析的同时完成绑定
+def fused(tokens: list) -> None:
+    parser = FusedParser(tokens, Interpreter())
+    parser.parse()
+    parser.report_resolve_errors()
+
+
+def bench(fn, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+if __name__ == '__main__':
+    tokens = Scanner(large_program(2000)).scan_tokens()
+    print(f'{len(tokens)} tokens')
+    cases = {
+        'Parser + Resolver': lambda: two_pass(Parser, tokens),
+        'PrattParser + Resolver': lambda: two_pass(PrattParser, tokens),
+        'FusedParser': lambda: fused(tokens),
+    }
+    for name, fn in cases.items():
+        print(f'{name:>22}: {bench(fn):.3f}s')
@@ -0,0 +1,41 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 顶层脚本: 全局变量的循环, 全局函数读写全局变量
+GLOBAL_SOURCE = """
+var total = 0;
+var step = 3;
+var i = 0;
+while (i < 40000) {
+  total = total + step * i - total / 2;
+  i = i + 1;
+}
+print total;
+
+var hits = 0;
+fun hit(n) {
+  hits = hits + n;
+}
+var j = 0;
+while (j < 20000) {
+  hit(j);
+  j = j + 1;
+}
+print hits;
+"""
+
+
+def bench() -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        Lox.run(GLOBAL_SOURCE)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    seconds, out = min(bench() for _ in range(3))
+    print(f'{seconds:.3f}s, output {out.split()}')
@@ -0,0 +1,41 @@
+import time
+
+from interpreter.benchmark.workloads import large_program
+from interpreter.incremental import Document, LocalCollector
+from interpreter.parser import Parser
+from interpreter.resolver import Resolver
+from interpreter.scanner import Scanner
+
+
+def full(source: str) -> None:
+    stmts = Parser(Scanner(source).iter_tokens()).parse()
+    Resolver(LocalCollector()).resolve(stmts)
+
+
+if __name__ == '__main__':
+    for units in [100, 1000, 5000]:
+        source = large_program(units)
+        doc = Document(source)
+        # 在中间某个函数体里改一个运算符, 再改回来
+        pos = source.index('return a - b / 2.5', len(source) // 2) + len('return a ')
+
+        begin = time.perf_counter()
+        full(source)
+        full_cost = time.perf_counter() - begin
+
+        edits = 50
+        begin = time.perf_counter()
+        for i in range(edits):
+            doc.edit(pos, pos + 1, '+' if i % 2 == 0 else '-')
+        edit_cost = (time.perf_counter() - begin) / edits
+
+        begin = time.perf_counter()
+        for i in range(edits):
+            if i % 2 == 0:
+                doc.edit(pos, pos, '\n')
+            else:
+                doc.edit(pos, pos + 1, '')
+        newline_cost = (time.perf_counter() - begin) / edits
+
+        print(f'{len(source):>9} chars: full {full_cost * 1000:8.2f}ms, '
+              f'edit {edit_cost * 1000:6.2f}ms, edit with newline {newline_cost * 1000:6.2f}ms')
@@ -0,0 +1,46 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 大量调用只有一句return的小函数
+HELPER_SOURCE = """
+fun square(x) { return x * x; }
+fun add(a, b) { return a + b; }
+fun lerp(a, b, t) { return a + (b - a) * t; }
+fun getX(p) { return p.x; }
+fun isEven(n) { return n - 2 * (n / 2) == 0; }
+
+class Point {
+    init(x) { this.x = x; }
+}
+
+var origin = Point(3);
+var total = 0;
+for (var i = 0; i < 30000; i = i + 1) {
+    total = add(total, square(i) - lerp(0, i, 0.5));
+    total = add(total, getX(origin));
+    if (isEven(i)) total = add(total, 1);
+}
+print total;
+"""
+
+
+def bench(**options) -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        Lox.run(HELPER_SOURCE, **options)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    cases = {
+        'plain': {},
+        'inline': {'inline': True},
+        'inline + optimize': {'inline': True, 'optimize': True},
+    }
+    for name, options in cases.items():
+        seconds, out = bench(**options)
+        print(f'{name:>17}: {seconds:.3f}s, output {out.strip()}')
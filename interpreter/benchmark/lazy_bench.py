@@ -0,0 +1,30 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.benchmark.workloads import library_program
+from interpreter.interpreter_ import Interpreter
+from interpreter.lazy_parser import LazyParser
+from interpreter.parser import Parser
+from interpreter.regex_scanner import RegexScanner
+from interpreter.resolver import Resolver
+
+
+# 从拿到源码到开始执行第一条语句的时间(扫描+解析+变量绑定), 以及整个程序跑完的时间
+def bench(parser_class, source: str) -> tuple[float, float]:
+    begin = time.perf_counter()
+    stmts = parser_class(RegexScanner(source).iter_tokens()).parse()
+    interpreter = Interpreter()
+    Resolver(interpreter).resolve(stmts)
+    first = time.perf_counter() - begin
+    with redirect_stdout(io.StringIO()):
+        interpreter.interpret(stmts)
+    return first, time.perf_counter() - begin
+
+
+if __name__ == '__main__':
+    source = library_program(5000)
+    print(f'source: {len(source.encode()) / 1024 / 1024:.2f} MiB, 15000 functions/methods, 3 called')
+    for parser_class in [Parser, LazyParser]:
+        first, total = bench(parser_class, source)
+        print(f'{parser_class.__name__:>10}: first statement after {first:.3f}s, total {total:.3f}s')
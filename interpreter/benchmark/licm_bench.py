@@ -0,0 +1,44 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 循环中反复计算不变的表达式: 循环上界, 读属性, 外层循环变量参与的运算
+LOOP_SOURCE = """
+class Grid {
+    init(width, height) {
+        this.width = width;
+        this.height = height;
+    }
+}
+
+var grid = Grid(300, 200);
+var scale = 3;
+var total = 0;
+for (var y = 0; y < grid.height; y = y + 1) {
+    for (var x = 0; x < grid.width * 1; x = x + 1) {
+        total = total + x * (grid.width / scale) + y * grid.width * scale;
+    }
+}
+print total;
+"""
+
+
+def bench(**options) -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        Lox.run(LOOP_SOURCE, **options)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    cases = {
+        'plain': {},
+        'optimize': {'optimize': True},
+        'optimize + hoist': {'optimize': True, 'hoist': True},
+    }
+    for name, options in cases.items():
+        seconds, out = bench(**options)
+        print(f'{name:>16}: {seconds:.3f}s, output {out.strip()}')
@@ -0,0 +1,40 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 指数级重复计算的递归函数
+MEMO_SOURCE = """
+fun fib(n) {
+  if (n < 2) return n;
+  return fib(n - 1) + fib(n - 2);
+}
+
+fun paths(w, h) {
+  if (w == 0 or h == 0) return 1;
+  return paths(w - 1, h) + paths(w, h - 1);
+}
+
+%s
+print fib(22);
+print paths(9, 9);
+"""
+
+
+def bench(memoize: bool, memo_size: int = 1024) -> tuple[float, str, object]:
+    source = MEMO_SOURCE % ('memoize(fib); memoize(paths);' if memoize else '')
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        stmts, interpreter = Lox.compile(source)
+        interpreter.memo_size = memo_size
+        interpreter.interpret(stmts)
+    return time.perf_counter() - begin, out.getvalue(), interpreter.outermost.lookup('fib').memo
+
+
+if __name__ == '__main__':
+    for memoize, memo_size in [(False, 0), (True, 1024), (True, 4)]:
+        seconds, out, memo = bench(memoize, memo_size)
+        stats = '' if memo is None else f', fib cache {len(memo)}/{memo.size} hits {memo.hits} misses {memo.misses}'
+        print(f'memoize={memoize!s:>5} size={memo_size:>4}: {seconds:.3f}s, output {out.split()}{stats}')
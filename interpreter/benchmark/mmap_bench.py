@@ -0,0 +1,56 @@
+import mmap
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from interpreter.benchmark.workloads import large_program
+from interpreter.regex_scanner import RegexScanner
+from interpreter.scanner import Scanner
+
+
+# 读入文件并扫描完所有token(不保留), 返回耗时
+def load_and_scan(path: str, mode: str) -> float:
+    begin = time.perf_counter()
+    if mode == 'mmap':
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            for _ in RegexScanner(source).iter_tokens():
+                pass
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        scanner = RegexScanner(source) if mode == 'regex' else Scanner(source)
+        for _ in scanner.iter_tokens():
+            pass
+    return time.perf_counter() - begin
+
+
+def generate(path: str) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        # 带一些多字节字符, 这样str的解码副本是4字节一个字符
+        f.write(large_program(20000).replace('// unit', '// 单元'))
+
+
+# 每一步都在子进程里做, 父进程保持很小, 否则fork出来的子进程会继承它的峰值RSS
+def spawn(*args: str) -> None:
+    subprocess.run([sys.executable, '-m', 'interpreter.benchmark.mmap_bench', *args], check=True)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 2:
+        generate(sys.argv[1])
+        sys.exit(0)
+    if len(sys.argv) == 3:
+        cost = load_and_scan(sys.argv[2], sys.argv[1])
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f'{sys.argv[1]:>6}: {cost:.2f}s, peak rss {rss:.1f} MiB')
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bundle.lox')
+        spawn(path)
+        print(f'file: {os.path.getsize(path) / 1024 / 1024:.1f} MiB')
+        for mode in ['char', 'regex', 'mmap']:
+            spawn(mode, path)
@@ -0,0 +1,33 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 循环体里有常量表达式, 永远不成立的分支和没用到的局部变量
+LOOP_SOURCE = """
+var total = 0;
+for (var i = 0; i < 100000; i = i + 1) {
+    var label = "item " + "count";
+    var scale = (2 * 3 + 1) * (10 / 2);
+    if (1 > 2) {
+        print label;
+    }
+    total = total + scale * (1 + 1) - (-3 + 3);
+}
+print total;
+"""
+
+
+def bench(optimize: bool) -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        Lox.run(LOOP_SOURCE, optimize=optimize)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    for optimize in [False, True]:
+        seconds, out = bench(optimize)
+        print(f'optimize={optimize!s:>5}: {seconds:.3f}s, output {out.strip()}')
@@ -0,0 +1,45 @@
+import time
+
+from interpreter.benchmark.workloads import large_program
+from interpreter.parser import Parser
+from interpreter.pratt_parser import PrattParser
+from interpreter.scanner import Scanner
+from interpreter.stack_parser import StackParser
+
+# 表达式密集的源码: 大部分token都是字面量/变量和运算符
+EXPRESSION_UNIT = """
+var e{i} = (a{i} + 2 * b - c / 4.5) >= -d and !(x == y) or f(g.h, {i}) != nil;
+e{i} = a * (b + (c - (d * (e + 1)))) - -{i} / 3 < k.m.n(1, 2, 3) == true;
+w.q = "s" + t{i} + u * v - w / x >= y and z or 1 + 2 + 3 + 4 + 5;
+"""
+
+
+# 嵌套很深的源码, 递归下降解析会超出递归上限
+DEEP_SOURCE = '{' * 2000 + 'print ' + '(' * 2000 + '1' + ')' * 2000 + ';' + '}' * 2000
+
+
+def bench(parser_class, tokens: list, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        parser_class(tokens).parse()
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+if __name__ == '__main__':
+    sources = {
+        'expressions': ''.join(EXPRESSION_UNIT.format(i=i) for i in range(10000)),
+        'program': large_program(2000),
+        'deep': DEEP_SOURCE,
+    }
+    for name, source in sources.items():
+        tokens = Scanner(source).scan_tokens()
+        print(f'{name}: {len(tokens)} tokens')
+        for parser_class in [Parser, PrattParser, StackParser]:
+            try:
+                cost = bench(parser_class, tokens)
+            except RecursionError:
+                print(f'{parser_class.__name__:>12}: RecursionError')
+                continue
+            print(f'{parser_class.__name__:>12}: {cost:.3f}s  {len(tokens) / cost / 1000:.0f}k tokens/s')
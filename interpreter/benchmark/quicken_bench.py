@@ -0,0 +1,39 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# interpreter_test中的fib, 规模加大; 再加上一段数字和字符串混合的运算
+FIB_SOURCE = """
+fun fib(n) {
+  if (n <= 1) return n;
+  return fib(n - 2) + fib(n - 1);
+}
+print fib(20);
+
+var s = "";
+var total = 0;
+for (var i = 0; i < 20000; i = i + 1) {
+  if (!(i > 10 and i < 15)) total = total + i * 2 - 1;
+  if (i == 100) s = s + "x";
+}
+print total;
+print s;
+"""
+
+
+def bench(quicken: bool, infer: bool = False) -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        stmts, interpreter = Lox.compile(FIB_SOURCE, infer=infer)
+        interpreter.quicken = quicken
+        interpreter.interpret(stmts)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    for quicken, infer in [(False, False), (True, False), (True, True)]:
+        seconds, out = bench(quicken, infer)
+        print(f'quicken={quicken!s:>5} infer={infer!s:>5}: {seconds:.3f}s, output {out.split()}')
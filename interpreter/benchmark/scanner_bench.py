@@ -0,0 +1,23 @@
+import time
+
+from interpreter.benchmark.workloads import large_program
+from interpreter.regex_scanner import RegexScanner
+from interpreter.scanner import Scanner
+
+
+def bench(scanner_class, source: str, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        scanner_class(source).scan_tokens()
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+if __name__ == '__main__':
+    source = large_program(5000)
+    size = len(source.encode()) / 1024 / 1024
+    print(f'source: {size:.2f} MiB, {len(Scanner(source).scan_tokens())} tokens')
+    for scanner_class in [Scanner, RegexScanner]:
+        cost = bench(scanner_class, source)
+        print(f'{scanner_class.__name__:>12}: {cost:.3f}s  {size / cost:.2f} MiB/s')
@@ -0,0 +1,28 @@
+import gc
+import tracemalloc
+
+from interpreter.benchmark.workloads import large_program
+from interpreter.regex_scanner import RegexScanner
+from interpreter.scanner import Scanner
+
+
+# 返回扫描结果本身占用的字节数(不含源码)
+def measure(scan) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    result = scan()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, len(result)
+
+
+if __name__ == '__main__':
+    source = large_program(2000)
+    print(f'source: {len(source)} chars')
+    cases = [
+        ('list[Token]', lambda: Scanner(source).scan_tokens()),
+        ('TokenTable', lambda: RegexScanner(source).scan_table()),
+    ]
+    for name, scan in cases:
+        size, count = measure(scan)
+        print(f'{name:>12}: {size / 1024 / 1024:.2f} MiB for {count} tokens, {size / count:.1f} bytes/token')
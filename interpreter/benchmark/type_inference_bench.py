@@ -0,0 +1,44 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+# 局部变量上的数值计算: 逐点迭代 z = z * z + c, 统计没有发散的点
+NUMERIC_SOURCE = """
+fun mandelbrot(size) {
+    var inside = 0;
+    for (var y = 0; y < size; y = y + 1) {
+        for (var x = 0; x < size; x = x + 1) {
+            var cr = x * 3 / size - 2;
+            var ci = y * 2 / size - 1;
+            var zr = 0;
+            var zi = 0;
+            var n = 0;
+            while (n < 30 and zr * zr + zi * zi <= 4) {
+                var t = zr * zr - zi * zi + cr;
+                zi = 2 * zr * zi + ci;
+                zr = t;
+                n = n + 1;
+            }
+            if (n == 30) inside = inside + 1;
+        }
+    }
+    return inside;
+}
+print mandelbrot(60);
+"""
+
+
+def bench(**options) -> tuple[float, str]:
+    out = io.StringIO()
+    begin = time.perf_counter()
+    with redirect_stdout(out):
+        Lox.run(NUMERIC_SOURCE, **options)
+    return time.perf_counter() - begin, out.getvalue()
+
+
+if __name__ == '__main__':
+    for name, options in {'plain': {}, 'infer': {'infer': True}}.items():
+        seconds, out = bench(**options)
+        print(f'{name:>5}: {seconds:.3f}s, output {out.strip()}')
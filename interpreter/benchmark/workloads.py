@@ -0,0 +1,43 @@
+# 基准测试用的lox源码生成器, 模拟机器生成的大脚本
+
+DEFINITION_UNIT = """
+// unit {i}
+class Point{i} {{
+    init(x, y) {{
+        this.x = x;
+        this.y = y;
+    }}
+
+    length() {{
+        return this.x * this.x + this.y * this.y;
+    }}
+}}
+
+fun helper{i}(a, b) {{
+    var name = "helper {i}";
+    if (a > b and b >= 0 or a == nil) {{
+        return a - b / 2.5;
+    }} else {{
+        return -a + b * 3;
+    }}
+}}
+"""
+
+# 使用上面定义的类和函数
+USAGE_UNIT = """
+var p{i} = Point{i}({i}, {i}.5);
+for (var k = 0; k < 3; k = k + 1) {{
+    p{i}.x = helper{i}(p{i}.length(), k);
+}}
+"""
+
+PROGRAM_UNIT = DEFINITION_UNIT + USAGE_UNIT
+
+
+def large_program(units: int) -> str:
+    return ''.join(PROGRAM_UNIT.format(i=i) for i in range(units))
+
+
+# 定义了大量类和函数, 但只用到其中一组
+def library_program(units: int) -> str:
+    return ''.join(DEFINITION_UNIT.format(i=i) for i in range(units)) + USAGE_UNIT.format(i=0)
@@ -2,9 +2,11 @@ from __future__ import annotations
 import time
 from abc import ABCMeta, abstractmethod
 
-from interpreter.env import Env
+from interpreter.env import Env, Cell
 from interpreter.error import ReturnException, RuntimeException
 from interpreter.interpreter_ import Interpreter
+from interpreter.lazy_parser import LazyFunction
+from interpreter.memoize import LruCache, MISSING, memo_key, memoize
 from interpreter.stmt import Function
 from interpreter.token_ import Token
 
@@ -91,44 +93,83 @@ class LoxFunction(Callable):
     declaration: Function
     closure_env: Env
     is_initializer: bool
+    # 扁平的闭包捕获的变量, 见Resolver.flatten_closures; 为None时函数体通过closure_env读外层的变量
+    cells: list[Cell] | None
+    # 结果缓存, 见内置函数memoize
+    memo: LruCache | None
 
-    def __init__(self, declaration, env, is_initializer):
+    def __init__(self, declaration, env, is_initializer, cells=None):
         self.declaration = declaration
         # 在创建当前这个函数的同时 保存这个函数所在的环境
         self.closure_env = env
         # 是否是构造方法
         self.is_initializer = is_initializer
+        self.cells = cells
+        self.memo = None
 
     def call(self, interpreter: Interpreter, arguments: list[object]) -> object:
-        # 每执行一个函数 都需要一个新的环境 来保存当前函数的局部变量
-        env = Env(self.closure_env)
-        for i, param in enumerate(self.declaration.params):
-            arg = arguments[i]
-            env.define(param.lexeme, arg)
-
+        if self.memo is not None:
+            key = memo_key(arguments)
+            if key is not None:
+                value = self.memo.get(key)
+                if value is MISSING:
+                    value = self._invoke(interpreter, arguments)
+                    self.memo.put(key, value)
+                return value
+        return self._invoke(interpreter, arguments)
+
+    def _invoke(self, interpreter: Interpreter, arguments: list[object]) -> object:
+        # 预解析时跳过的函数体, 在第一次调用时解析
+        if isinstance(self.declaration, LazyFunction) and not self.declaration.loaded:
+            self.declaration.load(interpreter)
+
+        pool = interpreter.frame_pools.get(self.declaration)
+        env = self._frame(interpreter, pool, arguments)
         try:
             interpreter.execute_block(self.declaration.body, env)
         except ReturnException as e:
             # 如果是构造方法 永远返回this
             if self.is_initializer:
-                return self.closure_env.get_at(0, 'this')
+                return self.closure_env.values[0]
 
             return e.value
+        finally:
+            if pool is not None:
+                pool.append(env)
 
         # 手动调用构造方法 也返回this
         if self.is_initializer:
-            return self.closure_env.get_at(0, 'this')
+            return self.closure_env.values[0]
 
         return None
 
+    # 每执行一个函数 都需要一个新的环境 来保存当前函数的局部变量
+    # 没有被闭包捕获的函数, 从池中取一个用过的帧, 返回时放回去, 见Resolver.analyze_escapes
+    def _frame(self, interpreter: Interpreter, pool: list[Env] | None, arguments: list[object]) -> Env:
+        if pool:
+            env = pool.pop()
+            env.parent = self.closure_env
+        else:
+            env = Env(self.closure_env, interpreter.frame_sizes[self.declaration])
+        env.cells = self.cells
+        # 形参在函数作用域中最先声明, 依次占前面的槽位
+        env.values[:len(arguments)] = arguments
+        if self.cells is not None:
+            params = interpreter.cell_params.get(self.declaration)
+            if params is not None:
+                values = env.values
+                for slot in params:
+                    values[slot] = Cell(values[slot])
+        return env
+
     def arity(self) -> int:
         return len(self.declaration.params)
 
     # 用来给当前方法绑定this
     def bind(self, instance: LoxInstance) -> LoxFunction:
-        env = Env(self.closure_env)
-        env.define('this', instance)
-        return LoxFunction(self.declaration, env, self.is_initializer)
+        env = Env(self.closure_env, 1)
+        env.values[0] = instance
+        return LoxFunction(self.declaration, env, self.is_initializer, self.cells)
 
     def __repr__(self):
         return f'<fn {self.declaration.name.lexeme}>'
@@ -145,3 +186,15 @@ class Clock(Callable):
 
     def __repr__(self):
         return '<native fn>'
+
+
+class Memoize(Callable):
+
+    def call(self, interpreter: Interpreter, arguments: list[object]) -> object:
+        return memoize(interpreter, arguments[0])
+
+    def arity(self) -> int:
+        return 1
+
+    def __repr__(self):
+        return '<native fn>'
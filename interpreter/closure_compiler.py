@@ -0,0 +1,579 @@
+from __future__ import annotations
+import operator
+
+from interpreter.callable import Callable, LoxClass, LoxFunction, LoxInstance
+from interpreter.counting_loop import CountingLoop, match_counting_loop
+from interpreter.env import Env, Cell, UNDEFINED
+from interpreter.error import RuntimeException
+from interpreter.expr import Expr, Assign, Binary, Call, Get, Grouping, Literal, Logical, Set, Super, This, Unary, \
+    Variable
+from interpreter.interpreter_ import Interpreter
+from interpreter.lazy_parser import LazyFunction
+from interpreter.lox import Lox
+from interpreter.quicken import CellAssign, CellVariable, DirectCall, GlobalAssign, GlobalVariable, UpvalueAssign, \
+    UpvalueSuper, UpvalueThis, UpvalueVariable
+from interpreter.stmt import Stmt, Block, Break, Class, Continue, Expression, Function, If, Print, Return, Var, While
+from interpreter.token_ import Token, TokenType
+
+# 闭包编译: 把绑定好的语法树编译成一棵Python闭包, 每个节点一个闭包, 子节点的闭包, 深度和槽位都是它的自由变量
+# 执行时直接调用闭包, 当前环境作为参数传进去, 不再经过visitor的双重分派和Interpreter.evaluate/execute查表
+# 绑定结果(深度, 槽位, 全局变量下标, 闭包捕获的变量, type_inference的结果)都在编译时读出来, 执行时不再查表
+# 语句的闭包执行完返回None, break返回BREAK, return返回(返回值,), 控制流不再用异常
+# 运算规则和报错和Interpreter相同, 少见的情况(比如操作数不是数字)直接交给Interpreter的方法
+# 函数体在第一次调用时才编译, 预解析的函数这时才有函数体
+
+# break语句的结果
+BREAK = object()
+
+# 操作数都是数字时的二元运算
+NUMBER_OPS: dict[TokenType, object] = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.STAR: operator.mul,
+    TokenType.SLASH: operator.truediv,
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+}
+
+
+class ClosureCompiler:
+    # 保存绑定结果的解释器, 调用函数和内置函数时传给它们, 运算的慢路径也用它
+    interpreter: Interpreter
+    # 函数声明 -> 编译好的函数体
+    bodies: dict[Function, object]
+    # 节点类 -> 编译方法, 第一次遇到某个类时沿着MRO查找
+    compilers: dict[type, object]
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.bodies = {}
+        self.compilers = {}
+
+    def run(self, stmts: list[Stmt]) -> None:
+        program = self._sequence(stmts)
+        try:
+            program(self.interpreter.outermost)
+        except RuntimeException as e:
+            Lox.runtime_error(e)
+
+    def compile(self, node: Expr | Stmt) -> object:
+        compiler = self.compilers.get(type(node))
+        if compiler is None:
+            for c in type(node).__mro__:
+                compiler = getattr(self, '_compile_' + c.__name__.lower(), None)
+                if compiler is not None:
+                    break
+            self.compilers[type(node)] = compiler
+        return compiler(node)
+
+    def function_body(self, declaration: Function) -> object:
+        if isinstance(declaration, LazyFunction) and not declaration.loaded:
+            declaration.load(self.interpreter)
+        body = self.bodies[declaration] = self._sequence(declaration.body)
+        return body
+
+    # 语句列表, 遇到break或return时提前返回
+    def _sequence(self, stmts: list[Stmt]) -> object:
+        compiled = [self.compile(stmt) for stmt in stmts]
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def sequence(env):
+            for stmt in compiled:
+                result = stmt(env)
+                if result is not None:
+                    return result
+        return sequence
+
+    # 语句
+
+    def _compile_expression(self, stmt: Expression) -> object:
+        expression = self.compile(stmt.expression)
+
+        def run(env):
+            expression(env)
+        return run
+
+    def _compile_print(self, stmt: Print) -> object:
+        expression = self.compile(stmt.expression)
+        stringify = self.interpreter.stringify
+
+        def run(env):
+            print(stringify(expression(env)))
+        return run
+
+    def _compile_var(self, stmt: Var) -> object:
+        initializer = self._literal(None) if stmt.initializer is None else self.compile(stmt.initializer)
+        slot = self.interpreter.slot_map.get(stmt)
+        if slot is not None and stmt not in self.interpreter.cell_decls:
+            def var(env):
+                env.values[slot] = initializer(env)
+            return var
+        define = self._definer(stmt)
+
+        def var(env):
+            define(env, initializer(env))
+        return var
+
+    # 写声明的变量: 局部的写进槽位(被闭包捕获的放在Cell中), 全局的写进全局变量表, 同Interpreter._define
+    def _definer(self, stmt: Var | Function | Class) -> object:
+        interpreter = self.interpreter
+        slot = interpreter.slot_map.get(stmt)
+        if slot is not None:
+            if stmt in interpreter.cell_decls:
+                def define(env, value):
+                    env.values[slot] = Cell(value)
+            else:
+                def define(env, value):
+                    env.values[slot] = value
+            return define
+        outermost = interpreter.outermost
+        index = interpreter.global_map.get(stmt)
+        if index is None:
+            name = stmt.name.lexeme
+
+            def define(env, value):
+                outermost.define(name, value)
+            return define
+        values = outermost.values
+
+        def define(env, value):
+            values[index] = value
+        return define
+
+    def _compile_block(self, stmt: Block) -> object:
+        body = self._sequence(stmt.statements)
+        size = self.interpreter.frame_sizes.get(stmt)
+        # 和外层共用帧, 见Resolver.analyze_escapes
+        if size is None:
+            return body
+        pool = self.interpreter.frame_pools.get(stmt)
+        if pool is None:
+            return lambda env: body(Env(env, size))
+
+        def block(env):
+            frame = pool.pop() if pool else Env(env, size)
+            try:
+                return body(frame)
+            finally:
+                pool.append(frame)
+        return block
+
+    def _compile_if(self, stmt: If) -> object:
+        condition, then_branch = self.compile(stmt.condition), self.compile(stmt.then_branch)
+        else_branch = None if stmt.else_branch is None else self.compile(stmt.else_branch)
+
+        def run(env):
+            value = condition(env)
+            if value is not None and value is not False:
+                return then_branch(env)
+            if else_branch is not None:
+                return else_branch(env)
+        return run
+
+    def _compile_while(self, stmt: While) -> object:
+        interpreter = self.interpreter
+        if interpreter.fast_loops:
+            loop = match_counting_loop(stmt, interpreter.local_map, interpreter.frame_sizes)
+            if loop is not None:
+                return self._counting_loop(loop)
+        condition, body = self.compile(stmt.condition), self.compile(stmt.body)
+
+        def run(env):
+            while True:
+                value = condition(env)
+                if value is None or value is False:
+                    return None
+                result = body(env)
+                if result is not None:
+                    return None if result is BREAK else result
+        return run
+
+    # 同Interpreter._run_counting_loop
+    def _counting_loop(self, loop: CountingLoop) -> object:
+        interpreter = self.interpreter
+        slot, size = interpreter.slot_map[loop.counter], interpreter.frame_sizes.get(loop.block)
+        compare, step, operator_, increment = loop.compare, loop.step, loop.operator, loop.increment
+        limit, body = self.compile(loop.limit), self._sequence(loop.body)
+        binary = interpreter._binary
+        constant = loop.limit.value if isinstance(loop.limit, Literal) else None
+
+        def run(env):
+            values = env.values
+            while True:
+                i = values[slot]
+                bound = limit(env) if constant is None else constant
+                if type(i) is float and type(bound) is float:
+                    if not compare(i, bound):
+                        return None
+                else:
+                    value = binary(operator_, i, bound)
+                    if value is None or value is False:
+                        return None
+                result = body(env if size is None else Env(env, size))
+                if result is not None:
+                    return None if result is BREAK else result
+                i = values[slot]
+                if type(i) is float:
+                    values[slot] = i + step
+                else:
+                    values[slot] = binary(increment.operator, i, increment.right.value)
+        return run
+
+    def _compile_break(self, stmt: Break) -> object:
+        return lambda env: BREAK
+
+    # 同Interpreter.visit_continue, 什么都不做
+    def _compile_continue(self, stmt: Continue) -> object:
+        return lambda env: None
+
+    def _compile_return(self, stmt: Return) -> object:
+        value = self._literal(None) if stmt.value is None else self.compile(stmt.value)
+        return lambda env: (value(env),)
+
+    def _compile_function(self, stmt: Function) -> object:
+        define = self._definer(stmt)
+        if not self.interpreter.flat_closures:
+            return lambda env: define(env, CompiledFunction(stmt, env, False, None, self))
+        capture = self._capturer(self.interpreter.captures[stmt])
+        if stmt not in self.interpreter.cell_decls:
+            return lambda env: define(env, CompiledFunction(stmt, None, False, capture(env), self))
+        # 局部函数调用自己时捕获的是自己的Cell, 同Interpreter.visit_function
+        slot = self.interpreter.slot_map[stmt]
+
+        def function(env):
+            cell = env.values[slot] = Cell(None)
+            cell.value = CompiledFunction(stmt, None, False, capture(env), self)
+        return function
+
+    # 创建闭包时按顺序取出捕获的变量, 同Interpreter._capture
+    def _capturer(self, sources: list[tuple[str, Variable]]) -> object:
+        interpreter = self.interpreter
+        getters = []
+        for kind, source in sources:
+            if kind == 'upvalue':
+                getters.append(_upvalue_cell(interpreter.upvalue_map[source]))
+                continue
+            read = _local_reader(interpreter.local_map[source], interpreter.slot_map[source])
+            getters.append(read if kind == 'cell' else _new_cell(read))
+        return lambda env: [get(env) for get in getters]
+
+    def _compile_class(self, stmt: Class) -> object:
+        interpreter = self.interpreter
+        define = self._definer(stmt)
+        super_class = None if stmt.super_class is None else self.compile(stmt.super_class)
+        flat = interpreter.flat_closures
+        methods = [(m.name.lexeme, m, m.name.lexeme == 'init',
+                    self._capturer(interpreter.captures[m]) if flat else None) for m in stmt.methods]
+        cell_slot = interpreter.slot_map[stmt] if stmt in interpreter.cell_decls else None
+        name = stmt.name.lexeme
+
+        def klass(env):
+            define(env, None)
+            parent_class = None
+            closure = None if flat else env
+            if super_class is not None:
+                parent_class = super_class(env)
+                if not isinstance(parent_class, LoxClass):
+                    raise RuntimeException(stmt.super_class.name, 'super class must be a class')
+                closure = Env(closure, 1)
+                closure.values[0] = parent_class
+            functions = {}
+            for method_name, m, is_initializer, capture in methods:
+                cells = None if capture is None else capture(env)
+                functions[method_name] = CompiledFunction(m, closure, is_initializer, cells, self)
+            lox_class = LoxClass(name, parent_class, functions)
+            if cell_slot is None:
+                define(env, lox_class)
+            else:
+                env.values[cell_slot].value = lox_class
+        return klass
+
+    # 表达式
+
+    @staticmethod
+    def _literal(value: object) -> object:
+        return lambda env: value
+
+    def _compile_literal(self, expr: Literal) -> object:
+        return self._literal(expr.value)
+
+    def _compile_grouping(self, expr: Grouping) -> object:
+        return self.compile(expr.expression)
+
+    def _compile_variable(self, expr: Variable) -> object:
+        depth = self.interpreter.local_map.get(expr)
+        if depth is None:
+            return self._global_reader(expr.name, None)
+        return _local_reader(depth, self.interpreter.slot_map[expr])
+
+    def _compile_globalvariable(self, expr: GlobalVariable) -> object:
+        return self._global_reader(expr.name, self.interpreter.global_map.get(expr))
+
+    # 读全局变量, 没有下标的按名字查, 同quicken._global_variable
+    def _global_reader(self, name: Token, index: int | None) -> object:
+        outermost = self.interpreter.outermost
+        if index is None:
+            return lambda env: outermost.get(name)
+        values = outermost.values
+
+        def read(env):
+            value = values[index]
+            if value is UNDEFINED:
+                raise RuntimeException(name, f"undefined variable '{name.lexeme}'")
+            return value
+        return read
+
+    def _compile_cellvariable(self, expr: CellVariable) -> object:
+        read = _local_reader(self.interpreter.local_map[expr], self.interpreter.slot_map[expr])
+        return lambda env: read(env).value
+
+    def _compile_upvaluevariable(self, expr: UpvalueVariable | UpvalueThis) -> object:
+        index = self.interpreter.upvalue_map[expr]
+        return lambda env: env.cells[index].value
+
+    def _compile_assign(self, expr: Assign) -> object:
+        value = self.compile(expr.value)
+        depth = self.interpreter.local_map.get(expr)
+        if depth is None:
+            return self._global_writer(expr, value, None)
+        slot = self.interpreter.slot_map[expr]
+        if depth == 0:
+            def assign(env):
+                result = env.values[slot] = value(env)
+                return result
+            return assign
+
+        def assign(env):
+            result = value(env)
+            for _ in range(depth):
+                env = env.parent
+            env.values[slot] = result
+            return result
+        return assign
+
+    def _compile_globalassign(self, expr: GlobalAssign) -> object:
+        return self._global_writer(expr, self.compile(expr.value), self.interpreter.global_map.get(expr))
+
+    # 写全局变量, 同quicken._global_assign
+    def _global_writer(self, expr: Assign, value: object, index: int | None) -> object:
+        outermost, name = self.interpreter.outermost, expr.name
+        values = outermost.values
+
+        def assign(env):
+            result = value(env)
+            if index is None or values[index] is UNDEFINED:
+                outermost.assign(name, result)
+            else:
+                values[index] = result
+            return result
+        return assign
+
+    def _compile_cellassign(self, expr: CellAssign) -> object:
+        value = self.compile(expr.value)
+        read = _local_reader(self.interpreter.local_map[expr], self.interpreter.slot_map[expr])
+
+        def assign(env):
+            result = read(env).value = value(env)
+            return result
+        return assign
+
+    def _compile_upvalueassign(self, expr: UpvalueAssign) -> object:
+        value = self.compile(expr.value)
+        index = self.interpreter.upvalue_map[expr]
+
+        def assign(env):
+            result = env.cells[index].value = value(env)
+            return result
+        return assign
+
+    def _compile_logical(self, expr: Logical) -> object:
+        left, right = self.compile(expr.left), self.compile(expr.right)
+        if expr.operator.type == TokenType.OR:
+            def logical(env):
+                value = left(env)
+                if value is not None and value is not False:
+                    return value
+                return right(env)
+        else:
+            def logical(env):
+                value = left(env)
+                if value is None or value is False:
+                    return value
+                return right(env)
+        return logical
+
+    def _compile_binary(self, expr: Binary) -> object:
+        left, right = self.compile(expr.left), self.compile(expr.right)
+        # type_inference已经证明操作数都是数字
+        op = self.interpreter.number_ops.get(expr)
+        if op is not None:
+            return lambda env: op(left(env), right(env))
+        operator_ = expr.operator
+        if operator_.type == TokenType.EQUAL_EQUAL:
+            return lambda env: _is_equal(left(env), right(env))
+        if operator_.type == TokenType.BANG_EQUAL:
+            return lambda env: not _is_equal(left(env), right(env))
+        op = NUMBER_OPS[operator_.type]
+        binary = self.interpreter._binary
+
+        def run(env):
+            a = left(env)
+            b = right(env)
+            if type(a) is float and type(b) is float:
+                return op(a, b)
+            return binary(operator_, a, b)
+        return run
+
+    def _compile_unary(self, expr: Unary) -> object:
+        right = self.compile(expr.right)
+        op = self.interpreter.number_ops.get(expr)
+        if op is not None:
+            return lambda env: op(right(env))
+        if expr.operator.type == TokenType.BANG:
+            def run(env):
+                value = right(env)
+                return value is None or value is False
+            return run
+        operator_, unary = expr.operator, self.interpreter._unary
+
+        def run(env):
+            value = right(env)
+            if type(value) is float:
+                return -value
+            return unary(operator_, value)
+        return run
+
+    def _compile_call(self, expr: Call) -> object:
+        callee, arguments = self.compile(expr.callee), [self.compile(a) for a in expr.arguments]
+        interpreter, paren = self.interpreter, expr.paren
+
+        def call(env):
+            function = callee(env)
+            values = [a(env) for a in arguments]
+            if not isinstance(function, Callable):
+                raise RuntimeException(paren, 'can only call function and class')
+            if len(values) != function.arity():
+                raise RuntimeException(paren, f'expected {function.arity()} arguments but got {len(values)}')
+            return function.call(interpreter, values)
+        return call
+
+    # 被调用的函数或类第一次查到以后留在闭包中, 同quicken._direct_call
+    def _compile_directcall(self, expr: DirectCall) -> object:
+        callee, arguments = self.compile(expr.callee), [self.compile(a) for a in expr.arguments]
+        interpreter = self.interpreter
+        target = None
+
+        def call(env):
+            nonlocal target
+            if target is None:
+                target = callee(env)
+            return target.call(interpreter, [a(env) for a in arguments])
+        return call
+
+    def _compile_get(self, expr: Get) -> object:
+        obj, name = self.compile(expr.object), expr.name
+
+        def get(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise RuntimeException(name, 'only instance have properties')
+            return instance.get(name)
+        return get
+
+    def _compile_set(self, expr: Set) -> object:
+        obj, value, name = self.compile(expr.object), self.compile(expr.value), expr.name
+
+        def set_(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise RuntimeException(name, 'only instance have fields')
+            result = value(env)
+            instance.set(name, result)
+            return result
+        return set_
+
+    def _compile_this(self, expr: This) -> object:
+        return _local_reader(self.interpreter.local_map[expr], self.interpreter.slot_map[expr])
+
+    _compile_upvaluethis = _compile_upvaluevariable
+
+    # super和this各自单独占一层作用域, 都在0号槽位, 同Interpreter.visit_super
+    def _compile_super(self, expr: Super) -> object:
+        depth = self.interpreter.local_map[expr]
+        read_class, read_this = _local_reader(depth, 0), _local_reader(depth - 1, 0)
+        name = expr.method.lexeme
+        return lambda env: read_class(env).find_method(name).bind(read_this(env))
+
+    def _compile_upvaluesuper(self, expr: UpvalueSuper) -> object:
+        super_index, this_index = self.interpreter.upvalue_map[expr]
+        name = expr.method.lexeme
+
+        def run(env):
+            cells = env.cells
+            return cells[super_index].value.find_method(name).bind(cells[this_index].value)
+        return run
+
+
+# 编译执行的函数, 执行时调用编译好的函数体
+class CompiledFunction(LoxFunction):
+    compiler: ClosureCompiler
+
+    def __init__(self, declaration, env, is_initializer, cells, compiler):
+        super().__init__(declaration, env, is_initializer, cells)
+        self.compiler = compiler
+
+    def _invoke(self, interpreter: Interpreter, arguments: list[object]) -> object:
+        body = self.compiler.bodies.get(self.declaration)
+        if body is None:
+            body = self.compiler.function_body(self.declaration)
+        pool = interpreter.frame_pools.get(self.declaration)
+        env = self._frame(interpreter, pool, arguments)
+        try:
+            result = body(env)
+        finally:
+            if pool is not None:
+                pool.append(env)
+        # 构造方法永远返回this
+        if self.is_initializer:
+            return self.closure_env.values[0]
+        if result is None or result is BREAK:
+            return None
+        return result[0]
+
+    def bind(self, instance: LoxInstance) -> LoxFunction:
+        env = Env(self.closure_env, 1)
+        env.values[0] = instance
+        return CompiledFunction(self.declaration, env, self.is_initializer, self.cells, self.compiler)
+
+
+# 读局部变量, 深度是0和1的单独展开
+def _local_reader(depth: int, slot: int) -> object:
+    if depth == 0:
+        return lambda env: env.values[slot]
+    if depth == 1:
+        return lambda env: env.parent.values[slot]
+
+    def read(env):
+        for _ in range(depth):
+            env = env.parent
+        return env.values[slot]
+    return read
+
+
+def _upvalue_cell(index: int) -> object:
+    return lambda env: env.cells[index]
+
+
+# 捕获this和super的值
+def _new_cell(read: object) -> object:
+    return lambda env: Cell(read(env))
+
+
+# 同Interpreter._is_equal
+def _is_equal(a: object, b: object) -> bool:
+    if a is None:
+        return b is None
+    return a == b
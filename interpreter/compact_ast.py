@@ -0,0 +1,40 @@
+import sys
+
+from interpreter.expr import Expr
+from interpreter.stmt import Stmt
+from interpreter.token_ import Token
+
+
+# 变量绑定以后, 语法树里的token只剩下三种用途: 按lexeme查变量, 按type选运算, 按line报错
+# 字面量的值已经在Literal节点里, 所以token可以换成不带literal的共享对象:
+# 同一行上同名同类型的token只保留一个, lexeme也放进字符串驻留池, 整个程序共用
+# 语法树的结构和节点对象不变, interpreter.local_map依然有效
+def compact_tokens(stmts: list[Stmt]) -> int:
+    pool: dict[tuple, Token] = {}
+    intern = sys.intern
+
+    def compact(token: Token) -> Token:
+        key = (token.type, token.lexeme, token.line)
+        shared = pool.get(key)
+        if shared is None:
+            shared = pool[key] = Token(token.type, intern(token.lexeme), None, token.line)
+        return shared
+
+    # 显式的栈, 嵌套再深也不会超出递归上限
+    stack: list = list(stmts)
+    while stack:
+        node = stack.pop()
+        for name in type(node).FIELDS:
+            value = getattr(node, name)
+            if isinstance(value, Token):
+                setattr(node, name, compact(value))
+            elif isinstance(value, (Expr, Stmt)):
+                stack.append(value)
+            elif isinstance(value, list):
+                for i, item in enumerate(value):
+                    if isinstance(item, Token):
+                        value[i] = compact(item)
+                    elif item is not None:
+                        stack.append(item)
+    # 返回共享token的个数
+    return len(pool)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import operator
+
+from interpreter.ast_walk import children
+from interpreter.expr import Expr, Assign, Binary, Literal, Variable
+from interpreter.quicken import CellVariable
+from interpreter.stmt import Stmt, Block, Class, Expression, Function, Var, While
+from interpreter.token_ import Token, TokenType
+
+# 比较运算符 -> 对应的Python运算
+COMPARE = {
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+}
+
+
+# 计数循环: for (var i = 0; i < n; i = i + 1) 展开后的形状
+#   while (i < n) { 循环体...; i = i + 1; }
+# 条件的左边是当前作用域中的局部变量, 右边是任意表达式, 比较运算符是 < <= > >= 之一
+# 循环体的最后一句给同一个变量加上或减去一个数字常量
+# 循环体中没有给这个变量赋值, 也没有捕获它的函数或类, 所以循环变量只在循环条件和最后一句中变化
+class CountingLoop:
+    __slots__ = ('name', 'counter', 'compare', 'operator', 'limit', 'body', 'block', 'step', 'increment')
+    # 循环变量名, 和条件中读循环变量的节点(用它查槽位)
+    name: str
+    counter: Variable
+    # 比较运算, 和比较运算符的token(操作数不是数字时报错用)
+    compare: object
+    operator: Token
+    # 条件的右边
+    limit: Expr
+    # 去掉最后一句的循环体, 和原来的循环体(用它查作用域的大小)
+    body: list[Stmt]
+    block: Block
+    # 每次循环加上的数, 减法时是负数
+    step: float
+    # 最后一句中的 i + 1, 循环变量不是数字时按原来的方式求值
+    increment: Binary
+
+    def __init__(self, name, counter, compare, operator, limit, body, block, step, increment):
+        self.name = name
+        self.counter = counter
+        self.compare = compare
+        self.operator = operator
+        self.limit = limit
+        self.body = body
+        self.block = block
+        self.step = step
+        self.increment = increment
+
+
+# 不是计数循环时返回None
+# 循环体和外层共用帧时(不在frame_sizes中), 循环体中读写循环变量的深度是0, 否则是1
+def match_counting_loop(stmt: While, local_map: dict[Expr, int], frame_sizes: dict[Stmt, int]) -> CountingLoop | None:
+    condition = stmt.condition
+    if not isinstance(condition, Binary) or condition.operator.type not in COMPARE:
+        return None
+    counter = condition.left
+    # 被闭包捕获的循环变量放在Cell中, 见Resolver.flatten_closures
+    if not isinstance(counter, Variable) or isinstance(counter, CellVariable) or local_map.get(counter) != 0:
+        return None
+    name = counter.name.lexeme
+
+    if not isinstance(stmt.body, Block) or not stmt.body.statements:
+        return None
+    *body, last = stmt.body.statements
+    depth = 1 if stmt.body in frame_sizes else 0
+    if not isinstance(last, Expression) or not isinstance(last.expression, Assign):
+        return None
+    increment = last.expression
+    value = increment.value
+    if increment.name.lexeme != name or local_map.get(increment) != depth or not isinstance(value, Binary):
+        return None
+    if value.operator.type not in (TokenType.PLUS, TokenType.MINUS):
+        return None
+    if not isinstance(value.left, Variable) or value.left.name.lexeme != name or local_map.get(value.left) != depth:
+        return None
+    if not isinstance(value.right, Literal) or type(value.right.value) is not float:
+        return None
+
+    if _touches([condition.right, *body], name):
+        return None
+    step = value.right.value if value.operator.type == TokenType.PLUS else -value.right.value
+    return CountingLoop(name, counter, COMPARE[condition.operator.type], condition.operator, condition.right, body,
+                        stmt.body, step, value)
+
+
+# 是否给名为name的变量赋值, 声明了同名的变量, 或者在函数和类中用到了它
+# 同名的其他变量也算, 宁可不走快速路径
+# 循环体和外层共用帧时, 循环体中重新声明的同名变量深度也是0, 只看深度分不出是哪一个
+def _touches(nodes: list[Expr | Stmt], name: str) -> bool:
+    stack = [(n, False) for n in nodes]
+    while stack:
+        node, in_function = stack.pop()
+        if isinstance(node, (Assign, Var, Function, Class)) and node.name.lexeme == name:
+            return True
+        if in_function and isinstance(node, Variable) and node.name.lexeme == name:
+            return True
+        if isinstance(node, Function) and node.body is None:
+            # 还没解析的函数体, 不知道用到了哪些变量
+            return True
+        inner = in_function or isinstance(node, (Function, Class))
+        stack.extend((child, inner) for child in children(node))
+    return False
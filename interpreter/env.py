@@ -2,46 +2,76 @@ from __future__ import annotations
 from interpreter.error import RuntimeException
 from interpreter.token_ import Token
 
+# 全局变量表中还没有定义的变量
+UNDEFINED = object()
 
+
+# 被闭包捕获的局部变量, 同clox中的ObjUpvalue
+# 声明变量时创建, 存在变量的槽位上; 创建闭包时只把用到的cell放进闭包, 不再引用外层的帧
+class Cell:
+    __slots__ = ('value',)
+    value: object
+
+    def __init__(self, value):
+        self.value = value
+
+
+# 最外层环境是全局变量表, 每个全局变量有固定的下标, 见Interpreter.global_map
+# 局部作用域是定长的帧, 变量存在Resolver分配的槽位上, 见Interpreter.slot_map和frame_sizes
 class Env:
-    value_map: dict[str, object]
+    __slots__ = ('values', 'names', 'parent', 'cells')
+    # 局部变量, 下标是槽位; 最外层环境中是所有全局变量的值
+    values: list[object]
+    # 全局变量名 -> 在values中的下标, 只有最外层环境有
+    names: dict[str, int] | None
     # 外层作用域
     parent: Env
+    # 正在执行的函数捕获的变量, 见Interpreter.upvalue_map; 函数中的Block的帧和函数的帧相同
+    cells: list[Cell] | None
 
-    def __init__(self, parent=None):
-        self.value_map = {}
+    def __init__(self, parent=None, size=0):
+        self.values = [None] * size
+        self.names = None
         self.parent = parent
+        self.cells = None if parent is None else parent.cells
+
+    # 全局变量的下标, 第一次遇到这个名字时分配, 值先是UNDEFINED
+    # Resolver绑定时就给用到的全局变量分配好下标, 之后才定义的变量也一样, 执行到定义时才写入值
+    def index(self, name: str) -> int:
+        i = self.names.get(name)
+        if i is None:
+            i = self.names[name] = len(self.values)
+            self.values.append(UNDEFINED)
+        return i
 
     def define(self, k: str, v: object) -> None:
-        self.value_map[k] = v
+        self.values[self.index(k)] = v
+
+    # 按名字查全局变量, 没有定义时返回UNDEFINED
+    def lookup(self, name: str) -> object:
+        i = self.names.get(name)
+        return UNDEFINED if i is None else self.values[i]
 
     def get(self, k: Token) -> object:
-        if k.lexeme in self.value_map.keys():
-            return self.value_map[k.lexeme]
-        if self.parent is not None:
-            return self.parent.get(k)
-        raise RuntimeException(k, f"undefined variable '{k.lexeme}'")
+        value = self.lookup(k.lexeme)
+        if value is UNDEFINED:
+            raise RuntimeException(k, f"undefined variable '{k.lexeme}'")
+        return value
 
     def assign(self, k: Token, v: object) -> None:
-        if k.lexeme in self.value_map.keys():
-            self.value_map[k.lexeme] = v
-            return
-        if self.parent is not None:
-            self.parent.assign(k, v)
-            return
-
-        raise RuntimeException(k, f"undefined variable '{k.lexeme}'")
-
-    def get_at(self, distance: int, name: str) -> object:
-        target = self._ancestor(distance)
-        return target.value_map[name]
+        i = self.names.get(k.lexeme)
+        if i is None or self.values[i] is UNDEFINED:
+            raise RuntimeException(k, f"undefined variable '{k.lexeme}'")
+        self.values[i] = v
 
-    def assign_at(self, distance: int, name: Token, value: object) -> None:
-        target = self._ancestor(distance)
-        target.value_map[name.lexeme] = value
+    def get_at(self, distance: int, slot: int) -> object:
+        env = self
+        for i in range(distance):
+            env = env.parent
+        return env.values[slot]
 
-    def _ancestor(self, distance: int) -> Env:
+    def assign_at(self, distance: int, slot: int, value: object) -> None:
         env = self
-        for i in range(0, distance):
+        for i in range(distance):
             env = env.parent
-        return env
+        env.values[slot] = value
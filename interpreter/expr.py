@@ -1,10 +1,18 @@
-# generate time: 2023-02-20 21:22:04
+# generate time: 2026-10-18 05:05:53
 from __future__ import annotations
 from abc import abstractmethod, ABCMeta
+
 from interpreter.token_ import Token
 
 
+# 节点类都用__slots__, 没有每个实例的__dict__, 大脚本的语法树能省一半内存
+# 子类(比如LazyFunction)不声明__slots__时仍然可以加属性
 class Expr(metaclass=ABCMeta):
+    __slots__ = ()
+    # 子节点和token等字段的名字, 按构造函数参数的顺序; 遍历语法树的代码按它取字段
+    # 特化的子类(见quicken)和LazyFunction不加字段, 直接继承
+    FIELDS: tuple[str, ...] = ()
+
     @abstractmethod
     def accept(self, visitor: ExprVisitor) -> object:
         pass
@@ -62,6 +70,8 @@ class ExprVisitor(metaclass=ABCMeta):
 
 
 class Assign(Expr):
+    __slots__ = ('name', 'value', )
+    FIELDS = __slots__
     name: Token
     value: Expr
 
@@ -74,6 +84,8 @@ class Assign(Expr):
 
 
 class Binary(Expr):
+    __slots__ = ('left', 'operator', 'right', )
+    FIELDS = __slots__
     left: Expr
     operator: Token
     right: Expr
@@ -88,6 +100,8 @@ class Binary(Expr):
 
 
 class Call(Expr):
+    __slots__ = ('callee', 'paren', 'arguments', )
+    FIELDS = __slots__
     callee: Expr
     paren: Token
     arguments: list[Expr]
@@ -102,6 +116,8 @@ class Call(Expr):
 
 
 class Get(Expr):
+    __slots__ = ('object', 'name', )
+    FIELDS = __slots__
     object: Expr
     name: Token
 
@@ -114,6 +130,8 @@ class Get(Expr):
 
 
 class Super(Expr):
+    __slots__ = ('keyword', 'method', )
+    FIELDS = __slots__
     keyword: Token
     method: Token
 
@@ -126,6 +144,8 @@ class Super(Expr):
 
 
 class Set(Expr):
+    __slots__ = ('object', 'name', 'value', )
+    FIELDS = __slots__
     object: Expr
     name: Token
     value: Expr
@@ -140,6 +160,8 @@ class Set(Expr):
 
 
 class Grouping(Expr):
+    __slots__ = ('expression', )
+    FIELDS = __slots__
     expression: Expr
 
     def __init__(self, expression: Expr, ):
@@ -150,6 +172,8 @@ class Grouping(Expr):
 
 
 class Literal(Expr):
+    __slots__ = ('value', )
+    FIELDS = __slots__
     value: object
 
     def __init__(self, value: object, ):
@@ -160,6 +184,8 @@ class Literal(Expr):
 
 
 class Logical(Expr):
+    __slots__ = ('left', 'operator', 'right', )
+    FIELDS = __slots__
     left: Expr
     operator: Token
     right: Expr
@@ -174,6 +200,8 @@ class Logical(Expr):
 
 
 class This(Expr):
+    __slots__ = ('keyword', )
+    FIELDS = __slots__
     keyword: Token
 
     def __init__(self, keyword: Token, ):
@@ -184,6 +212,8 @@ class This(Expr):
 
 
 class Unary(Expr):
+    __slots__ = ('operator', 'right', )
+    FIELDS = __slots__
     operator: Token
     right: Expr
 
@@ -196,6 +226,8 @@ class Unary(Expr):
 
 
 class Variable(Expr):
+    __slots__ = ('name', )
+    FIELDS = __slots__
     name: Token
 
     def __init__(self, name: Token, ):
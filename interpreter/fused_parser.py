@@ -0,0 +1,216 @@
+from interpreter.expr import Expr, Variable, Assign, Literal
+from interpreter.lox import Lox
+from interpreter.pratt_parser import PrattParser, Precedence, make_rules
+from interpreter.resolver import Resolver, FunctionType, ClassType
+from interpreter.stmt import Stmt, Var, Block, While, Expression, Function, Return, Class
+from interpreter.token_ import Token, TokenType
+
+
+# 解析途中发现的绑定错误先存起来
+# 先解析再绑定时, 有语法错误就不会做绑定, 所以要等解析成功以后再报告
+class DeferredErrorResolver(Resolver):
+    errors: list[tuple[Token, str]]
+
+    def __init__(self, interpreter):
+        super().__init__(interpreter)
+        self.errors = []
+
+    def _error(self, token: Token, message: str) -> None:
+        self.errors.append((token, message))
+
+    def report(self) -> None:
+        for token, message in self.errors:
+            Lox.error(token=token, message=message)
+
+
+# 解析的同时做变量绑定, 和clox在编译时resolveLocal一样, 不需要再遍历一遍语法树
+# 每个变量节点生成时, 作用域栈正好是Resolver遍历到它时的样子, 所以算出的深度相同
+class FusedParser(PrattParser):
+    resolver: DeferredErrorResolver
+    # 当前表达式的优先级是否允许赋值, 决定变量后面的'='是不是赋值
+    can_assign: bool
+    # 正在解析的是函数还是方法
+    function_kind: str
+
+    def __init__(self, tokens, interpreter):
+        self.resolver = DeferredErrorResolver(interpreter)
+        self.can_assign = False
+        self.function_kind = 'function'
+        super().__init__(tokens)
+
+    # 解析成功以后调用, 报告绑定错误
+    def report_resolve_errors(self) -> None:
+        self.resolver.report()
+
+    def _parse_declaration(self) -> Stmt:
+        resolver = self.resolver
+        depth = len(resolver.scope_stack)
+        pre_function, pre_class = resolver.current_function, resolver.current_class
+        stmt = super()._parse_declaration()
+        if stmt is None:
+            # 出错时跳过了一部分源码, 作用域栈恢复到这条声明开始之前
+            del resolver.scope_stack[depth:]
+            resolver.current_function, resolver.current_class = pre_function, pre_class
+        return stmt
+
+    def _parse_class_declaration(self) -> Stmt:
+        resolver = self.resolver
+        name = self._ensure(TokenType.IDENTIFIER, 'expect class name')
+        pre_class = resolver.current_class
+        resolver.current_class = ClassType.CLASS
+        # 和Resolver.visit_class保持一致
+        slot = resolver._declare(name)
+        resolver._declare(name)
+
+        super_class = None
+        if self._match_any_type(TokenType.LESS):
+            self._ensure(TokenType.IDENTIFIER, 'expect supper class name')
+            super_class = Variable(self._peek_pre())
+            if name.lexeme == super_class.name.lexeme:
+                resolver._error(super_class.name, 'a class can not inherit from itself')
+
+            resolver.current_class = ClassType.SUBCLASS
+            resolver.visit_variable(super_class)
+            resolver._begin_scope()
+            resolver.scope_stack[-1]['super'] = True
+
+        self._ensure(TokenType.LEFT_BRACE, "expect '{' before class body")
+
+        resolver._begin_scope()
+        resolver.scope_stack[-1]['this'] = True
+        methods = []
+        while not self._is_match(TokenType.RIGHT_BRACE) and not self._is_at_end():
+            m = self._parse_function("method")
+            methods.append(m)
+        resolver._end_scope()
+
+        self._ensure(TokenType.RIGHT_BRACE, "expect '}' after class body")
+        if super_class is not None:
+            resolver._end_scope()
+        resolver.current_class = pre_class
+        klass = Class(name, super_class, methods)
+        resolver._declare_slot(klass, slot)
+        return klass
+
+    def _parse_function(self, kind: str) -> Stmt:
+        self.function_kind = kind
+        return super()._parse_function(kind)
+
+    # 同Resolver.visit_function和_resolve_function
+    def _parse_function_body(self, name: Token, params: list[Token]) -> Stmt:
+        resolver = self.resolver
+        slot = None
+        if self.function_kind == 'method':
+            type = FunctionType.INITIALIZER if name.lexeme == 'init' else FunctionType.METHOD
+        else:
+            type = FunctionType.FUNCTION
+            slot = resolver._declare(name)
+            resolver._define(name)
+
+        pre_function = resolver.current_function
+        resolver.current_function = type
+        resolver._begin_scope()
+        for param in params:
+            resolver._declare(param)
+            resolver._define(param)
+        function = Function(name, params, self._parse_block())
+        resolver._end_scope(function)
+        resolver.current_function = pre_function
+        resolver._declare_slot(function, slot)
+        return function
+
+    def _parse_var_declaration(self) -> Stmt:
+        token = self._ensure(TokenType.IDENTIFIER, 'Expect a identifier after var.')
+        slot = self.resolver._declare(token)
+        initializer = None
+        if self._match_any_type(TokenType.EQUAL):
+            initializer = self._parse_expression()
+        self._ensure(TokenType.SEMICOLON, "expected ';' after var statement")
+        self.resolver._define(token)
+        var = Var(token, initializer)
+        self.resolver._declare_slot(var, slot)
+        return var
+
+    def _parse_statement(self) -> Stmt:
+        if self._match_any_type(TokenType.LEFT_BRACE):
+            self.resolver._begin_scope()
+            block = Block(self._parse_block())
+            self.resolver._end_scope(block)
+            return block
+        return super()._parse_statement()
+
+    def _parse_return(self) -> Stmt:
+        keyword = self._peek_pre()
+        value = None
+        self.resolver._check_return(keyword, not self._is_match(TokenType.SEMICOLON))
+        if not self._is_match(TokenType.SEMICOLON):
+            value = self._parse_expression()
+        self._ensure(TokenType.SEMICOLON, "expect ';' after return value")
+        return Return(keyword, value)
+
+    # 展开方式同Parser._parse_for, 展开后的每个Block都对应一层作用域
+    def _parse_for(self) -> Stmt:
+        resolver = self.resolver
+        self._ensure(TokenType.LEFT_PAREN, "expect '(' after for")
+        initializer = None
+        if self._match_any_type(TokenType.VAR):
+            resolver._begin_scope()
+            initializer = self._parse_var_declaration()
+        elif self._match_any_type(TokenType.SEMICOLON):
+            initializer = None
+        else:
+            resolver._begin_scope()
+            initializer = self._parse_expr_stmt()
+
+        condition = Literal(True)
+        if not self._is_match(TokenType.SEMICOLON):
+            condition = self._parse_expression()
+        self._ensure(TokenType.SEMICOLON, "expect ';' after condition")
+
+        # 循环体和increment包在同一个Block中
+        increment = None
+        if not self._is_match(TokenType.RIGHT_PAREN):
+            resolver._begin_scope()
+            increment = self._parse_expression()
+        self._ensure(TokenType.RIGHT_PAREN, "expect ')' after clauses")
+
+        body = self._parse_statement()
+
+        if increment is not None:
+            body = Block([body, Expression(increment)])
+            resolver._end_scope(body)
+        body = While(condition, body)
+        if initializer is not None:
+            body = Block([initializer, body])
+            resolver._end_scope(body)
+        return body
+
+    def _parse_precedence(self, precedence: int) -> Expr:
+        # 同clox, 只有在最低优先级下, 变量后面的'='才会被当作赋值
+        self.can_assign = precedence <= Precedence.ASSIGNMENT
+        return super()._parse_precedence(precedence)
+
+    def _parse_variable(self) -> Expr:
+        expr = Variable(self._peek_pre())
+        # 赋值的目标等右边解析完以后再绑定, 和Resolver.visit_assign的顺序一致
+        if not (self.can_assign and self._is_match(TokenType.EQUAL)):
+            self.resolver.visit_variable(expr)
+        return expr
+
+    def _parse_assign(self, left: Expr) -> Expr:
+        expr = super()._parse_assign(left)
+        if isinstance(expr, Assign):
+            self.resolver._resolve_local(expr, expr.name)
+        return expr
+
+    def _parse_this(self) -> Expr:
+        expr = super()._parse_this()
+        self.resolver.visit_this(expr)
+        return expr
+
+    def _parse_super(self) -> Expr:
+        expr = super()._parse_super()
+        self.resolver.visit_super(expr)
+        return expr
+
+FusedParser.rules = make_rules(FusedParser)
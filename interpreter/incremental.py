@@ -0,0 +1,215 @@
+from __future__ import annotations
+from typing import Iterator
+
+from interpreter.expr import Expr
+from interpreter.lox import Lox
+from interpreter.parser import Parser
+from interpreter.resolver import Resolver
+from interpreter.scanner import Scanner
+from interpreter.stmt import Stmt
+from interpreter.token_ import Token, TokenType
+
+
+# 一条顶层语句及其在源码中的范围
+class Segment:
+    # 第一个token的起点和最后一个token的终点 [start, end)
+    start: int
+    end: int
+    # 紧跟在后面的token的起点, 语句的解析结果可能依赖它(比如if后面的else)
+    follow: int
+    stmt: Stmt
+    # 这条语句消费掉的所有token, 行号平移时要用
+    tokens: list[Token]
+    # 这条语句内的变量绑定深度
+    local_map: dict[Expr, int]
+    has_error: bool
+
+    def __init__(self, start, end, follow, stmt, tokens, local_map, has_error):
+        self.start = start
+        self.end = end
+        self.follow = follow
+        self.stmt = stmt
+        self.tokens = tokens
+        self.local_map = local_map
+        self.has_error = has_error
+
+
+# Resolver只会调用resolve, declare和allocate, 用它把绑定深度收集到每条语句自己的map里
+# 增量前端不执行代码, 槽位和作用域大小用不到
+class LocalCollector:
+    local_map: dict[Expr, int]
+
+    def __init__(self):
+        self.local_map = {}
+
+    def resolve(self, expr: Expr, depth: int, slot: int) -> None:
+        self.local_map[expr] = depth
+
+    def declare(self, stmt: Stmt, slot: int) -> None:
+        pass
+
+    def allocate(self, scope: Stmt, size: int) -> None:
+        pass
+
+    def resolve_global(self, node: Expr | Stmt, name: Token) -> None:
+        pass
+
+
+# 扫描器的包装, 记录最近产出的两个token在源码中的位置
+class TrackedTokens:
+    scanner: Scanner
+    # 自上一条语句结束以来产出的token
+    pending: list[Token]
+    # 最近一个token(也就是parser的lookahead)的起点
+    start: int
+    # 倒数第二个token(也就是parser刚消费掉的token)的终点
+    pre_end: int
+    end: int
+
+    def __init__(self, scanner):
+        self.scanner = scanner
+        self.pending = []
+        self.start = scanner.current
+        self.pre_end = scanner.current
+        self.end = scanner.current
+
+    def __iter__(self) -> Iterator[Token]:
+        for token in self.scanner.iter_tokens():
+            self.pre_end = self.end
+            if token.type == TokenType.EOF:
+                self.start = self.end = len(self.scanner.source)
+            else:
+                self.start, self.end = self.scanner.start, self.scanner.current
+            self.pending.append(token)
+            yield token
+
+
+# 增量前端: 编辑之后只重新扫描/解析/绑定受影响的顶层语句
+# 顶层语句之间的变量绑定互不影响(全局变量不进resolver的作用域), 所以没变的语句可以直接复用
+class Document:
+    source: str
+    segments: list[Segment]
+    # segments[:gap]记录的是绝对位置, segments[gap:]记录的是相对源码末尾的位置(<= 0)
+    # 在gap之后编辑时, 后面的语句位置不用逐个平移
+    gap: int
+
+    def __init__(self, source):
+        self.source = source
+        self.segments = []
+        self.gap = 0
+        self.segments, _ = self._parse_from(0, 1, 0)
+        self.gap = len(self.segments)
+
+    # 用text替换源码中[start, end)的部分
+    def edit(self, start: int, end: int, text: str) -> None:
+        old = self.source
+        line_delta = text.count('\n') - old.count('\n', start, end)
+
+        # 第一个受影响的语句: 它后面的token碰到了编辑范围
+        first = self._find_first(start)
+        # 编辑范围之后的语句都可能被复用
+        last = first
+        while last < len(self.segments) and self._start(last) <= end:
+            last += 1
+        self._move_gap(last)
+        if line_delta != 0:
+            # token里记录的是绝对行号, 换行数变化时后面的token都要平移
+            for segment in self.segments[last:]:
+                for token in segment.tokens:
+                    token.line += line_delta
+
+        if first == 0:
+            offset, line = 0, 1
+        else:
+            pre = self.segments[first - 1]
+            offset, line = pre.end, pre.tokens[-1].line
+        self.source = old[:start] + text + old[end:]
+        segments, reuse = self._parse_from(offset, line, last)
+        self.segments[first:reuse] = segments
+        self.gap = first + len(segments)
+
+    def statements(self) -> list[Stmt]:
+        return [s.stmt for s in self.segments]
+
+    def local_map(self) -> dict[Expr, int]:
+        ret = {}
+        for s in self.segments:
+            ret.update(s.local_map)
+        return ret
+
+    def had_error(self) -> bool:
+        return any(s.has_error for s in self.segments)
+
+    def _start(self, i: int) -> int:
+        segment = self.segments[i]
+        return segment.start if i < self.gap else segment.start + len(self.source)
+
+    def _follow(self, i: int) -> int:
+        segment = self.segments[i]
+        return segment.follow if i < self.gap else segment.follow + len(self.source)
+
+    # 二分查找第一个follow >= offset的语句
+    def _find_first(self, offset: int) -> int:
+        lo, hi = 0, len(self.segments)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._follow(mid) < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    # 编辑一般是局部的, gap每次只需要移动很短的距离
+    def _move_gap(self, index: int) -> None:
+        size = len(self.source)
+        while self.gap < index:
+            segment = self.segments[self.gap]
+            segment.start += size
+            segment.end += size
+            segment.follow += size
+            self.gap += 1
+        while self.gap > index:
+            self.gap -= 1
+            segment = self.segments[self.gap]
+            segment.start -= size
+            segment.end -= size
+            segment.follow -= size
+
+    # 从offset处开始逐条解析顶层语句, 直到和segments[tail:]中某条旧语句的起点对齐
+    # 返回新解析出的语句, 以及从哪条旧语句开始复用
+    def _parse_from(self, offset: int, line: int, tail: int) -> tuple[list[Segment], int]:
+        scanner = Scanner(self.source)
+        scanner.current = offset
+        scanner.line = line
+        tokens = TrackedTokens(scanner)
+        parser = Parser(tokens)
+
+        segments = []
+        i = tail
+        while not parser._is_at_end():
+            # gap之后的位置是相对源码末尾的
+            relative = tokens.start - len(self.source)
+            while i < len(self.segments) and self.segments[i].start < relative:
+                i += 1
+            if i < len(self.segments) and self.segments[i].start == relative:
+                # 从这里开始的源码和编辑前完全一样, 后面的语句直接复用
+                return segments, i
+            segments.append(self._parse_declaration(parser, tokens))
+        return segments, len(self.segments)
+
+    def _parse_declaration(self, parser: Parser, tokens: TrackedTokens) -> Segment:
+        had_error = Lox.had_error
+        Lox.had_error = False
+
+        start = tokens.start
+        stmt = parser._parse_declaration()
+        # 最后一个token是下一条语句的lookahead, 不属于这条语句
+        consumed, tokens.pending = tokens.pending[:-1], tokens.pending[-1:]
+
+        collector = LocalCollector()
+        if not Lox.had_error:
+            Resolver(collector).resolve([stmt])
+
+        segment = Segment(start, tokens.pre_end, tokens.start, stmt, consumed, collector.local_map, Lox.had_error)
+        Lox.had_error = had_error or Lox.had_error
+        return segment
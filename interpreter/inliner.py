@@ -0,0 +1,299 @@
+from interpreter.ast_walk import walk
+from interpreter.env import UNDEFINED
+from interpreter.expr import ExprVisitor, Expr, Assign, Binary, Call, Get, Super, Set, Grouping, Literal, Logical, \
+    This, Unary, Variable
+from interpreter.interpreter_ import Interpreter
+from interpreter.lazy_parser import LazyFunction
+from interpreter.stmt import StmtVisitor, Stmt, Block, Class, Expression, Function, Break, Continue, If, Print, \
+    While, Return, Var
+from interpreter.token_ import TokenType
+
+# 函数体表达式最多有多少个节点
+MAX_SIZE = 16
+# 函数体中可以出现的表达式, 都没有副作用
+PURE_NODES = (Literal, Grouping, Unary, Binary, Logical, Get, Variable, This)
+
+
+# 把小函数的函数体直接替换到调用处, 省掉 visit_call -> LoxFunction.call -> 新的Env -> ReturnException 这一串开销
+# 只内联满足下面条件的函数:
+#   顶层声明, 同名的全局变量只声明一次, 也没有被赋值过, 所以调用时一定还是这个函数
+#   函数体只有一句 return 表达式, 表达式中没有调用和赋值, 所以也不会递归
+#   表达式只用到形参和全局变量; 方法(用到this)和闭包(用到外层的局部变量)不内联
+# 调用处必须在函数声明之后, 这样执行到调用处时函数已经定义好了
+# 在Resolver之后运行, 替换进去的节点在interpreter.local_map中的深度, 在slot_map中的槽位都和原来的实参相同
+class Inliner(ExprVisitor, StmtVisitor):
+    interpreter: Interpreter
+    # 可以内联的函数中, 已经声明过的
+    available: dict[str, Function]
+    # 可以内联的函数
+    candidates: dict[str, Function]
+    # 已经声明过的全局变量, 读取它们不会出错
+    defined: set[str]
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.available = {}
+        self.candidates = {}
+        outermost = interpreter.outermost
+        self.defined = {name for name in outermost.names if outermost.lookup(name) is not UNDEFINED}
+
+    def inline(self, stmts: list[Stmt]) -> list[Stmt]:
+        self.candidates = self._find_candidates(stmts)
+        # 没有可以内联的函数时不用遍历, 还没解析的函数体(body为None)也不会被访问到
+        if not self.candidates:
+            return stmts
+        for stmt in stmts:
+            stmt.accept(self)
+            if isinstance(stmt, (Var, Function, Class)):
+                self.defined.add(stmt.name.lexeme)
+            if isinstance(stmt, Function) and self.candidates.get(stmt.name.lexeme) is stmt:
+                self.available[stmt.name.lexeme] = stmt
+        return stmts
+
+    def _find_candidates(self, stmts: list[Stmt]) -> dict[str, Function]:
+        local_map = self.interpreter.local_map
+        declared: dict[str, int] = {}
+        for stmt in stmts:
+            if isinstance(stmt, (Var, Function, Class)):
+                declared[stmt.name.lexeme] = declared.get(stmt.name.lexeme, 0) + 1
+
+        assigned = set()
+        for node in walk(stmts):
+            if isinstance(node, LazyFunction) and not node.loaded:
+                # 还没解析的函数体中可能给任何全局变量赋值
+                return {}
+            if isinstance(node, Assign) and node not in local_map:
+                assigned.add(node.name.lexeme)
+
+        candidates = {}
+        for stmt in stmts:
+            if isinstance(stmt, Function) and declared[stmt.name.lexeme] == 1 \
+                    and stmt.name.lexeme not in assigned and self._inlinable_body(stmt):
+                candidates[stmt.name.lexeme] = stmt
+        return candidates
+
+    def _inlinable_body(self, stmt: Function) -> bool:
+        if len(stmt.body) != 1 or not isinstance(stmt.body[0], Return) or stmt.body[0].value is None:
+            return False
+        params = {p.lexeme for p in stmt.params}
+        nodes = list(walk([stmt.body[0].value]))
+        if len(nodes) > MAX_SIZE:
+            return False
+        for node in nodes:
+            if not isinstance(node, PURE_NODES) or isinstance(node, This):
+                return False
+            # 顶层函数中解析成局部变量的只能是形参
+            if isinstance(node, Variable) and node in self.interpreter.local_map and node.name.lexeme not in params:
+                return False
+        return True
+
+    # 读局部变量或者已经声明过的全局变量
+    def _is_defined_read(self, expr: Expr) -> bool:
+        if expr in self.interpreter.local_map:
+            return isinstance(expr, (Variable, This))
+        return isinstance(expr, Variable) and expr.name.lexeme in self.defined
+
+    # 实参分成三类: 常量和读变量这种不会出错也没有副作用的, 没有副作用但可能出错的, 其他
+    def _classify(self, arg: Expr) -> str:
+        if isinstance(arg, Literal) or self._is_defined_read(arg):
+            return 'trivial'
+        if all(isinstance(node, PURE_NODES) for node in walk([arg])):
+            return 'pure'
+        return 'other'
+
+    # 原来的求值顺序是: 依次对实参求值, 再对函数体求值
+    # 替换以后实参在函数体中用到的位置求值, 要保证能观察到的行为不变:
+    #   可能出错的实参恰好用到一次, 不在短路运算的右边, 按形参的顺序出现,
+    #   并且在最后一个这样的实参求值之前, 函数体中没有可能出错的运算
+    def _can_substitute(self, function: Function, kinds: list[str]) -> bool:
+        if 'other' in kinds:
+            return False
+        params = {p.lexeme: i for i, p in enumerate(function.params)}
+        reads = []
+        failing = []
+
+        def visit(expr: Expr, conditional: bool) -> None:
+            if isinstance(expr, Variable):
+                if expr.name.lexeme in params and expr in self.interpreter.local_map:
+                    reads.append((params[expr.name.lexeme], conditional, len(failing)))
+                elif not self._is_defined_read(expr):
+                    # 读全局变量, 可能没有定义
+                    failing.append(expr)
+            elif isinstance(expr, Grouping):
+                visit(expr.expression, conditional)
+            elif isinstance(expr, Unary):
+                visit(expr.right, conditional)
+                if expr.operator.type == TokenType.MINUS:
+                    failing.append(expr)
+            elif isinstance(expr, Binary):
+                visit(expr.left, conditional)
+                visit(expr.right, conditional)
+                if expr.operator.type not in (TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
+                    failing.append(expr)
+            elif isinstance(expr, Logical):
+                visit(expr.left, conditional)
+                visit(expr.right, True)
+            elif isinstance(expr, Get):
+                visit(expr.object, conditional)
+                failing.append(expr)
+
+        visit(function.body[0].value, False)
+        pure_reads = [(i, conditional, before) for i, conditional, before in reads if kinds[i] == 'pure']
+        for i, kind in enumerate(kinds):
+            if kind == 'pure' and sum(1 for read in pure_reads if read[0] == i) != 1:
+                return False
+        if any(conditional or before > 0 for _, conditional, before in pure_reads):
+            return False
+        order = [i for i, _, _ in pure_reads]
+        return order == sorted(order)
+
+    def _substitute(self, function: Function, args: list[Expr]) -> Expr:
+        local_map, global_map = self.interpreter.local_map, self.interpreter.global_map
+        params = {p.lexeme: arg for p, arg in zip(function.params, args)}
+
+        def copy(node):
+            if isinstance(node, list):
+                return [copy(n) for n in node]
+            if not isinstance(node, Expr):
+                return node
+            if isinstance(node, Variable) and node.name.lexeme in params and node in local_map:
+                return _clone(params[node.name.lexeme], self.interpreter)
+            new = type(node)(*[copy(getattr(node, name)) for name in type(node).FIELDS])
+            if node in global_map:
+                global_map[new] = global_map[node]
+            return new
+
+        return copy(function.body[0].value)
+
+    def _inline_stmts(self, stmts: list[Stmt]) -> None:
+        for stmt in stmts:
+            stmt.accept(self)
+
+    # 表达式, 返回替换后的表达式
+
+    def visit_assign(self, expr: Assign) -> object:
+        expr.value = expr.value.accept(self)
+        return expr
+
+    def visit_binary(self, expr: Binary) -> object:
+        expr.left = expr.left.accept(self)
+        expr.right = expr.right.accept(self)
+        return expr
+
+    def visit_call(self, expr: Call) -> object:
+        expr.callee = expr.callee.accept(self)
+        expr.arguments = [a.accept(self) for a in expr.arguments]
+        callee = expr.callee
+        if not isinstance(callee, Variable) or callee in self.interpreter.local_map:
+            return expr
+        function = self.available.get(callee.name.lexeme)
+        if function is None or len(function.params) != len(expr.arguments):
+            return expr
+        if not self._can_substitute(function, [self._classify(a) for a in expr.arguments]):
+            return expr
+        return self._substitute(function, expr.arguments)
+
+    def visit_get(self, expr: Get) -> object:
+        expr.object = expr.object.accept(self)
+        return expr
+
+    def visit_super(self, expr: Super) -> object:
+        return expr
+
+    def visit_set(self, expr: Set) -> object:
+        expr.object = expr.object.accept(self)
+        expr.value = expr.value.accept(self)
+        return expr
+
+    def visit_grouping(self, expr: Grouping) -> object:
+        expr.expression = expr.expression.accept(self)
+        return expr
+
+    def visit_literal(self, expr: Literal) -> object:
+        return expr
+
+    def visit_logical(self, expr: Logical) -> object:
+        expr.left = expr.left.accept(self)
+        expr.right = expr.right.accept(self)
+        return expr
+
+    def visit_this(self, expr: This) -> object:
+        return expr
+
+    def visit_unary(self, expr: Unary) -> object:
+        expr.right = expr.right.accept(self)
+        return expr
+
+    def visit_variable(self, expr: Variable) -> object:
+        return expr
+
+    # 语句, 原地改写
+
+    def visit_block(self, stmt: Block) -> object:
+        self._inline_stmts(stmt.statements)
+        return None
+
+    def visit_class(self, stmt: Class) -> object:
+        for m in stmt.methods:
+            self._inline_stmts(m.body)
+        return None
+
+    def visit_expression(self, stmt: Expression) -> object:
+        stmt.expression = stmt.expression.accept(self)
+        return None
+
+    def visit_function(self, stmt: Function) -> object:
+        self._inline_stmts(stmt.body)
+        return None
+
+    def visit_break(self, stmt: Break) -> object:
+        return None
+
+    def visit_continue(self, stmt: Continue) -> object:
+        return None
+
+    def visit_if(self, stmt: If) -> object:
+        stmt.condition = stmt.condition.accept(self)
+        stmt.then_branch.accept(self)
+        if stmt.else_branch is not None:
+            stmt.else_branch.accept(self)
+        return None
+
+    def visit_print(self, stmt: Print) -> object:
+        stmt.expression = stmt.expression.accept(self)
+        return None
+
+    def visit_while(self, stmt: While) -> object:
+        stmt.condition = stmt.condition.accept(self)
+        stmt.body.accept(self)
+        return None
+
+    def visit_return(self, stmt: Return) -> object:
+        if stmt.value is not None:
+            stmt.value = stmt.value.accept(self)
+        return None
+
+    def visit_var(self, stmt: Var) -> object:
+        if stmt.initializer is not None:
+            stmt.initializer = stmt.initializer.accept(self)
+        return None
+
+
+# 复制一个表达式, 新节点的绑定深度和槽位(或全局变量的下标)和原来的相同
+def _clone(expr: Expr, interpreter: Interpreter) -> Expr:
+    local_map, slot_map, global_map = interpreter.local_map, interpreter.slot_map, interpreter.global_map
+
+    def copy(node):
+        if isinstance(node, list):
+            return [copy(n) for n in node]
+        if not isinstance(node, Expr):
+            return node
+        new = type(node)(*[copy(getattr(node, name)) for name in type(node).FIELDS])
+        if node in local_map:
+            local_map[new] = local_map[node]
+            slot_map[new] = slot_map[node]
+        elif node in global_map:
+            global_map[new] = global_map[node]
+        return new
+
+    return copy(expr)
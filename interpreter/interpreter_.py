@@ -1,4 +1,8 @@
-from interpreter.env import Env
+from __future__ import annotations
+from types import MethodType
+
+from interpreter.counting_loop import CountingLoop, match_counting_loop
+from interpreter.env import Env, Cell
 from interpreter.error import RuntimeException, BreakException, ReturnException
 from interpreter.expr import ExprVisitor, Expr, Binary, Grouping, Literal, Unary, Variable, Assign, Logical, Call, Get, \
     Set, This, Super
@@ -6,26 +10,111 @@ from interpreter.lox import Lox
 from interpreter.stmt import StmtVisitor, Print, Expression, Stmt, Var, Block, If, While, Continue, Break, Function, \
     Return, Class
 from interpreter.token_ import TokenType, Token
+from interpreter import quicken
 
 
 class Interpreter(ExprVisitor, StmtVisitor):
     outermost: Env
     env: Env
     local_map: dict[Expr, int]
+    slot_map: dict[Expr | Stmt, int]
+    frame_sizes: dict[Stmt, int]
+    global_map: dict[Expr | Stmt, int]
+    share_frames: bool
+    frame_pools: dict[Function | Block, list[Env]]
+    flat_closures: bool
+    upvalue_map: dict[Expr, int | tuple[int, int]]
+    captures: dict[Function, list[tuple[str, Variable]]]
+    cell_decls: set[Stmt]
+    cell_params: dict[Function, list[int]]
+    fast_loops: bool
+    counting_loops: dict[While, CountingLoop | None]
+    number_ops: dict[Expr, object]
+    quicken: bool
+    call_targets: dict[Expr, object]
+    memo_size: int
+    handlers: 'Handlers'
 
     def __init__(self):
-        from interpreter.callable import Clock
+        from interpreter.callable import Clock, Memoize
         # 最外层环境
         self.outermost = Env()
+        self.outermost.names = {}
         # 当前所在环境
         self.env = self.outermost
         # 注册内置函数
         self.outermost.define('clock', Clock())
+        self.outermost.define('memoize', Memoize())
         # 在当前作用域和变量定义的作用域之间隔着多少层作用域
         self.local_map = {}
-
-    def resolve(self, expr: Expr, depth: int) -> None:
+        # 读写局部变量的节点 -> 变量在它的作用域中的槽位; 局部的声明语句 -> 声明的变量的槽位
+        self.slot_map = {}
+        # Block和函数 -> 它的作用域有多少个槽位
+        self.frame_sizes = {}
+        # 读写全局变量的节点和全局的声明语句 -> 变量在全局变量表(outermost.values)中的下标
+        self.global_map = {}
+        # 是否让没有被闭包捕获的作用域共用或重复使用帧, 见Resolver.analyze_escapes
+        self.share_frames = True
+        # 没有被闭包捕获的函数和顶层Block -> 执行结束后放回来的帧, 下次执行时重复使用
+        self.frame_pools = {}
+        # 闭包是否只捕获用到的变量, 见Resolver.flatten_closures; 为False时闭包引用创建它时的整个环境
+        self.flat_closures = False
+        # 读写外层函数的变量的节点 -> 在正在执行的函数的cells中的下标; super是(super的下标, this的下标)
+        self.upvalue_map = {}
+        # 函数 -> 创建闭包时依次捕获的变量: ('cell', 读槽位中的Cell), ('value', 读this或super的值),
+        # ('upvalue', 从外层函数的cells中取), 读变量的节点在创建闭包的作用域中绑定
+        self.captures = {}
+        # 被闭包捕获的局部的声明, 槽位上存Cell
+        self.cell_decls = set()
+        # 函数 -> 被闭包捕获的形参的槽位
+        self.cell_params = {}
+        # 是否用Python的循环直接执行计数循环, 见counting_loop
+        self.fast_loops = True
+        # while语句 -> 计数循环, 不是计数循环时为None
+        self.counting_loops = {}
+        # 操作数一定是数字的运算 -> 不检查类型的Python运算, 见type_inference
+        self.number_ops = {}
+        # 是否把执行过的运算节点特化, 见quicken
+        self.quicken = True
+        # 只声明一次, 从来没被赋值过的顶层函数和类的名字, 见Resolver.find_fixed_globals
+        self.fixed_globals = set()
+        # quicken.DirectCall调用处 -> 被调用的函数或类
+        self.call_targets = {}
+        # 内置函数memoize给函数加的缓存最多存多少个结果
+        self.memo_size = 1024
+        # 节点类 -> 执行函数
+        self.handlers = Handlers(self)
+
+    def resolve(self, expr: Expr, depth: int, slot: int) -> None:
         self.local_map[expr] = depth
+        self.slot_map[expr] = slot
+
+    def declare(self, stmt: Stmt, slot: int) -> None:
+        self.slot_map[stmt] = slot
+
+    def allocate(self, scope: Stmt, size: int) -> None:
+        self.frame_sizes[scope] = size
+
+    # 读写全局变量的节点换成quicken.GlobalVariable和GlobalAssign, 执行时直接按下标读写, 不再查local_map
+    def resolve_global(self, node: Expr | Stmt, name: Token) -> None:
+        self.global_map[node] = self.outermost.index(name.lexeme)
+        if isinstance(node, Variable):
+            node.__class__ = quicken.GlobalVariable
+        elif isinstance(node, Assign):
+            node.__class__ = quicken.GlobalAssign
+
+    # 绑定的结果, 和语法树一起缓存, 见ast_cache
+    # 全局变量按名字缓存, 加载时按原来的顺序分配下标, 和缓存时的下标相同
+    def bindings(self) -> dict[str, object]:
+        bindings = {name: getattr(self, name) for name in BINDINGS}
+        bindings['globals'] = list(self.outermost.names)
+        return bindings
+
+    def load_bindings(self, bindings: dict[str, object]) -> None:
+        for name in BINDINGS:
+            setattr(self, name, bindings[name])
+        for name in bindings['globals']:
+            self.outermost.index(name)
 
     def interpret(self, stmts: list[Stmt]) -> None:
         try:
@@ -34,8 +123,9 @@ class Interpreter(ExprVisitor, StmtVisitor):
         except RuntimeException as e:
             Lox.runtime_error(e)
 
+    # 按节点类查表执行, 比stmt.accept(self)少一层函数调用, 也能执行特化过的节点
     def execute(self, stmt: Stmt) -> None:
-        stmt.accept(self)
+        self.handlers[type(stmt)](stmt)
 
     def visit_expression(self, stmt: Expression) -> object:
         self.evaluate(stmt.expression)
@@ -56,6 +146,13 @@ class Interpreter(ExprVisitor, StmtVisitor):
         pass
 
     def visit_while(self, stmt: While) -> object:
+        if self.fast_loops:
+            loop = self.counting_loops.get(stmt, stmt)
+            if loop is stmt:
+                loop = self.counting_loops[stmt] = match_counting_loop(stmt, self.local_map, self.frame_sizes)
+            if loop is not None:
+                self._run_counting_loop(loop)
+                return None
         while self._is_true(self.evaluate(stmt.condition)):
             try:
                 self.execute(stmt.body)
@@ -65,6 +162,37 @@ class Interpreter(ExprVisitor, StmtVisitor):
                 break
         return None
 
+    # 比较和自增直接用Python的float运算, 不再经过Binary, Assign节点
+    # 循环变量每次都从作用域中重新读, 循环前声明的闭包修改了它也能看到
+    # 操作数不是数字时交给_binary, 报同样的错误
+    # 循环体和外层共用帧时(见Resolver.analyze_escapes)直接在当前的帧中执行
+    def _run_counting_loop(self, loop: CountingLoop) -> None:
+        values = self.env.values
+        slot, size = self.slot_map[loop.counter], self.frame_sizes.get(loop.block)
+        compare, limit, body, step = loop.compare, loop.limit, loop.body, loop.step
+        constant = limit.value if isinstance(limit, Literal) else None
+        while True:
+            i = values[slot]
+            bound = self.evaluate(limit) if constant is None else constant
+            if type(i) is float and type(bound) is float:
+                if not compare(i, bound):
+                    break
+            elif not self._is_true(self._binary(loop.operator, i, bound)):
+                break
+            try:
+                if size is None:
+                    for stmt in body:
+                        self.execute(stmt)
+                else:
+                    self.execute_block(body, Env(self.env, size))
+            except BreakException:
+                break
+            i = values[slot]
+            if type(i) is float:
+                values[slot] = i + step
+            else:
+                values[slot] = self._binary(loop.increment.operator, i, loop.increment.right.value)
+
     def visit_if(self, stmt: If) -> object:
         cond = self._is_true(self.evaluate(stmt.condition))
         if cond:
@@ -83,45 +211,101 @@ class Interpreter(ExprVisitor, StmtVisitor):
         val = None
         if stmt.initializer is not None:
             val = self.evaluate(stmt.initializer)
-        self.env.define(stmt.name.lexeme, val)
+        self._define(stmt, val)
         return None
 
+    # 局部的声明写进Resolver分配的槽位, 被闭包捕获的放在Cell中; 全局的写进全局变量表
+    # 没有绑定结果的全局声明(比如从Arena转换回来的语法树)按名字定义
+    def _define(self, stmt: Var | Function | Class, value: object) -> None:
+        slot = self.slot_map.get(stmt)
+        if slot is not None:
+            self.env.values[slot] = Cell(value) if stmt in self.cell_decls else value
+            return
+        index = self.global_map.get(stmt)
+        if index is None:
+            self.outermost.define(stmt.name.lexeme, value)
+        else:
+            self.outermost.values[index] = value
+
     def visit_class(self, stmt: Class) -> object:
         from interpreter.callable import LoxClass, LoxFunction
-        self.env.define(stmt.name.lexeme, None)
+        self._define(stmt, None)
 
         super_class = None
+        # 扁平的闭包只捕获用到的变量, 方法的环境中只有super
+        closure = None if self.flat_closures else self.env
         if stmt.super_class is not None:
             super_class = self.evaluate(stmt.super_class)
             if not isinstance(super_class, LoxClass):
                 raise RuntimeException(stmt.super_class.name, 'super class must be a class')
             # 新建一个环境 绑定super关键字
-            self.env = Env(self.env)
-            self.env.define('super', super_class)
+            closure = Env(closure, 1)
+            closure.values[0] = super_class
 
         methods = {}
         for m in stmt.methods:
             # 如果当前类有父类的话, 当前m所在的环境就包含了super
-            func = LoxFunction(m, self.env, m.name.lexeme == 'init')
+            cells = self._capture(self.captures[m]) if self.flat_closures else None
+            func = LoxFunction(m, closure, m.name.lexeme == 'init', cells)
             methods[m.name.lexeme] = func
 
         klass = LoxClass(stmt.name.lexeme, super_class, methods)
 
-        if stmt.super_class is not None:
-            self.env = self.env.parent
-
         # 这个二阶段的变量绑定过程允许在类的方法中引用其自身
-        self.env.assign(stmt.name, klass)
+        # 方法捕获的是第一次定义时的Cell, 要写进同一个Cell
+        if stmt in self.cell_decls:
+            self.env.values[self.slot_map[stmt]].value = klass
+        else:
+            self._define(stmt, klass)
         return None
 
     def visit_function(self, stmt: Function) -> object:
         from interpreter.callable import LoxFunction
-        func = LoxFunction(stmt, self.env, False)
-        self.env.define(stmt.name.lexeme, func)
+        if not self.flat_closures:
+            self._define(stmt, LoxFunction(stmt, self.env, False))
+            return None
+        # 局部函数调用自己时捕获的是自己的Cell, 要在创建闭包之前放进槽位
+        cell = None
+        if stmt in self.cell_decls:
+            cell = self.env.values[self.slot_map[stmt]] = Cell(None)
+        func = LoxFunction(stmt, None, False, self._capture(self.captures[stmt]))
+        if cell is None:
+            self._define(stmt, func)
+        else:
+            cell.value = func
         return None
 
+    # 创建闭包时按顺序取出捕获的变量, 见Resolver.flatten_closures
+    def _capture(self, sources: list[tuple[str, Variable]]) -> list[Cell]:
+        cells = []
+        for kind, source in sources:
+            if kind == 'upvalue':
+                cells.append(self.env.cells[self.upvalue_map[source]])
+                continue
+            distance = self.local_map[source]
+            env = self.env
+            while distance:
+                env = env.parent
+                distance -= 1
+            value = env.values[self.slot_map[source]]
+            cells.append(value if kind == 'cell' else Cell(value))
+        return cells
+
+    # 没有大小的Block和外层共用帧, 见Resolver.analyze_escapes
     def visit_block(self, stmt: Block) -> object:
-        self.execute_block(stmt.statements, Env(self.env))
+        size = self.frame_sizes.get(stmt)
+        if size is None:
+            for s in stmt.statements:
+                self.execute(s)
+            return None
+        # 顶层的Block不会重入, 池中最多一个帧, 外层总是全局变量表
+        pool = self.frame_pools.get(stmt)
+        env = pool.pop() if pool else Env(self.env, size)
+        try:
+            self.execute_block(stmt.statements, env)
+        finally:
+            if pool is not None:
+                pool.append(env)
         return None
 
     def execute_block(self, stmts: list[Stmt], env: Env) -> None:
@@ -141,20 +325,26 @@ class Interpreter(ExprVisitor, StmtVisitor):
         return str(val)
 
     def evaluate(self, expr: Expr) -> object:
-        return expr.accept(self)
+        return self.handlers[type(expr)](expr)
 
     def visit_assign(self, expr: Assign) -> object:
         val = self.evaluate(expr.value)
 
-        if expr in self.local_map.keys():
-            distance = self.local_map[expr]
-            self.env.assign_at(distance, expr.name, val)
-        else:
+        distance = self.local_map.get(expr)
+        if distance is None:
             self.outermost.assign(expr.name, val)
+            return val
+        env = self.env
+        while distance:
+            env = env.parent
+            distance -= 1
+        env.values[self.slot_map[expr]] = val
         # 赋值是表达式 要返回值的
         return val
 
     def visit_logical(self, expr: Logical) -> object:
+        if self.quicken:
+            expr.__class__ = quicken.specialize_logical(expr)
         left = self.evaluate(expr.left)
         # 短路逻辑
         if expr.operator.type == TokenType.OR:
@@ -166,33 +356,41 @@ class Interpreter(ExprVisitor, StmtVisitor):
         return self.evaluate(expr.right)
 
     def visit_binary(self, expr: Binary) -> object:
+        op = self.number_ops.get(expr)
         left = self.evaluate(expr.left)
         right = self.evaluate(expr.right)
-
-        op_type = expr.operator.type
+        if self.quicken:
+            expr.__class__ = quicken.specialize_binary(expr, left, right, op is not None)
+        if op is not None:
+            return op(left, right)
+        return self._binary(expr.operator, left, right)
+
+    # 二元运算, 操作数已经求值
+    def _binary(self, operator: Token, left: object, right: object) -> object:
+        op_type = operator.type
         if op_type == TokenType.BANG_EQUAL:
             return not self._is_equal(left, right)
         if op_type == TokenType.EQUAL_EQUAL:
             return self._is_equal(left, right)
         if op_type == TokenType.GREATER:
-            self._ensure_number_operands(expr.operator, left, right)
+            self._ensure_number_operands(operator, left, right)
             return float(left) > float(right)
         if op_type == TokenType.GREATER_EQUAL:
-            self._ensure_number_operands(expr.operator, left, right)
+            self._ensure_number_operands(operator, left, right)
             return float(left) >= float(right)
         if op_type == TokenType.LESS:
-            self._ensure_number_operands(expr.operator, left, right)
+            self._ensure_number_operands(operator, left, right)
             return float(left) < float(right)
         if op_type == TokenType.LESS_EQUAL:
-            self._ensure_number_operands(expr.operator, left, right)
+            self._ensure_number_operands(operator, left, right)
             return float(left) <= float(right)
 
         if op_type == TokenType.PLUS:
             if (not isinstance(left, float)) and (not isinstance(left, str)):
-                raise RuntimeException(expr.operator, 'left operand must be number or string.')
+                raise RuntimeException(operator, 'left operand must be number or string.')
 
             if (not isinstance(right, float)) and (not isinstance(right, str)):
-                raise RuntimeException(expr.operator, 'right operand must be number or string.')
+                raise RuntimeException(operator, 'right operand must be number or string.')
 
             if isinstance(left, float) and isinstance(right, float):
                 return float(left) + float(right)
@@ -200,16 +398,16 @@ class Interpreter(ExprVisitor, StmtVisitor):
             return str(left) + str(right)
 
         if op_type == TokenType.MINUS:
-            self._ensure_number_operands(expr.operator, left, right)
+            self._ensure_number_operands(operator, left, right)
             return float(left) - float(right)
         if op_type == TokenType.STAR:
-            self._ensure_number_operands(expr.operator, left, right)
+            self._ensure_number_operands(operator, left, right)
             return float(left) * float(right)
         if op_type == TokenType.SLASH:
-            self._ensure_number_operands(expr.operator, left, right)
+            self._ensure_number_operands(operator, left, right)
             return float(left) / float(right)
 
-        raise RuntimeException(expr.operator, 'expect a binary expression')
+        raise RuntimeException(operator, 'expect a binary expression')
 
     def visit_grouping(self, expr: Grouping) -> object:
         return self.evaluate(expr.expression)
@@ -219,10 +417,11 @@ class Interpreter(ExprVisitor, StmtVisitor):
 
     def visit_super(self, expr: Super) -> object:
         distance = self.local_map[expr]
-        super_class = self.env.get_at(distance, 'super')
+        # super和this各自单独占一层作用域, 都在0号槽位
+        super_class = self.env.get_at(distance, 0)
         # super.say()
         # 执行这样的调用时 也要给say方法绑一个this, 这个this就是当前super所在方法的this
-        obj = self.env.get_at(distance - 1, 'this')
+        obj = self.env.get_at(distance - 1, 0)
         method = super_class.find_method(expr.method.lexeme)
         return method.bind(obj)
 
@@ -230,16 +429,23 @@ class Interpreter(ExprVisitor, StmtVisitor):
         return self._lookup_variable(expr.keyword, expr)
 
     def visit_unary(self, expr: Unary) -> object:
+        op = self.number_ops.get(expr)
         right = self.evaluate(expr.right)
-
-        op_type = expr.operator.type
+        if self.quicken:
+            expr.__class__ = quicken.specialize_unary(expr, right, op is not None)
+        if op is not None:
+            return op(right)
+        return self._unary(expr.operator, right)
+
+    def _unary(self, operator: Token, right: object) -> object:
+        op_type = operator.type
         if op_type == TokenType.MINUS:
-            self._ensure_number_operands(expr.operator, right)
+            self._ensure_number_operands(operator, right)
             return -float(right)
         if op_type == TokenType.BANG:
             return not self._is_true(right)
 
-        raise RuntimeException(expr.operator, 'expect a unary expression')
+        raise RuntimeException(operator, 'expect a unary expression')
 
     def visit_call(self, expr: Call) -> object:
         # expr.callee是一个variable 所以会拿到env中注册好的函数
@@ -248,14 +454,16 @@ class Interpreter(ExprVisitor, StmtVisitor):
         args = []
         for a in expr.arguments:
             args.append(self.evaluate(a))
+        return self._call(callee, expr.paren, args)
 
+    def _call(self, callee: object, paren: Token, args: list[object]) -> object:
         from interpreter.callable import Callable
         if not isinstance(callee, Callable):
-            raise RuntimeException(expr.paren, 'can only call function and class')
+            raise RuntimeException(paren, 'can only call function and class')
 
         func: Callable = callee
         if len(args) != func.arity():
-            raise RuntimeException(expr.paren, f'expected {func.arity()} arguments but got {len(args)}')
+            raise RuntimeException(paren, f'expected {func.arity()} arguments but got {len(args)}')
 
         return func.call(self, args)
 
@@ -303,7 +511,38 @@ class Interpreter(ExprVisitor, StmtVisitor):
                 raise RuntimeException(token, 'Operand must be a number')
 
     def _lookup_variable(self, name: Token, expr: Expr) -> object:
-        if expr in self.local_map.keys():
-            distance = self.local_map[expr]
-            return self.env.get_at(distance, name.lexeme)
-        return self.outermost.get(name)
+        distance = self.local_map.get(expr)
+        if distance is None:
+            return self.outermost.get(name)
+        # 同Env.get_at, 这里是最热的路径, 少一次方法调用
+        env = self.env
+        while distance:
+            env = env.parent
+            distance -= 1
+        return env.values[self.slot_map[expr]]
+
+
+# 缓存的绑定结果, 见Interpreter.bindings
+BINDINGS = ('local_map', 'slot_map', 'frame_sizes', 'global_map', 'frame_pools', 'flat_closures', 'upvalue_map',
+            'captures', 'cell_decls', 'cell_params', 'fixed_globals')
+
+
+# 节点类 -> 解释器中执行它的方法, 第一次遇到某个类时查找并记下来
+# 特化节点用quicken.HANDLERS中的函数, 其他节点用对应的visit方法, 子类(比如LazyFunction)沿用父类的
+class Handlers(dict):
+    interpreter: Interpreter
+
+    def __init__(self, interpreter):
+        super().__init__()
+        self.interpreter = interpreter
+
+    def __missing__(self, cls: type) -> object:
+        for c in cls.__mro__:
+            if c in quicken.HANDLERS:
+                handler = MethodType(quicken.HANDLERS[c], self.interpreter)
+                break
+            handler = getattr(self.interpreter, 'visit_' + c.__name__.lower(), None)
+            if handler is not None:
+                break
+        self[cls] = handler
+        return handler
@@ -0,0 +1,93 @@
+from interpreter.error import RuntimeException
+from interpreter.lox import Lox
+from interpreter.parser import Parser
+from interpreter.stmt import Stmt, Function
+from interpreter.token_ import Token, TokenType
+
+
+# 函数体只做了括号匹配的函数声明, 第一次调用时才真正解析函数体并做变量绑定
+class LazyFunction(Function):
+    # 函数体的token, 不含开头的'{', 含结尾的'}', 最后补一个EOF
+    tokens: list[Token]
+    # 函数体是否已经解析
+    loaded: bool
+    # resolver遇到这个函数时的状态: 各层作用域的快照(最内层是形参), 函数类型, 类类型
+    scopes: list[dict[str, bool]]
+    function_type: object
+    class_type: object
+
+    def __init__(self, name, params, tokens):
+        super().__init__(name, params, None)
+        self.tokens = tokens
+        self.loaded = False
+        self.scopes = []
+        self.function_type = None
+        self.class_type = None
+
+    # 作用域之后还会声明新的变量, 要拷贝一份, 这样函数体只能看到在它之前声明的变量
+    def defer(self, scopes: list[dict[str, bool]], function_type: object, class_type: object) -> None:
+        self.scopes = [dict(scope) for scope in scopes]
+        self.function_type = function_type
+        self.class_type = class_type
+
+    # 解析函数体, 并在记下的状态中继续变量绑定, 结果写进interpreter.local_map, slot_map和frame_sizes
+    def load(self, interpreter) -> None:
+        from interpreter.resolver import Resolver
+        had_error = Lox.had_error
+        Lox.had_error = False
+
+        # 去掉结尾的'}'按顶层语句解析, 语法错误恢复时不会越过函数体的结尾再报一个缺少'}'的错误
+        body = LazyParser(self.tokens[:-2] + self.tokens[-1:]).parse()
+        if not Lox.had_error:
+            resolver = Resolver(interpreter)
+            resolver.scope_stack = self.scopes
+            resolver.current_function = self.function_type
+            resolver.current_class = self.class_type
+            resolver.resolve(body)
+            interpreter.allocate(self, len(self.scopes[-1]))
+
+        error = Lox.had_error
+        Lox.had_error = had_error or error
+        if error:
+            raise RuntimeException(self.name, f"can not compile function '{self.name.lexeme}'")
+
+        self.body = body
+        self.loaded = True
+        self.tokens = None
+        self.scopes = None
+        if interpreter.flat_closures:
+            Resolver(interpreter).flatten_closures([self])
+        if interpreter.share_frames:
+            Resolver(interpreter).analyze_escapes([self])
+
+
+# 预解析: 函数和方法的函数体只做括号匹配, 不生成语法树
+# 只会被调用到少数函数的大脚本, 可以更快地开始执行第一条语句
+class LazyParser(Parser):
+
+    def _parse_function_body(self, name: Token, params: list[Token]) -> Stmt:
+        left, right, eof = TokenType.LEFT_BRACE, TokenType.RIGHT_BRACE, TokenType.EOF
+        tokens = []
+        depth = 1
+        # 直接从token来源中取, 不经过_advance, 这里是预解析最热的循环
+        token = self._peek()
+        while True:
+            type = token.type
+            if type == eof:
+                self.current += len(tokens)
+                self.previous = tokens[-1] if tokens else self.previous
+                self.lookahead = token
+                raise self._error(token, "expected '}' after block")
+            tokens.append(token)
+            if type == left:
+                depth += 1
+            elif type == right:
+                depth -= 1
+                if depth == 0:
+                    break
+            token = next(self.tokens)
+        self.current += len(tokens)
+        self.previous = token
+        self.lookahead = next(self.tokens)
+        tokens.append(Token(TokenType.EOF, 'EOF', None, token.line))
+        return LazyFunction(name, params, tokens)
@@ -0,0 +1,226 @@
+from __future__ import annotations
+from interpreter.ast_walk import children, walk
+from interpreter.expr import Expr, Assign, Binary, Call, Grouping, Literal, Logical, This, Unary, Variable
+from interpreter.interpreter_ import Interpreter
+from interpreter.lazy_parser import LazyFunction
+from interpreter.stmt import Stmt, Block, Class, Expression, Function, If, Print, Return, Var, While
+from interpreter.token_ import Token, TokenType
+
+# 没有副作用的表达式
+# 不含读属性: 每次读方法都会绑定出一个新的函数对象, 缓存以后每次循环拿到的是同一个, ==的结果会变
+PURE_NODES = (Literal, Grouping, Unary, Binary, Logical, Variable, This)
+# 结果是数字或字符串的运算, 值不会是false或nil
+ARITHMETIC = (TokenType.PLUS, TokenType.MINUS, TokenType.STAR, TokenType.SLASH)
+
+
+# 循环不变量外提(loop-invariant code motion)
+# 循环中每次求值结果都一样的表达式E, 改写成 $t or ($t = E), 并在循环前面声明 var $t;
+# 第一次用到时求值并记下来, 之后直接读$t. E仍然是在原来第一次求值的地方求值,
+# 所以循环一次都不执行, E在没有执行的分支里, 或者E求值出错时, 行为都和原来一样
+# E的值是false或nil时每次都会重新求值, 结果依然正确
+# 表达式不变的条件:
+#   只由没有副作用的节点组成
+#   用到的变量都在循环外声明, 循环中没有给它们赋值
+#   循环中有函数调用时, 被调用的函数可能修改全局变量和闭包捕获的变量, 这两种变量都不算不变
+# 只处理直接位于语句列表中的while(包括for展开成的while), 这样$t可以声明在循环所在的作用域中, 不用新加一层作用域
+# 在Resolver之后运行, $t的绑定深度和槽位直接写进interpreter.local_map和slot_map, 槽位加在循环所在作用域的最后
+class LoopInvariantMotion:
+    interpreter: Interpreter
+    # 已经生成的临时变量个数, 用来生成不重复的名字, 名字中的$不会出现在lox源码中
+    count: int
+    # 在函数中被赋值的变量名, 调用函数时可能被修改
+    closure_assigned: set[str]
+    # 已经改写过的 $t or ($t = E), 处理内层循环时不再改写其中的E
+    cached: set[Logical]
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.count = 0
+        self.closure_assigned = set()
+        self.cached = set()
+
+    def hoist(self, stmts: list[Stmt]) -> list[Stmt]:
+        for node in walk(stmts):
+            if isinstance(node, LazyFunction) and not node.loaded:
+                # 还没解析的函数体中可能修改任何变量
+                return stmts
+            if isinstance(node, Function):
+                self.closure_assigned.update(n.name.lexeme for n in walk(node.body) if isinstance(n, Assign))
+        self._hoist_list(stmts, None)
+        return stmts
+
+    # scope: 这个语句列表所在的局部作用域(Block或函数), 全局作用域为None
+    def _hoist_list(self, stmts: list[Stmt], scope: Stmt | None) -> None:
+        i = 0
+        while i < len(stmts):
+            stmt = stmts[i]
+            if isinstance(stmt, While):
+                temps = self._hoist_loop(stmt, scope)
+                stmts[i:i] = temps
+                i += len(temps)
+            self._visit_stmt(stmt)
+            i += 1
+
+    # 找到所有语句列表
+    def _visit_stmt(self, stmt: Stmt) -> None:
+        if isinstance(stmt, Block):
+            self._hoist_list(stmt.statements, stmt)
+        elif isinstance(stmt, If):
+            self._visit_stmt(stmt.then_branch)
+            if stmt.else_branch is not None:
+                self._visit_stmt(stmt.else_branch)
+        elif isinstance(stmt, While):
+            self._visit_stmt(stmt.body)
+        elif isinstance(stmt, Function):
+            self._hoist_list(stmt.body, stmt)
+        elif isinstance(stmt, Class):
+            for m in stmt.methods:
+                self._hoist_list(m.body, m)
+
+    def _hoist_loop(self, loop: While, scope: Stmt | None) -> list[Stmt]:
+        rewriter = _LoopRewriter(self, loop, scope)
+        loop.condition = rewriter.rewrite(loop.condition, 0)
+        rewriter.rewrite_stmt(loop.body, 0)
+        return rewriter.temps
+
+    def new_temp(self, line: int) -> Token:
+        self.count += 1
+        return Token(TokenType.IDENTIFIER, f'$licm{self.count}', None, line)
+
+
+# 改写一个循环, 作用域层数从循环所在的作用域算起, 循环所在的作用域是第0层
+class _LoopRewriter:
+    motion: LoopInvariantMotion
+    local_map: dict[Expr, int]
+    # 循环所在的局部作用域, 全局作用域为None
+    scope: Stmt | None
+    # 循环中被赋值的变量: (变量名, 声明所在的层), 全局变量的层为None
+    assigned: set[tuple[str, int | None]]
+    has_call: bool
+    # 需要在循环前声明的临时变量
+    temps: list[Var]
+
+    def __init__(self, motion, loop, scope):
+        self.motion = motion
+        self.local_map = motion.interpreter.local_map
+        self.scope = scope
+        self.assigned = set()
+        self.has_call = False
+        self.temps = []
+        self._analyze(loop)
+
+    def _analyze(self, loop: While) -> None:
+        # (节点, 节点所在的作用域层数)
+        stack: list[tuple[Expr | Stmt, int]] = [(loop, 0)]
+        while stack:
+            node, level = stack.pop()
+            if isinstance(node, Assign):
+                depth = self.local_map.get(node)
+                self.assigned.add((node.name.lexeme, None if depth is None else level - depth))
+            elif isinstance(node, Call):
+                self.has_call = True
+            inner = level
+            if isinstance(node, (Block, Function)):
+                inner = level + 1
+            elif isinstance(node, Class):
+                # 方法外面有this的作用域, 有父类时还有super的作用域
+                inner = level + (1 if node.super_class is None else 2)
+                if node.super_class is not None:
+                    stack.append((node.super_class, level))
+                stack.extend((m, inner) for m in node.methods)
+                continue
+            stack.extend((child, inner) for child in children(node))
+
+    def _invariant(self, expr: Expr, level: int) -> bool:
+        # 比较运算的结果可能是false, 缓存不住
+        root = expr
+        while isinstance(root, Grouping):
+            root = root.expression
+        if isinstance(root, Binary) and root.operator.type not in ARITHMETIC:
+            return False
+        if isinstance(root, (Logical, Unary)):
+            return False
+        has_operation = False
+        for node in walk([expr]):
+            if not isinstance(node, PURE_NODES):
+                return False
+            if isinstance(node, Binary):
+                has_operation = True
+            if isinstance(node, Variable):
+                depth = self.local_map.get(node)
+                if depth is not None and depth < level:
+                    # 在循环中声明的变量
+                    return False
+                declared = None if depth is None else level - depth
+                if (node.name.lexeme, declared) in self.assigned:
+                    return False
+                if self.has_call and (depth is None or node.name.lexeme in self.motion.closure_assigned):
+                    return False
+        # 只是读变量的表达式, 外提以后并不会更快
+        return has_operation
+
+    # 返回改写后的表达式, level是表达式所在的作用域层数
+    def rewrite(self, expr: Expr | None, level: int) -> Expr | None:
+        if expr is None or isinstance(expr, (Literal, Variable, This)) or expr in self.motion.cached:
+            return expr
+        if self._invariant(expr, level):
+            return self._cache(expr, level)
+        for name in type(expr).FIELDS:
+            value = getattr(expr, name)
+            if isinstance(value, Expr):
+                setattr(expr, name, self.rewrite(value, level))
+            elif isinstance(value, list):
+                setattr(expr, name, [self.rewrite(v, level) for v in value])
+        return expr
+
+    def rewrite_stmt(self, stmt: Stmt, level: int) -> None:
+        if isinstance(stmt, Block):
+            for s in stmt.statements:
+                self.rewrite_stmt(s, level + 1)
+        elif isinstance(stmt, (Expression, Print)):
+            stmt.expression = self.rewrite(stmt.expression, level)
+        elif isinstance(stmt, Var):
+            stmt.initializer = self.rewrite(stmt.initializer, level)
+        elif isinstance(stmt, Return):
+            stmt.value = self.rewrite(stmt.value, level)
+        elif isinstance(stmt, If):
+            stmt.condition = self.rewrite(stmt.condition, level)
+            self.rewrite_stmt(stmt.then_branch, level)
+            if stmt.else_branch is not None:
+                self.rewrite_stmt(stmt.else_branch, level)
+        elif isinstance(stmt, While):
+            stmt.condition = self.rewrite(stmt.condition, level)
+            self.rewrite_stmt(stmt.body, level)
+        # 函数和类中的代码不一定在循环执行期间运行, 不处理
+
+    # E -> $t or ($t = E)
+    def _cache(self, expr: Expr, level: int) -> Expr:
+        line = _first_line(expr)
+        name = self.motion.new_temp(line)
+        var = Var(name, None)
+        self.temps.append(var)
+        read = Variable(name)
+        write = Assign(name, expr)
+        interpreter = self.motion.interpreter
+        if self.scope is not None:
+            slot = interpreter.frame_sizes[self.scope]
+            interpreter.allocate(self.scope, slot + 1)
+            interpreter.declare(var, slot)
+            interpreter.resolve(read, level, slot)
+            interpreter.resolve(write, level, slot)
+        else:
+            for node in (var, read, write):
+                interpreter.resolve_global(node, name)
+        cached = Logical(read, Token(TokenType.OR, 'or', None, line), write)
+        self.motion.cached.add(cached)
+        return cached
+
+
+# 表达式中某个token所在的行, 给临时变量的token用
+def _first_line(expr: Expr) -> int:
+    for node in walk([expr]):
+        for name in type(node).FIELDS:
+            value = getattr(node, name)
+            if isinstance(value, Token):
+                return value.line
+    return 0
@@ -1,3 +1,5 @@
+from __future__ import annotations
+import mmap
 import sys
 
 from interpreter.error import RuntimeException
@@ -33,34 +35,158 @@ class Lox:
         Lox.had_runtime_error = True
         print(f'line: {e.token.line} at[{e.token.lexeme}]: {e.msg}')
 
+    # scan_mode为'mmap'时把文件映射到内存, 直接在字节上扫描, 不生成整份解码后的源码
+    # cache为True时把前端的结果缓存到磁盘上(默认在脚本旁边的__loxcache__目录中), 源码没变时直接加载
     @staticmethod
-    def run_file(path: str) -> None:
-        with open(path, 'r') as f:
-            source = f.read()
-            Lox.run(source)
-            if Lox.had_error:
-                sys.exit(65)
-            if Lox.had_runtime_error:
-                sys.exit(66)
+    def run_file(path: str, scan_mode: str = 'char', cache: bool = False, cache_dir: str = None) -> None:
+        if cache:
+            Lox._run_cached_file(path, scan_mode, cache_dir)
+        elif scan_mode == 'mmap':
+            Lox._run_mapped_file(path)
+        else:
+            with open(path, 'r') as f:
+                source = f.read()
+                Lox.run(source, scan_mode)
+        if Lox.had_error:
+            sys.exit(65)
+        if Lox.had_runtime_error:
+            sys.exit(66)
+
+    @staticmethod
+    def _run_cached_file(path: str, scan_mode: str, cache_dir: str) -> None:
+        from interpreter import ast_cache
+        from interpreter.interpreter_ import Interpreter
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        cached = ast_cache.load(path, data, cache_dir)
+        if cached is not None:
+            stmts, bindings = cached
+            interpreter = Interpreter()
+            interpreter.load_bindings(bindings)
+            interpreter.interpret(stmts)
+            return
+
+        source = data if scan_mode == 'mmap' else data.decode()
+        compiled = Lox.compile(source, scan_mode)
+        if compiled is None:
+            return
+        stmts, interpreter = compiled
+        # 有错误的源码不缓存
+        ast_cache.dump(path, data, stmts, interpreter.bindings(), cache_dir)
+        interpreter.interpret(stmts)
+
+    @staticmethod
+    def _run_mapped_file(path: str) -> None:
+        with open(path, 'rb') as f:
+            try:
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # 空文件不能mmap
+                Lox.run(b'', 'regex')
+                return
+        with source:
+            Lox.run(source, 'regex')
 
+    # scan_mode: 'char' 逐字符扫描, 'regex' 正则驱动扫描
+    # source是bytes/mmap时总是用正则扫描
+    # parse_mode: 'descent' 递归下降解析表达式, 'pratt' 按优先级表解析表达式
+    #             'stack' 不递归的解析器, 嵌套再深也不会超出递归上限
+    #             'lazy' 函数体只做括号匹配, 第一次调用时才解析
+    #             'fused' 解析的同时做变量绑定, 不再单独遍历语法树
+    # compact: 绑定完成后把语法树中的token换成共享的精简token, 省内存, 见compact_ast
+    # optimize: 绑定完成后做常量折叠, 删除死代码等优化, 见optimizer
+    # inline: 把小函数内联到调用处, 在optimize之前进行, 见inliner
+    # hoist: 把循环中不变的表达式提到循环外, 只求值一次, 在optimize之后进行, 见licm
+    # direct_calls: 调用从不被重新赋值的顶层函数和类时, 直接绑定到被调用的对象, 见Resolver.bind_direct_calls
+    # infer: 推断哪些运算的操作数一定是数字, 执行时不再检查类型, 见type_inference
+    # share_frames: 没有被闭包捕获的Block直接用外层的帧, 这样的函数重复使用帧, 在所有改写语法树的优化之后进行,
+    #               见Resolver.analyze_escapes
+    # flat_closures: 闭包只捕获用到的变量, 不再引用外层的整个环境, 在share_frames之前进行, 见Resolver.flatten_closures
+    # backend: 'visitor' 解释器遍历语法树执行, 'closures' 先把语法树编译成Python闭包再执行, 见closure_compiler
     @staticmethod
-    def run(source: str) -> None:
+    def run(source: str | bytes, scan_mode: str = 'char', parse_mode: str = 'descent', compact: bool = False,
+            optimize: bool = False, inline: bool = False, hoist: bool = False, infer: bool = False,
+            direct_calls: bool = True, share_frames: bool = True, flat_closures: bool = True,
+            backend: str = 'visitor') -> None:
+        from interpreter.closure_compiler import ClosureCompiler
+        compiled = Lox.compile(source, scan_mode, parse_mode, compact, optimize, inline, hoist, infer, direct_calls,
+                               share_frames, flat_closures)
+        if compiled is None:
+            return
+        stmts, interpreter = compiled
+        if backend == 'closures':
+            ClosureCompiler(interpreter).run(stmts)
+        else:
+            interpreter.interpret(stmts)
+
+    # 扫描, 解析, 变量绑定, 返回语法树和保存了绑定结果的解释器; 有错误时返回None
+    @staticmethod
+    def compile(source: str | bytes, scan_mode: str = 'char', parse_mode: str = 'descent',
+                compact: bool = False, optimize: bool = False, inline: bool = False,
+                hoist: bool = False, infer: bool = False, direct_calls: bool = True,
+                share_frames: bool = True, flat_closures: bool = True) -> tuple[list, object] | None:
         from interpreter.parser import Parser
+        from interpreter.pratt_parser import PrattParser
+        from interpreter.stack_parser import StackParser
+        from interpreter.lazy_parser import LazyParser
+        from interpreter.fused_parser import FusedParser
         from interpreter.scanner import Scanner
         from interpreter.utils.ast_printer import AstPrinter
         from interpreter.interpreter_ import Interpreter
         from interpreter.resolver import Resolver
+        from interpreter.compact_ast import compact_tokens
+        from interpreter.optimizer import Optimizer
+        from interpreter.inliner import Inliner
+        from interpreter.licm import LoopInvariantMotion
+        from interpreter.type_inference import NumberInference
 
-        scanner = Scanner(source)
-        tokens = scanner.scan_tokens()
-        parser = Parser(tokens)
-        stmts = parser.parse()
-        if Lox.had_error:
-            return
-        # print(AstPrinter().build(expr))
+        if scan_mode == 'regex' or not isinstance(source, str):
+            from interpreter.regex_scanner import RegexScanner
+            scanner = RegexScanner(source)
+        else:
+            scanner = Scanner(source)
         interpreter = Interpreter()
-        resolver = Resolver(interpreter)
-        resolver.resolve(stmts)
-        if Lox.had_error:
-            return
-        interpreter.interpret(stmts)
+        if parse_mode == 'fused':
+            parser = FusedParser(scanner.iter_tokens(), interpreter)
+        else:
+            parser_class = {'pratt': PrattParser, 'stack': StackParser, 'lazy': LazyParser}.get(parse_mode, Parser)
+            parser = parser_class(scanner.iter_tokens())
+        # 只有解析器不递归(stack)还不够, 绑定和之后的pass都是递归遍历语法树的,
+        # 嵌套太深时报告成语法错误, 而不是抛出Python的RecursionError
+        try:
+            stmts = parser.parse()
+            if Lox.had_error:
+                return None
+            # print(AstPrinter().build(expr))
+            if parse_mode == 'fused':
+                parser.report_resolve_errors()
+            else:
+                resolver = Resolver(interpreter)
+                resolver.resolve(stmts)
+            if Lox.had_error:
+                return None
+            if direct_calls:
+                Resolver(interpreter).bind_direct_calls(stmts)
+            else:
+                Resolver(interpreter).find_fixed_globals(stmts)
+            if inline:
+                stmts = Inliner(interpreter).inline(stmts)
+            if optimize:
+                stmts = Optimizer(interpreter).optimize(stmts)
+            if hoist:
+                stmts = LoopInvariantMotion(interpreter).hoist(stmts)
+            if infer:
+                stmts = NumberInference(interpreter).infer(stmts)
+            interpreter.flat_closures = flat_closures
+            if flat_closures:
+                Resolver(interpreter).flatten_closures(stmts)
+            interpreter.share_frames = share_frames
+            if share_frames:
+                Resolver(interpreter).analyze_escapes(stmts)
+            if compact:
+                compact_tokens(stmts)
+            return stmts, interpreter
+        except RecursionError:
+            Lox.error(line=scanner.line, where='EOF', message='nesting too deep')
+            return None
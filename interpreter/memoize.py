@@ -0,0 +1,126 @@
+from __future__ import annotations
+from collections import OrderedDict
+
+from interpreter.ast_walk import children
+from interpreter.expr import Expr, Assign, Call, Get, Set, Super, This, Variable
+from interpreter.lazy_parser import LazyFunction
+from interpreter.stmt import Stmt, Block, Class, Function, Print
+
+# 参数是这些类型时才缓存, 它们的值不会改变
+KEY_TYPES = (float, str, bool, type(None))
+
+
+# 缓存中没有结果
+MISSING = object()
+
+
+# 有大小上限的缓存, 满了以后淘汰最久没有用到的结果
+class LruCache:
+    size: int
+    entries: OrderedDict
+    hits: int
+    misses: int
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # 没有缓存时返回MISSING
+    def get(self, key: tuple) -> object:
+        value = self.entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: tuple, value: object) -> None:
+        self.entries[key] = value
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+# 参数列表对应的缓存key, 有不能缓存的参数时返回None
+# key中带上类型: true和1在Python中相等; 数字用hex表示, 区分0和-0
+def memo_key(arguments: list[object]) -> tuple | None:
+    key = []
+    for a in arguments:
+        t = type(a)
+        if t not in KEY_TYPES:
+            return None
+        key.append((t, a.hex() if t is float else a))
+    return tuple(key)
+
+
+# 静态检查函数是不是纯函数: 结果只取决于参数, 也没有能观察到的副作用
+#   没有print, 不读写属性, 不用this和super, 不声明函数和类(返回值不会是新的函数或实例)
+#   只读写自己的形参和局部变量(全局变量和外层的变量可能会变)
+#   只调用从不被重新赋值的顶层函数(见Resolver.find_fixed_globals), 并且被调用的函数也是纯函数
+#   预解析的函数体和关闭了直接绑定时, 调用处不是DirectCall, 按被调用的全局变量的名字判断
+# 运行时错误只取决于参数, 出错的调用不会被缓存
+class PurityChecker:
+    interpreter: object
+    # 函数声明 -> 是否是纯函数; 正在检查的函数先当作纯函数, 这样递归调用可以通过
+    known: dict[Function, bool]
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.known = {}
+
+    def is_pure(self, declaration: Function) -> bool:
+        known = self.known.get(declaration)
+        if known is not None:
+            return known
+        self.known[declaration] = True
+        if isinstance(declaration, LazyFunction) and not declaration.loaded:
+            declaration.load(self.interpreter)
+        pure = self._check(declaration.body)
+        self.known[declaration] = pure
+        return pure
+
+    def _check(self, body: list[Stmt]) -> bool:
+        from interpreter.callable import LoxFunction
+        from interpreter.quicken import DirectCall
+        local_map = self.interpreter.local_map
+        # (节点, 节点所在的作用域层数), 形参的作用域是第0层
+        stack: list[tuple[Expr | Stmt, int]] = [(stmt, 0) for stmt in body]
+        while stack:
+            node, level = stack.pop()
+            if isinstance(node, (Print, Get, Set, This, Super, Function, Class)):
+                return False
+            if isinstance(node, (Variable, Assign)):
+                depth = local_map.get(node)
+                if depth is None or depth > level:
+                    return False
+            if isinstance(node, Call):
+                callee = node.callee
+                if not isinstance(node, DirectCall) and not (
+                        callee in self.interpreter.global_map and isinstance(callee, Variable)
+                        and callee.name.lexeme in self.interpreter.fixed_globals):
+                    return False
+                target = self.interpreter.outermost.lookup(node.callee.name.lexeme)
+                if not isinstance(target, LoxFunction) or not self.is_pure(target.declaration):
+                    return False
+                # 被调用的函数名是全局变量, 不再按读变量检查
+                stack.extend((a, level) for a in node.arguments)
+                continue
+            # 和外层共用帧的Block不算一层, 见Resolver.analyze_escapes
+            inner = level + 1 if isinstance(node, Block) and node in self.interpreter.frame_sizes else level
+            stack.extend((child, inner) for child in children(node))
+        return True
+
+
+# 内置函数 memoize(fn): fn是纯函数时给它加上结果缓存, 缓存大小见interpreter.memo_size
+# 缓存直接放在LoxFunction上, 递归调用也能用到; 不是纯函数时不做任何事. 总是返回fn本身
+def memoize(interpreter, function: object) -> object:
+    from interpreter.callable import LoxFunction
+    if isinstance(function, LoxFunction) and function.memo is None \
+            and PurityChecker(interpreter).is_pure(function.declaration):
+        function.memo = LruCache(interpreter.memo_size)
+    return function
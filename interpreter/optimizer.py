@@ -0,0 +1,250 @@
+from __future__ import annotations
+from interpreter.error import RuntimeException
+from interpreter.expr import ExprVisitor, Expr, Assign, Binary, Call, Get, Super, Set, Grouping, Literal, Logical, \
+    This, Unary, Variable
+from interpreter.interpreter_ import Interpreter
+from interpreter.lazy_parser import LazyFunction
+from interpreter.stmt import StmtVisitor, Stmt, Block, Class, Expression, Function, Break, Continue, If, Print, \
+    While, Return, Var
+from interpreter.token_ import TokenType, Token
+
+
+# 语法树优化: 常量折叠, 去掉括号, 删除不可达的分支和语句, 删除没有用到的局部变量
+# 在Resolver之后运行: 被删掉的代码中的静态错误照样会报告, 判断局部变量有没有被用到时可以直接用绑定结果
+# 优化只会改写节点的字段或者删掉整条语句, 不会增减作用域, 所以interpreter.local_map和slot_map依然有效
+# 删掉的变量声明的槽位空着不用
+# 求值会出错的表达式(比如 "a" - 1, 1 / 0)保持原样, 留到运行时按原来的方式报错
+class Optimizer(ExprVisitor, StmtVisitor):
+    interpreter: Interpreter
+    # 和Resolver的作用域栈一一对应, 变量名 -> 声明它的Var语句(形参, 函数, 类, this, super为None)
+    scope_stack: list[dict[str, Var | None]]
+    # 被读取或者赋值过的局部变量
+    used: set[Var]
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.scope_stack = []
+        self.used = set()
+
+    def optimize(self, stmts: list[Stmt]) -> list[Stmt]:
+        return self._optimize_stmts(stmts)
+
+    def _optimize_expr(self, expr: Expr) -> Expr:
+        return expr.accept(self)
+
+    # 返回None表示这条语句可以删掉
+    def _optimize_stmt(self, stmt: Stmt) -> Stmt | None:
+        return stmt.accept(self)
+
+    # 必须有一条语句的位置(比如if的分支), 删掉的语句用空的Block代替
+    def _optimize_branch(self, stmt: Stmt) -> Stmt:
+        stmt = self._optimize_stmt(stmt)
+        if stmt is None:
+            stmt = Block([])
+            self.interpreter.allocate(stmt, 0)
+        return stmt
+
+    def _optimize_stmts(self, stmts: list[Stmt]) -> list[Stmt]:
+        result = []
+        for stmt in stmts:
+            stmt = self._optimize_stmt(stmt)
+            if stmt is None:
+                continue
+            result.append(stmt)
+            # 同一个语句列表中, return和break后面的语句执行不到
+            if isinstance(stmt, (Return, Break)):
+                break
+        return result
+
+    def _begin_scope(self) -> None:
+        self.scope_stack.append({})
+
+    # 结束作用域, 删掉其中没有用到的变量声明, 有副作用的初始化表达式保留下来
+    def _end_scope(self, stmts: list[Stmt]) -> list[Stmt]:
+        scope = self.scope_stack.pop()
+        dead = {v for v in scope.values() if v is not None and v not in self.used}
+        if not dead:
+            return stmts
+        result = []
+        for stmt in stmts:
+            if stmt in dead:
+                if stmt.initializer is None or isinstance(stmt.initializer, Literal):
+                    continue
+                stmt = Expression(stmt.initializer)
+            result.append(stmt)
+        return result
+
+    def _declare(self, name: Token, var: Var | None = None) -> None:
+        if self.scope_stack:
+            self.scope_stack[-1][name.lexeme] = var
+
+    def _use(self, expr: Expr, name: Token) -> None:
+        depth = self.interpreter.local_map.get(expr)
+        if depth is None:
+            return
+        var = self.scope_stack[len(self.scope_stack) - 1 - depth].get(name.lexeme)
+        if var is not None:
+            self.used.add(var)
+
+    def _optimize_function(self, stmt: Function) -> None:
+        self._begin_scope()
+        for param in stmt.params:
+            self._declare(param)
+        if isinstance(stmt, LazyFunction) and not stmt.loaded:
+            # 函数体还没解析, 不知道它会用到哪些变量, 外层的变量都保留
+            for scope in self.scope_stack:
+                self.used.update(v for v in scope.values() if v is not None)
+            self.scope_stack.pop()
+            return
+        stmt.body = self._end_scope(self._optimize_stmts(stmt.body))
+
+    # 常量求值, 规则和出错的情况都交给解释器, 出错时返回None
+    def _fold(self, fn, *args) -> Literal | None:
+        try:
+            return Literal(fn(*args))
+        except (RuntimeException, ZeroDivisionError):
+            return None
+
+    # 表达式
+
+    def visit_assign(self, expr: Assign) -> object:
+        expr.value = self._optimize_expr(expr.value)
+        self._use(expr, expr.name)
+        return expr
+
+    def visit_binary(self, expr: Binary) -> object:
+        expr.left = self._optimize_expr(expr.left)
+        expr.right = self._optimize_expr(expr.right)
+        if isinstance(expr.left, Literal) and isinstance(expr.right, Literal):
+            folded = self._fold(self.interpreter._binary, expr.operator, expr.left.value, expr.right.value)
+            if folded is not None:
+                return folded
+        return expr
+
+    def visit_call(self, expr: Call) -> object:
+        expr.callee = self._optimize_expr(expr.callee)
+        expr.arguments = [self._optimize_expr(a) for a in expr.arguments]
+        return expr
+
+    def visit_get(self, expr: Get) -> object:
+        expr.object = self._optimize_expr(expr.object)
+        return expr
+
+    def visit_super(self, expr: Super) -> object:
+        return expr
+
+    def visit_set(self, expr: Set) -> object:
+        expr.object = self._optimize_expr(expr.object)
+        expr.value = self._optimize_expr(expr.value)
+        return expr
+
+    # 括号只影响解析, 求值时没有作用
+    def visit_grouping(self, expr: Grouping) -> object:
+        return self._optimize_expr(expr.expression)
+
+    def visit_literal(self, expr: Literal) -> object:
+        return expr
+
+    # 左边是常量时, 结果要么就是左边, 要么就是右边
+    def visit_logical(self, expr: Logical) -> object:
+        expr.left = self._optimize_expr(expr.left)
+        if isinstance(expr.left, Literal):
+            truthy = self.interpreter._is_true(expr.left.value)
+            if truthy == (expr.operator.type == TokenType.OR):
+                return expr.left
+            return self._optimize_expr(expr.right)
+        expr.right = self._optimize_expr(expr.right)
+        return expr
+
+    def visit_this(self, expr: This) -> object:
+        return expr
+
+    def visit_unary(self, expr: Unary) -> object:
+        expr.right = self._optimize_expr(expr.right)
+        if isinstance(expr.right, Literal):
+            folded = self._fold(self.interpreter._unary, expr.operator, expr.right.value)
+            if folded is not None:
+                return folded
+        return expr
+
+    def visit_variable(self, expr: Variable) -> object:
+        self._use(expr, expr.name)
+        return expr
+
+    # 语句
+
+    def visit_block(self, stmt: Block) -> object:
+        self._begin_scope()
+        stmt.statements = self._end_scope(self._optimize_stmts(stmt.statements))
+        if not stmt.statements:
+            return None
+        return stmt
+
+    def visit_class(self, stmt: Class) -> object:
+        self._declare(stmt.name)
+        if stmt.super_class is not None:
+            self._optimize_expr(stmt.super_class)
+            self._begin_scope()
+            self.scope_stack[-1]['super'] = None
+        self._begin_scope()
+        self.scope_stack[-1]['this'] = None
+        for m in stmt.methods:
+            self._optimize_function(m)
+        self.scope_stack.pop()
+        if stmt.super_class is not None:
+            self.scope_stack.pop()
+        return stmt
+
+    def visit_expression(self, stmt: Expression) -> object:
+        stmt.expression = self._optimize_expr(stmt.expression)
+        # 常量作为语句没有任何作用
+        if isinstance(stmt.expression, Literal):
+            return None
+        return stmt
+
+    def visit_function(self, stmt: Function) -> object:
+        self._declare(stmt.name)
+        self._optimize_function(stmt)
+        return stmt
+
+    def visit_break(self, stmt: Break) -> object:
+        return stmt
+
+    def visit_continue(self, stmt: Continue) -> object:
+        return stmt
+
+    def visit_if(self, stmt: If) -> object:
+        stmt.condition = self._optimize_expr(stmt.condition)
+        if isinstance(stmt.condition, Literal):
+            # 只保留会执行的分支, 另一个分支里的变量引用也不再算数
+            if self.interpreter._is_true(stmt.condition.value):
+                return self._optimize_stmt(stmt.then_branch)
+            if stmt.else_branch is None:
+                return None
+            return self._optimize_stmt(stmt.else_branch)
+        stmt.then_branch = self._optimize_branch(stmt.then_branch)
+        if stmt.else_branch is not None:
+            stmt.else_branch = self._optimize_stmt(stmt.else_branch)
+        return stmt
+
+    def visit_print(self, stmt: Print) -> object:
+        stmt.expression = self._optimize_expr(stmt.expression)
+        return stmt
+
+    def visit_while(self, stmt: While) -> object:
+        stmt.condition = self._optimize_expr(stmt.condition)
+        if isinstance(stmt.condition, Literal) and not self.interpreter._is_true(stmt.condition.value):
+            return None
+        stmt.body = self._optimize_branch(stmt.body)
+        return stmt
+
+    def visit_return(self, stmt: Return) -> object:
+        if stmt.value is not None:
+            stmt.value = self._optimize_expr(stmt.value)
+        return stmt
+
+    def visit_var(self, stmt: Var) -> object:
+        if stmt.initializer is not None:
+            stmt.initializer = self._optimize_expr(stmt.initializer)
+        self._declare(stmt.name, stmt)
+        return stmt
@@ -1,3 +1,6 @@
+from __future__ import annotations
+from typing import Iterator
+
 from interpreter.error import ParseException
 from interpreter.expr import Expr, Binary, Unary, Literal, Grouping, Variable, Assign, Logical, Call, Get, Set, This, \
     Super
@@ -81,13 +84,20 @@ parameters     → IDENTIFIER ( "," IDENTIFIER )* ;
 
 
 class Parser:
-    tokens: list[Token]
-    # 当前正在解析的token
+    # token来源, 可以是列表也可以是扫描器的生成器, 按需逐个取出
+    tokens: Iterator[Token]
+    # 已经消费掉的token个数
     current: int
+    # 上一个消费掉的token
+    previous: Token
+    # 当前正在解析的token, 只向前看一个
+    lookahead: Token
 
     def __init__(self, tokens):
-        self.tokens = tokens
+        self.tokens = iter(tokens)
         self.current = 0
+        self.previous = None
+        self.lookahead = next(self.tokens)
 
     def parse(self) -> list[Stmt]:
         stmts = []
@@ -139,6 +149,10 @@ class Parser:
 
         self._ensure(TokenType.RIGHT_PAREN, "expect ')' after parameters")
         self._ensure(TokenType.LEFT_BRACE, f"expect {'{'} before {kind} body")
+        return self._parse_function_body(name, params)
+
+    # 已经消费掉了函数体的'{'
+    def _parse_function_body(self, name: Token, params: list[Token]) -> Stmt:
         body = self._parse_block()
         return Function(name, params, body)
 
@@ -410,16 +424,19 @@ class Parser:
         t = self._peek()
         return t.type == expected
 
+    # 只保留前后各一个token, 内存占用与源码大小无关
     def _advance(self) -> Token:
         if not self._is_at_end():
             self.current += 1
-        return self._peek_pre()
+            self.previous = self.lookahead
+            self.lookahead = next(self.tokens)
+        return self.previous
 
     def _peek(self) -> Token:
-        return self.tokens[self.current]
+        return self.lookahead
 
     def _peek_pre(self) -> Token:
-        return self.tokens[self.current - 1]
+        return self.previous
 
     def _is_at_end(self) -> bool:
         return self._peek().type == TokenType.EOF
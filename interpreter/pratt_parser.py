@@ -0,0 +1,169 @@
+from __future__ import annotations
+from enum import IntEnum
+from typing import Callable
+
+from interpreter.expr import Expr, Binary, Unary, Literal, Grouping, Variable, Assign, Logical, Get, Set, This, Super
+from interpreter.parser import Parser
+from interpreter.token_ import TokenType
+
+
+# 优先级自上而下递增, 和clox compiler.c中的Precedence一致
+class Precedence(IntEnum):
+    NONE = 0
+    # =
+    ASSIGNMENT = 1
+    # or
+    OR = 2
+    # and
+    AND = 3
+    # == !=
+    EQUALITY = 4
+    # < > <= >=
+    COMPARISON = 5
+    # + -
+    TERM = 6
+    # * /
+    FACTOR = 7
+    # ! -
+    UNARY = 8
+    # . ()
+    CALL = 9
+    PRIMARY = 10
+
+
+class ParseRule:
+    # token出现在表达式开头时的解析函数
+    prefix: Callable | None
+    # token出现在两个操作数之间时的解析函数, 参数是已经解析出的左操作数
+    infix: Callable | None
+    # token作为中缀运算符时的优先级
+    precedence: Precedence
+
+    def __init__(self, prefix, infix, precedence):
+        self.prefix = prefix
+        self.infix = infix
+        self.precedence = precedence
+
+
+# 表驱动的表达式解析(Pratt parser), 语句部分沿用Parser
+# 每个字面量只需要 _parse_expression -> _parse_precedence -> 前缀函数 三层调用,
+# 生成的语法树和递归下降版本完全一样
+class PrattParser(Parser):
+    # token类型 -> 解析规则, 见make_rules
+    rules: dict[TokenType, ParseRule]
+
+    def _parse_expression(self) -> Expr:
+        return self._parse_precedence(Precedence.ASSIGNMENT)
+
+    # 解析优先级不低于precedence的表达式
+    def _parse_precedence(self, precedence: int) -> Expr:
+        token = self._peek()
+        rules = self.rules
+        prefix = rules[token.type].prefix
+        if prefix is None:
+            raise self._error(token, 'expect expression.')
+        self._advance()
+        expr = prefix(self)
+
+        while precedence <= PRECEDENCES[self._peek().type]:
+            self._advance()
+            expr = rules[self._peek_pre().type].infix(self, expr)
+        return expr
+
+    def _parse_grouping(self) -> Expr:
+        expr = self._parse_expression()
+        self._ensure(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
+        return Grouping(expr)
+
+    def _parse_unary_prefix(self) -> Expr:
+        op = self._peek_pre()
+        right = self._parse_precedence(Precedence.UNARY)
+        return Unary(op, right)
+
+    # 左结合: 右操作数只能是优先级更高的表达式
+    def _parse_binary(self, left: Expr) -> Expr:
+        op = self._peek_pre()
+        right = self._parse_precedence(PRECEDENCES[op.type] + 1)
+        return Binary(left, op, right)
+
+    def _parse_logical(self, left: Expr) -> Expr:
+        op = self._peek_pre()
+        right = self._parse_precedence(PRECEDENCES[op.type] + 1)
+        return Logical(left, op, right)
+
+    # 右结合: a = b = c
+    def _parse_assign(self, left: Expr) -> Expr:
+        equal = self._peek_pre()
+        value = self._parse_precedence(Precedence.ASSIGNMENT)
+        if isinstance(left, Variable):
+            return Assign(left.name, value)
+        if isinstance(left, Get):
+            return Set(left.object, left.name, value)
+        self._error(equal, 'Invalid assigment target')
+        return left
+
+    def _parse_dot(self, left: Expr) -> Expr:
+        name = self._ensure(TokenType.IDENTIFIER, "expect property name after '.'")
+        return Get(left, name)
+
+    def _parse_number_or_string(self) -> Expr:
+        return Literal(self._peek_pre().literal)
+
+    def _parse_variable(self) -> Expr:
+        return Variable(self._peek_pre())
+
+    def _parse_this(self) -> Expr:
+        return This(self._peek_pre())
+
+    def _parse_super(self) -> Expr:
+        keyword = self._peek_pre()
+        self._ensure(TokenType.DOT, "expect '.' after super")
+        method = self._ensure(TokenType.IDENTIFIER, 'expect super class method name')
+        return Super(keyword, method)
+
+    def _parse_false(self) -> Expr:
+        return Literal(False)
+
+    def _parse_true(self) -> Expr:
+        return Literal(True)
+
+    def _parse_nil(self) -> Expr:
+        return Literal(None)
+
+
+# 规则表中的函数从parser_class上取, 子类覆盖的解析函数也会生效
+def make_rules(parser_class: type) -> dict[TokenType, ParseRule]:
+    P = parser_class
+    rules = {t: ParseRule(None, None, Precedence.NONE) for t in TokenType}
+    rules.update({
+        TokenType.LEFT_PAREN: ParseRule(P._parse_grouping, P._parse_finish_call, Precedence.CALL),
+        TokenType.DOT: ParseRule(None, P._parse_dot, Precedence.CALL),
+        TokenType.MINUS: ParseRule(P._parse_unary_prefix, P._parse_binary, Precedence.TERM),
+        TokenType.PLUS: ParseRule(None, P._parse_binary, Precedence.TERM),
+        TokenType.SLASH: ParseRule(None, P._parse_binary, Precedence.FACTOR),
+        TokenType.STAR: ParseRule(None, P._parse_binary, Precedence.FACTOR),
+        TokenType.BANG: ParseRule(P._parse_unary_prefix, None, Precedence.NONE),
+        TokenType.BANG_EQUAL: ParseRule(None, P._parse_binary, Precedence.EQUALITY),
+        TokenType.EQUAL: ParseRule(None, P._parse_assign, Precedence.ASSIGNMENT),
+        TokenType.EQUAL_EQUAL: ParseRule(None, P._parse_binary, Precedence.EQUALITY),
+        TokenType.GREATER: ParseRule(None, P._parse_binary, Precedence.COMPARISON),
+        TokenType.GREATER_EQUAL: ParseRule(None, P._parse_binary, Precedence.COMPARISON),
+        TokenType.LESS: ParseRule(None, P._parse_binary, Precedence.COMPARISON),
+        TokenType.LESS_EQUAL: ParseRule(None, P._parse_binary, Precedence.COMPARISON),
+        TokenType.IDENTIFIER: ParseRule(P._parse_variable, None, Precedence.NONE),
+        TokenType.STRING: ParseRule(P._parse_number_or_string, None, Precedence.NONE),
+        TokenType.NUMBER: ParseRule(P._parse_number_or_string, None, Precedence.NONE),
+        TokenType.AND: ParseRule(None, P._parse_logical, Precedence.AND),
+        TokenType.OR: ParseRule(None, P._parse_logical, Precedence.OR),
+        TokenType.FALSE: ParseRule(P._parse_false, None, Precedence.NONE),
+        TokenType.TRUE: ParseRule(P._parse_true, None, Precedence.NONE),
+        TokenType.NIL: ParseRule(P._parse_nil, None, Precedence.NONE),
+        TokenType.THIS: ParseRule(P._parse_this, None, Precedence.NONE),
+        TokenType.SUPER: ParseRule(P._parse_super, None, Precedence.NONE),
+    })
+    return rules
+
+
+PrattParser.rules = make_rules(PrattParser)
+# 解析循环里只需要优先级, 单独拿出来少一次属性访问
+PRECEDENCES: dict[TokenType, int] = {t: int(rule.precedence) for t, rule in PrattParser.rules.items()}
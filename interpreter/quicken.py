@@ -0,0 +1,429 @@
+from __future__ import annotations
+import operator
+
+from interpreter.env import UNDEFINED
+from interpreter.error import RuntimeException
+from interpreter.expr import Expr, Assign, Binary, Call, Logical, Unary, Variable, This, Super
+from interpreter.token_ import TokenType
+
+
+# 自我特化(quickening)的节点
+# 解释器第一次执行Binary, Unary, Logical节点时, 按运算符和观察到的操作数类型把节点的类换成下面的特化类,
+# 之后按类型查表直接执行特化的代码, 不再逐个比较运算符
+# 特化类和原来的类字段完全相同(__slots__为空, FIELDS继承自原来的类), 所以可以直接修改节点的__class__, 节点本身不变,
+# 其他visitor(打印, 优化等)通过继承的accept照样当成原来的节点处理
+# 按类型特化的节点带有守卫: 操作数类型和特化时不同, 就退化成不再特化的通用节点, 按原来的方式求值
+
+# 二元运算
+
+# 操作数都是数字, 带守卫
+class NumberBinary(Binary):
+    __slots__ = ()
+    op = None
+
+
+class NumberAdd(NumberBinary):
+    __slots__ = ()
+    op = operator.add
+
+
+class NumberSubtract(NumberBinary):
+    __slots__ = ()
+    op = operator.sub
+
+
+class NumberMultiply(NumberBinary):
+    __slots__ = ()
+    op = operator.mul
+
+
+class NumberDivide(NumberBinary):
+    __slots__ = ()
+    op = operator.truediv
+
+
+class NumberGreater(NumberBinary):
+    __slots__ = ()
+    op = operator.gt
+
+
+class NumberGreaterEqual(NumberBinary):
+    __slots__ = ()
+    op = operator.ge
+
+
+class NumberLess(NumberBinary):
+    __slots__ = ()
+    op = operator.lt
+
+
+class NumberLessEqual(NumberBinary):
+    __slots__ = ()
+    op = operator.le
+
+
+# type_inference已经证明操作数都是数字, 不需要守卫
+class ProvenBinary(Binary):
+    __slots__ = ()
+    op = None
+
+
+class ProvenAdd(ProvenBinary):
+    __slots__ = ()
+    op = operator.add
+
+
+class ProvenSubtract(ProvenBinary):
+    __slots__ = ()
+    op = operator.sub
+
+
+class ProvenMultiply(ProvenBinary):
+    __slots__ = ()
+    op = operator.mul
+
+
+class ProvenDivide(ProvenBinary):
+    __slots__ = ()
+    op = operator.truediv
+
+
+class ProvenGreater(ProvenBinary):
+    __slots__ = ()
+    op = operator.gt
+
+
+class ProvenGreaterEqual(ProvenBinary):
+    __slots__ = ()
+    op = operator.ge
+
+
+class ProvenLess(ProvenBinary):
+    __slots__ = ()
+    op = operator.lt
+
+
+class ProvenLessEqual(ProvenBinary):
+    __slots__ = ()
+    op = operator.le
+
+
+# 两个字符串相加
+class StringConcat(Binary):
+    __slots__ = ()
+
+
+# == 和 != 对所有类型都适用, 只按运算符特化
+class Equal(Binary):
+    __slots__ = ()
+
+
+class NotEqual(Binary):
+    __slots__ = ()
+
+
+# 守卫失败过或者无法特化的节点
+class GenericBinary(Binary):
+    __slots__ = ()
+
+
+# 一元运算
+
+class NumberNegate(Unary):
+    __slots__ = ()
+
+
+class ProvenNegate(Unary):
+    __slots__ = ()
+
+
+class Not(Unary):
+    __slots__ = ()
+
+
+class GenericUnary(Unary):
+    __slots__ = ()
+
+
+# 逻辑运算, 只按运算符特化
+
+class And(Logical):
+    __slots__ = ()
+
+
+class Or(Logical):
+    __slots__ = ()
+
+
+# 调用
+
+# 调用只声明一次, 从来没被赋值过的顶层函数或类, 由Resolver.bind_direct_calls在绑定时替换, 参数个数已经检查过
+class DirectCall(Call):
+    __slots__ = ()
+
+
+# 变量
+
+# 读写全局变量, 由Interpreter.resolve_global在绑定时替换, 下标在interpreter.global_map中
+class GlobalVariable(Variable):
+    __slots__ = ()
+
+
+class GlobalAssign(Assign):
+    __slots__ = ()
+
+
+# 读写被闭包捕获的局部变量, 槽位上存的是env.Cell, 由Resolver.flatten_closures替换
+class CellVariable(Variable):
+    __slots__ = ()
+
+
+class CellAssign(Assign):
+    __slots__ = ()
+
+
+# 读写外层函数的变量, this和super, 按interpreter.upvalue_map中的下标读写正在执行的函数捕获的cells
+# 由Resolver.flatten_closures替换
+class UpvalueVariable(Variable):
+    __slots__ = ()
+
+
+class UpvalueAssign(Assign):
+    __slots__ = ()
+
+
+class UpvalueThis(This):
+    __slots__ = ()
+
+
+# 下标是(super的下标, this的下标)
+class UpvalueSuper(Super):
+    __slots__ = ()
+
+
+CELL_NODES: dict[type, type] = {
+    Variable: CellVariable,
+    Assign: CellAssign,
+}
+UPVALUE_NODES: dict[type, type] = {
+    Variable: UpvalueVariable,
+    Assign: UpvalueAssign,
+    This: UpvalueThis,
+    Super: UpvalueSuper,
+}
+NUMBER_BINARY: dict[TokenType, type] = {
+    TokenType.PLUS: NumberAdd,
+    TokenType.MINUS: NumberSubtract,
+    TokenType.STAR: NumberMultiply,
+    TokenType.SLASH: NumberDivide,
+    TokenType.GREATER: NumberGreater,
+    TokenType.GREATER_EQUAL: NumberGreaterEqual,
+    TokenType.LESS: NumberLess,
+    TokenType.LESS_EQUAL: NumberLessEqual,
+}
+PROVEN_BINARY: dict[TokenType, type] = {
+    TokenType.PLUS: ProvenAdd,
+    TokenType.MINUS: ProvenSubtract,
+    TokenType.STAR: ProvenMultiply,
+    TokenType.SLASH: ProvenDivide,
+    TokenType.GREATER: ProvenGreater,
+    TokenType.GREATER_EQUAL: ProvenGreaterEqual,
+    TokenType.LESS: ProvenLess,
+    TokenType.LESS_EQUAL: ProvenLessEqual,
+}
+
+
+# 根据第一次求值时的操作数选择特化类, proven表示type_inference已经证明操作数都是数字
+def specialize_binary(expr: Binary, left: object, right: object, proven: bool) -> type:
+    op_type = expr.operator.type
+    if proven:
+        return PROVEN_BINARY[op_type]
+    if op_type in NUMBER_BINARY and type(left) is float and type(right) is float:
+        return NUMBER_BINARY[op_type]
+    if op_type == TokenType.PLUS and type(left) is str and type(right) is str:
+        return StringConcat
+    if op_type == TokenType.EQUAL_EQUAL:
+        return Equal
+    if op_type == TokenType.BANG_EQUAL:
+        return NotEqual
+    return GenericBinary
+
+
+def specialize_unary(expr: Unary, right: object, proven: bool) -> type:
+    if expr.operator.type == TokenType.BANG:
+        return Not
+    if proven:
+        return ProvenNegate
+    if type(right) is float:
+        return NumberNegate
+    return GenericUnary
+
+
+def specialize_logical(expr: Logical) -> type:
+    return Or if expr.operator.type == TokenType.OR else And
+
+
+# 特化节点的执行函数, 参数是解释器和节点
+# 真假判断同Interpreter._is_true: 只有false和nil为假
+
+def _number_binary(interpreter, expr: NumberBinary) -> object:
+    left = interpreter.evaluate(expr.left)
+    right = interpreter.evaluate(expr.right)
+    if type(left) is float and type(right) is float:
+        return expr.op(left, right)
+    expr.__class__ = GenericBinary
+    return interpreter._binary(expr.operator, left, right)
+
+
+def _proven_binary(interpreter, expr: ProvenBinary) -> object:
+    return expr.op(interpreter.evaluate(expr.left), interpreter.evaluate(expr.right))
+
+
+def _string_concat(interpreter, expr: StringConcat) -> object:
+    left = interpreter.evaluate(expr.left)
+    right = interpreter.evaluate(expr.right)
+    if type(left) is str and type(right) is str:
+        return left + right
+    expr.__class__ = GenericBinary
+    return interpreter._binary(expr.operator, left, right)
+
+
+def _equal(interpreter, expr: Equal) -> object:
+    return interpreter._is_equal(interpreter.evaluate(expr.left), interpreter.evaluate(expr.right))
+
+
+def _not_equal(interpreter, expr: NotEqual) -> object:
+    return not interpreter._is_equal(interpreter.evaluate(expr.left), interpreter.evaluate(expr.right))
+
+
+def _generic_binary(interpreter, expr: GenericBinary) -> object:
+    return interpreter._binary(expr.operator, interpreter.evaluate(expr.left), interpreter.evaluate(expr.right))
+
+
+def _number_negate(interpreter, expr: NumberNegate) -> object:
+    right = interpreter.evaluate(expr.right)
+    if type(right) is float:
+        return -right
+    expr.__class__ = GenericUnary
+    return interpreter._unary(expr.operator, right)
+
+
+def _proven_negate(interpreter, expr: ProvenNegate) -> object:
+    return -interpreter.evaluate(expr.right)
+
+
+def _not(interpreter, expr: Not) -> object:
+    right = interpreter.evaluate(expr.right)
+    return right is None or right is False
+
+
+def _generic_unary(interpreter, expr: GenericUnary) -> object:
+    return interpreter._unary(expr.operator, interpreter.evaluate(expr.right))
+
+
+def _and(interpreter, expr: And) -> object:
+    left = interpreter.evaluate(expr.left)
+    if left is None or left is False:
+        return left
+    return interpreter.evaluate(expr.right)
+
+
+def _or(interpreter, expr: Or) -> object:
+    left = interpreter.evaluate(expr.left)
+    if left is None or left is False:
+        return interpreter.evaluate(expr.right)
+    return left
+
+
+# 第一次执行时查到的函数或类缓存在interpreter.call_targets中, 之后直接调用
+def _direct_call(interpreter, expr: DirectCall) -> object:
+    callee = interpreter.call_targets.get(expr)
+    if callee is None:
+        callee = interpreter.call_targets[expr] = interpreter.evaluate(expr.callee)
+    return callee.call(interpreter, [interpreter.evaluate(a) for a in expr.arguments])
+
+
+# 绑定时还没有定义的全局变量(比如在后面才声明的函数), 下标已经分配好, 执行到定义时写入值
+# 复制出来的节点等没有下标的, 按名字查
+def _global_variable(interpreter, expr: GlobalVariable) -> object:
+    index = interpreter.global_map.get(expr)
+    if index is None:
+        return interpreter.outermost.get(expr.name)
+    value = interpreter.outermost.values[index]
+    if value is UNDEFINED:
+        raise RuntimeException(expr.name, f"undefined variable '{expr.name.lexeme}'")
+    return value
+
+
+def _global_assign(interpreter, expr: GlobalAssign) -> object:
+    value = interpreter.evaluate(expr.value)
+    index = interpreter.global_map.get(expr)
+    values = interpreter.outermost.values
+    if index is None or values[index] is UNDEFINED:
+        interpreter.outermost.assign(expr.name, value)
+    else:
+        values[index] = value
+    return value
+
+
+def _cell_variable(interpreter, expr: CellVariable) -> object:
+    distance = interpreter.local_map[expr]
+    env = interpreter.env
+    while distance:
+        env = env.parent
+        distance -= 1
+    return env.values[interpreter.slot_map[expr]].value
+
+
+def _cell_assign(interpreter, expr: CellAssign) -> object:
+    value = interpreter.evaluate(expr.value)
+    distance = interpreter.local_map[expr]
+    env = interpreter.env
+    while distance:
+        env = env.parent
+        distance -= 1
+    env.values[interpreter.slot_map[expr]].value = value
+    return value
+
+
+def _upvalue_variable(interpreter, expr: UpvalueVariable | UpvalueThis) -> object:
+    return interpreter.env.cells[interpreter.upvalue_map[expr]].value
+
+
+def _upvalue_assign(interpreter, expr: UpvalueAssign) -> object:
+    value = interpreter.evaluate(expr.value)
+    interpreter.env.cells[interpreter.upvalue_map[expr]].value = value
+    return value
+
+
+def _upvalue_super(interpreter, expr: UpvalueSuper) -> object:
+    super_index, this_index = interpreter.upvalue_map[expr]
+    cells = interpreter.env.cells
+    method = cells[super_index].value.find_method(expr.method.lexeme)
+    return method.bind(cells[this_index].value)
+
+
+# 特化类 -> 执行函数, 子类使用父类的执行函数
+HANDLERS: dict[type, object] = {
+    NumberBinary: _number_binary,
+    ProvenBinary: _proven_binary,
+    StringConcat: _string_concat,
+    Equal: _equal,
+    NotEqual: _not_equal,
+    GenericBinary: _generic_binary,
+    NumberNegate: _number_negate,
+    ProvenNegate: _proven_negate,
+    Not: _not,
+    GenericUnary: _generic_unary,
+    And: _and,
+    Or: _or,
+    DirectCall: _direct_call,
+    GlobalVariable: _global_variable,
+    GlobalAssign: _global_assign,
+    CellVariable: _cell_variable,
+    CellAssign: _cell_assign,
+    UpvalueVariable: _upvalue_variable,
+    UpvalueAssign: _upvalue_assign,
+    UpvalueThis: _upvalue_variable,
+    UpvalueSuper: _upvalue_super,
+}
@@ -0,0 +1,211 @@
+from __future__ import annotations
+import re
+from typing import Iterator
+
+from interpreter.lox import Lox
+from interpreter.scanner import Scanner
+from interpreter.token_ import Token, TokenType
+from interpreter.token_table import TokenTable
+
+# 所有词法规则合并成一个正则, 每个token只需要re引擎匹配一次
+# 行首的空白作为下一个token的前缀一起吃掉, 不单独产生一次匹配
+# ERROR不能匹配空白, 否则文件末尾的空白会在回溯后被当成非法字符
+# \w和str.isalnum()一致, 但\d和str.isdigit()不一致, 正则也没有str.isalpha()对应的字符类,
+# 所以标识符和数字只按ASCII开头匹配, 碰到非ASCII字符的一段(UNICODE)交给Scanner扫描
+# 数字后面的前瞻同时排除了数字, 回溯时不会只匹配到一部分(不用3.11才有的占有量词)
+TOKEN_PATTERN = re.compile(r'''
+    [ \r\t]*
+    (?:
+        (?P<NEWLINE>\n)
+      | (?P<COMMENT>//[^\n]*)
+      | (?P<IDENTIFIER>[A-Za-z_]\w*)
+      | (?P<NUMBER>[0-9]+(?:\.[0-9]+(?![0-9])|(?![0-9]|\.[0-9])))(?![^\x00-\x7f]|\.[^\x00-\x7f])
+      | (?P<SYMBOL>[!=<>]=?|[(){},.\-+;/*])
+      | (?P<STRING>"[^"]*")
+      | (?P<UNTERMINATED>"[^"]*)
+      | (?P<UNICODE>(?:[\w.]|[^\x00-\x7f])+)
+      | (?P<ERROR>[^ \r\t])
+    )
+''', re.VERBOSE | re.DOTALL)
+
+# 直接在utf-8字节(比如mmap)上扫描用的版本
+# 只有纯ASCII的标识符和数字在字节上直接产生, 和非ASCII字节连在一起的一段(UNICODE)解码后交给Scanner,
+# 比如9١在str上是一个数字, 不能拆成9和١两个
+BYTES_TOKEN_PATTERN = re.compile(rb'''
+    [ \r\t]*
+    (?:
+        (?P<NEWLINE>\n)
+      | (?P<COMMENT>//[^\n]*)
+      | (?P<IDENTIFIER>[A-Za-z_][A-Za-z0-9_]*)(?![A-Za-z0-9_\x80-\xff])
+      | (?P<NUMBER>[0-9]+(?:\.[0-9]+(?![0-9])|(?![0-9]|\.[0-9])))(?![\x80-\xff]|\.[\x80-\xff])
+      | (?P<SYMBOL>[!=<>]=?|[(){},.\-+;/*])
+      | (?P<STRING>"[^"]*")
+      | (?P<UNTERMINATED>"[^"]*)
+      | (?P<UNICODE>[A-Za-z0-9_.\x80-\xff]+)
+      | (?P<ERROR>[^ \r\t])
+    )
+''', re.VERBOSE | re.DOTALL)
+
+# 运算符的词素是固定的, 不需要解码
+BYTES_SYMBOL_MAP: dict[bytes, tuple[TokenType, str]] = {
+    k.encode(): (v, k) for k, v in TokenType.SYMBOL_MAP.items()
+}
+
+
+# 与Scanner产生完全相同的token流(包括行号和错误), 只是换成了正则驱动
+# source也可以是utf-8编码的bytes/mmap, 这时只解码字符串和含非ASCII字符的部分
+class RegexScanner:
+    # 源代码
+    source: str | bytes
+    # 结果列表
+    tokens: list[Token]
+    # 当前扫描的行号
+    line: int
+
+    def __init__(self, source):
+        self.source = source
+        self.tokens = []
+        self.line = 1
+
+    def scan_tokens(self) -> list[Token]:
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+
+    def iter_tokens(self) -> Iterator[Token]:
+        if isinstance(self.source, str):
+            yield from self._iter_str_tokens()
+        else:
+            yield from self._iter_bytes_tokens()
+        yield Token(TokenType.EOF, "EOF", None, self.line)
+
+    # 以下两个方法产出除EOF以外的token, 结束时更新self.line
+    def _iter_str_tokens(self) -> Iterator[Token]:
+        symbol_map = TokenType.SYMBOL_MAP
+        keyword_map = TokenType.KEYWORD_MAP
+        identifier = TokenType.IDENTIFIER
+        line = self.line
+
+        for m in TOKEN_PATTERN.finditer(self.source):
+            kind = m.lastgroup
+            text = m.group(kind)
+            if kind == 'IDENTIFIER':
+                yield Token(keyword_map.get(text, identifier), text, None, line)
+            elif kind == 'SYMBOL':
+                yield Token(symbol_map[text], text, None, line)
+            elif kind == 'NEWLINE':
+                line += 1
+            elif kind == 'NUMBER':
+                yield Token(TokenType.NUMBER, text, float(text), line)
+            elif kind == 'STRING':
+                # 字符串里的换行也要计数, token的行号是字符串结束的那一行
+                line += text.count('\n')
+                yield Token(TokenType.STRING, text, text[1:-1], line)
+            elif kind == 'UNTERMINATED':
+                line += text.count('\n')
+                Lox.error(line=line, where='"', message='unterminated string')
+            elif kind == 'UNICODE':
+                yield from _rescan(text, line)
+            elif kind == 'ERROR':
+                Lox.error(line=line, where=text, message='unexpected character')
+
+        self.line = line
+
+    def _iter_bytes_tokens(self) -> Iterator[Token]:
+        symbol_map = BYTES_SYMBOL_MAP
+        # 关键字直接按bytes查, 不用先解码
+        keywords = {k.encode(): (v, k) for k, v in TokenType.KEYWORD_MAP.items()}
+        identifier = TokenType.IDENTIFIER
+        line = self.line
+
+        for m in BYTES_TOKEN_PATTERN.finditer(self.source):
+            kind = m.lastgroup
+            text = m.group(kind)
+            if kind == 'IDENTIFIER':
+                keyword = keywords.get(text)
+                if keyword is not None:
+                    yield Token(keyword[0], keyword[1], None, line)
+                else:
+                    yield Token(identifier, text.decode('ascii'), None, line)
+            elif kind == 'SYMBOL':
+                type, lexeme = symbol_map[text]
+                yield Token(type, lexeme, None, line)
+            elif kind == 'NEWLINE':
+                line += 1
+            elif kind == 'NUMBER':
+                yield Token(TokenType.NUMBER, text.decode('ascii'), float(text), line)
+            elif kind == 'STRING':
+                line += text.count(b'\n')
+                lexeme = text.decode()
+                yield Token(TokenType.STRING, lexeme, lexeme[1:-1], line)
+            elif kind == 'UNTERMINATED':
+                line += text.count(b'\n')
+                Lox.error(line=line, where='"', message='unterminated string')
+            elif kind == 'UNICODE':
+                yield from _rescan(text.decode(), line)
+            elif kind == 'ERROR':
+                Lox.error(line=line, where=text.decode('ascii'), message='unexpected character')
+
+        self.line = line
+
+    # 只记录每个token的类型/位置/行号, 不创建Token对象
+    # token表按字符位置切词素, bytes/mmap先整个解码
+    def scan_table(self) -> TokenTable:
+        symbol_map = TokenType.SYMBOL_MAP
+        keyword_map = TokenType.KEYWORD_MAP
+        identifier = TokenType.IDENTIFIER.value
+        source = self.source if isinstance(self.source, str) else str(self.source, 'utf-8')
+        table = TokenTable(source)
+        types, starts, ends, lines = table.types, table.starts, table.ends, table.lines
+        line = self.line
+
+        for m in TOKEN_PATTERN.finditer(source):
+            kind = m.lastgroup
+            if kind == 'NEWLINE':
+                line += 1
+                continue
+            if kind == 'COMMENT':
+                continue
+            text = m.group(kind)
+            if kind == 'IDENTIFIER':
+                type = keyword_map.get(text)
+                code = identifier if type is None else type.value
+            elif kind == 'SYMBOL':
+                code = symbol_map[text].value
+            elif kind == 'NUMBER':
+                code = TokenType.NUMBER.value
+            elif kind == 'STRING':
+                line += text.count('\n')
+                code = TokenType.STRING.value
+            elif kind == 'UNTERMINATED':
+                line += text.count('\n')
+                Lox.error(line=line, where='"', message='unterminated string')
+                continue
+            elif kind == 'UNICODE':
+                offset = m.start(kind)
+                scanner = Scanner(text)
+                scanner.line = line
+                for token in scanner.iter_tokens():
+                    if token.type is not TokenType.EOF:
+                        table.append(token.type, offset + scanner.start, offset + scanner.current, line)
+                continue
+            else:
+                Lox.error(line=line, where=text, message='unexpected character')
+                continue
+            types.append(code)
+            starts.append(m.start(kind))
+            ends.append(m.end(kind))
+            lines.append(line)
+
+        self.line = line
+        end = len(source)
+        table.append(TokenType.EOF, end, end, line)
+        return table
+
+
+# 这一段不跨行, 也不会和前后的token连在一起, 所以单独交给Scanner扫描结果不变
+def _rescan(text: str, line: int) -> Iterator[Token]:
+    scanner = Scanner(text)
+    scanner.line = line
+    for token in scanner.iter_tokens():
+        if token.type is not TokenType.EOF:
+            yield token
@@ -1,11 +1,15 @@
+from __future__ import annotations
 from enum import unique, Enum
 
+from interpreter.ast_walk import children, walk
+from interpreter.env import UNDEFINED
 from interpreter.expr import ExprVisitor, Variable, Unary, Logical, Literal, Grouping, Call, Binary, Assign, Expr, Get, \
     Set, This, Super
+from interpreter.lazy_parser import LazyFunction
 from interpreter.lox import Lox
 from interpreter.stmt import StmtVisitor, Var, Return, While, Print, If, Continue, Break, Function, Expression, Block, \
     Stmt, Class
-from interpreter.token_ import Token
+from interpreter.token_ import Token, TokenType
 from interpreter.interpreter_ import Interpreter
 
 
@@ -28,6 +32,7 @@ class ClassType(Enum):
 class Resolver(ExprVisitor, StmtVisitor):
     interpreter: Interpreter
     # 作用域map中与key相关联的值代表的是我们是否已经结束了对变量初始化式的解析
+    # 变量在map中的顺序就是它在作用域中的槽位, 见_slot
     scope_stack: list[dict[str, bool]]
     current_function: FunctionType
     current_class: ClassType
@@ -42,29 +47,331 @@ class Resolver(ExprVisitor, StmtVisitor):
         for stmt in statements:
             self._resolve_stmt(stmt)
 
+    # 整个程序绑定完成后调用: 找出只声明一次, 从来没被赋值过的顶层函数和类,
+    # 把调用它们并且参数个数正确的地方换成quicken.DirectCall, 执行时第一次查到的函数或类直接缓存在调用处,
+    # 之后不再查变量, 也不再检查是不是可调用, 参数个数对不对
+    # 参数个数不对的调用保持原样, 执行到时照常报错
+    # 内置函数的名字(比如clock)在声明之前指向内置函数, 不绑定
+    def bind_direct_calls(self, statements: list[Stmt]) -> None:
+        from interpreter.quicken import DirectCall
+        local_map = self.interpreter.local_map
+        targets, calls = self.find_fixed_globals(statements)
+
+        # 类的参数个数是init方法的, 没有init时找父类的; 父类不能直接绑定时返回None
+        def arity(target: Function | Class, seen: set) -> int | None:
+            if isinstance(target, Function):
+                return len(target.params)
+            for m in target.methods:
+                if m.name.lexeme == 'init':
+                    return len(m.params)
+            if target.super_class is None:
+                return 0
+            super_class = targets.get(target.super_class.name.lexeme)
+            if not isinstance(super_class, Class) or super_class in seen:
+                return None
+            seen.add(super_class)
+            return arity(super_class, seen)
+
+        arities = {name: arity(target, {target}) for name, target in targets.items()}
+        for call in calls:
+            callee = call.callee
+            if isinstance(callee, Variable) and callee not in local_map \
+                    and arities.get(callee.name.lexeme, -1) == len(call.arguments):
+                call.__class__ = DirectCall
+
+    # 找出只声明一次, 从来没被赋值过的顶层函数和类, 名字记在interpreter.fixed_globals中
+    # 返回名字 -> 声明, 以及程序中所有的调用
+    def find_fixed_globals(self, statements: list[Stmt]) -> tuple[dict[str, Function | Class], list[Call]]:
+        local_map = self.interpreter.local_map
+
+        declared: dict[str, int] = {}
+        for stmt in statements:
+            if isinstance(stmt, (Var, Function, Class)):
+                declared[stmt.name.lexeme] = declared.get(stmt.name.lexeme, 0) + 1
+
+        assigned = set()
+        calls = []
+        for node in walk(statements):
+            if isinstance(node, Assign) and node not in local_map:
+                assigned.add(node.name.lexeme)
+            elif isinstance(node, Call):
+                calls.append(node)
+            elif isinstance(node, LazyFunction) and not node.loaded:
+                # 还没解析的函数体, 从token中找 name = 的形式
+                tokens = node.tokens
+                for i in range(len(tokens) - 1):
+                    if tokens[i].type == TokenType.IDENTIFIER and tokens[i + 1].type == TokenType.EQUAL:
+                        assigned.add(tokens[i].lexeme)
+
+        # 可以直接绑定的函数和类 -> 声明
+        targets: dict[str, Function | Class] = {}
+        for stmt in statements:
+            name = stmt.name.lexeme if isinstance(stmt, (Function, Class)) else None
+            if name is not None and declared[name] == 1 and name not in assigned \
+                    and self.interpreter.outermost.lookup(name) is UNDEFINED:
+                targets[name] = stmt
+        self.interpreter.fixed_globals = set(targets)
+        return targets, calls
+
+    # 逃逸分析, 在其他所有改写语法树的优化之后运行
+    # 作用域中(包括更内层的作用域中)声明了函数或类时, 闭包会一直引用这个作用域的帧, 称为被捕获
+    # 没有被捕获的Block不再单独分配帧, 执行时直接用外层的帧:
+    #   它的槽位接在外层作用域的槽位后面, 外层帧的大小跟着变大, 读写变量的深度和槽位也跟着改写
+    #   这样的Block从frame_sizes中删除. 并列的Block共用同一段槽位, 变量总是先声明再使用, 不会读到上一次的值
+    # 没有被捕获的函数, 返回以后帧不会再被用到, 在interpreter.frame_pools中重复使用
+    # 顶层的Block外面是全局变量表, 仍然有自己的帧, 没有被捕获时也重复使用
+    # 深度和槽位是直接改写的, 同一段代码只能分析一次. 预解析的函数在解析函数体时单独分析,
+    # 它外层的作用域都被它捕获, 不会和外层共用帧, 所以分开分析的结果是一样的
+    # 扁平闭包(见flatten_closures)不引用外层的帧, 没有作用域被捕获; 创建闭包时读的变量在创建闭包的作用域中改写
+    def analyze_escapes(self, statements: list[Stmt]) -> None:
+        interpreter = self.interpreter
+        captured = set() if interpreter.flat_closures else _captured_scopes(statements)
+        captures = interpreter.captures
+        local_map, slot_map, frame_sizes = interpreter.local_map, interpreter.slot_map, interpreter.frame_sizes
+        # 和外层共用帧的Block, 和帧 -> 新的大小
+        shared: list[Block] = []
+        sizes: dict[Stmt, int] = {}
+
+        stack: list[tuple[object, _Scope | None]] = [(statements, None)]
+        while stack:
+            node, scope = stack.pop()
+            if isinstance(node, list):
+                stack.extend((n, scope) for n in node)
+                continue
+            if not isinstance(node, (Expr, Stmt)):
+                continue
+            depth = local_map.get(node)
+            if depth is not None:
+                # 只数有自己的帧的作用域
+                target, frames = scope, 0
+                for _ in range(depth):
+                    if target is None:
+                        # 分析的代码外面的作用域
+                        frames += 1
+                    else:
+                        if not target.shared:
+                            frames += 1
+                        target = target.parent
+                local_map[node] = frames
+                if target is not None:
+                    slot_map[node] += target.offset
+            elif scope is not None and node in slot_map:
+                # 局部的声明
+                slot_map[node] += scope.offset
+
+            if isinstance(node, Block):
+                if scope is None or node in captured:
+                    if node not in captured:
+                        interpreter.frame_pools[node] = []
+                    inner = _Scope(node, scope, False, 0)
+                else:
+                    inner = _Scope(node, scope, True, scope.offset + frame_sizes[scope.node])
+                    frame = scope
+                    while frame.shared:
+                        frame = frame.parent
+                    sizes[frame.node] = max(sizes.get(frame.node, 0), inner.offset + frame_sizes[node])
+                    shared.append(node)
+                stack.append((node.statements, inner))
+            elif isinstance(node, Function):
+                # 方法捕获的变量在类外面的作用域中读; 单独分析的预解析函数, 捕获的变量已经在外层改写过了
+                if scope is not None and not isinstance(scope.node, Class):
+                    stack.extend((source, scope) for _, source in captures.get(node, ()))
+                if node.body is None:
+                    # 还没解析的函数体
+                    continue
+                if node not in captured:
+                    interpreter.frame_pools[node] = []
+                stack.append((node.body, _Scope(node, scope, False, 0)))
+            elif isinstance(node, Class):
+                stack.append((node.super_class, scope))
+                for m in node.methods:
+                    stack.extend((source, scope) for _, source in captures.get(m, ()))
+                inner = scope
+                if node.super_class is not None:
+                    inner = _Scope(node, inner, False, 0)
+                stack.append((node.methods, _Scope(node, inner, False, 0)))
+            else:
+                stack.extend((child, scope) for child in children(node))
+
+        for frame, size in sizes.items():
+            frame_sizes[frame] = max(frame_sizes[frame], size)
+        for block in shared:
+            del frame_sizes[block]
+
+    # 扁平闭包, 在其他所有改写语法树的优化之后, 逃逸分析之前运行
+    # 闭包不再引用创建它时的整条环境链, 只保存用到的外层变量, 同clox中的upvalue:
+    #   被内层函数用到的局部变量(包括形参)放在env.Cell中, 槽位上存的是Cell, 见quicken.CellVariable和CellAssign
+    #   函数用到的外层变量按顺序记在interpreter.captures中, 创建闭包时取出这些Cell放进闭包的cells;
+    #   外层的外层的变量先由外层函数捕获, 再从外层函数的cells中取; this和super不会被赋值, 直接捕获值
+    #   函数中读写外层变量的节点按interpreter.upvalue_map中的下标读写cells, 见quicken.UpvalueVariable等
+    # 函数的帧外面只剩this和super的环境(方法), 或者什么都没有(普通函数), 返回的闭包不会让外层的帧一直活着
+    # 还没解析的预解析函数, 把函数体的token中出现的名字都当成用到的变量;
+    # 第一次调用时单独分析这个函数, 它用到的外层变量按名字对应到已经捕获的变量
+    def flatten_closures(self, statements: list[Stmt]) -> None:
+        from interpreter.quicken import CELL_NODES, UPVALUE_NODES
+        interpreter = self.interpreter
+        local_map, slot_map, upvalue_map = interpreter.local_map, interpreter.slot_map, interpreter.upvalue_map
+        captures = interpreter.captures
+        # 被闭包捕获的局部变量: (作用域, 槽位)
+        captured: set[tuple[_LexicalScope, int]] = set()
+        # 函数 -> 捕获的变量 -> 在闭包的cells中的下标
+        # 变量是(作用域, 槽位), 作用域在这次分析的代码外面时是变量名
+        indices: dict[Function, dict] = {}
+        # 局部的读写和声明, 和变量所在的作用域, 所有闭包都分析完才知道变量有没有被捕获
+        locals_: list[tuple[Expr | Stmt, _LexicalScope, int]] = []
+        functions: list[_LexicalScope] = []
+
+        # 函数捕获的变量在cells中的下标, 第一次用到时记进captures
+        def capture(function: _LexicalScope, target: _LexicalScope | None, slot: int, name: Token) -> int:
+            key = name.lexeme if target is None else (target, slot)
+            index = indices[function.node].get(key)
+            if index is not None:
+                return index
+            # 创建闭包时所在的作用域, 方法是在类外面的作用域中创建的
+            scope = function.parent
+            while scope is not None and scope.node is None:
+                scope = scope.parent
+            source = Variable(name)
+            if target is not None and _reaches(scope, target):
+                local_map[source] = _distance(scope, target)
+                slot_map[source] = slot
+                if target.node is None:
+                    kind = 'value'
+                else:
+                    kind = 'cell'
+                    captured.add((target, slot))
+            else:
+                kind = 'upvalue'
+                upvalue_map[source] = capture(scope.owner, target, slot, name)
+            sources = captures[function.node]
+            sources.append((kind, source))
+            index = indices[function.node][key] = len(sources) - 1
+            return index
+
+        stack: list[tuple[object, _LexicalScope | None]] = []
+        for stmt in statements:
+            scope = None
+            if isinstance(stmt, LazyFunction) and stmt in captures:
+                indices[stmt] = {source.name.lexeme: i for i, (_, source) in enumerate(captures[stmt])}
+                # 方法外面是this和super的作用域
+                if stmt.function_type in (FunctionType.METHOD, FunctionType.INITIALIZER):
+                    if stmt.class_type == ClassType.SUBCLASS:
+                        scope = _LexicalScope(None, scope)
+                    scope = _LexicalScope(None, scope)
+            stack.append((stmt, scope))
+        while stack:
+            node, scope = stack.pop()
+            if isinstance(node, list):
+                stack.extend((n, scope) for n in node)
+                continue
+            if not isinstance(node, (Expr, Stmt)):
+                continue
+            depth = local_map.get(node)
+            if depth is not None:
+                # 读写局部变量, this和super
+                target, slot = _ancestor(scope, depth), slot_map[node]
+                if target is not None and _reaches(scope, target):
+                    locals_.append((node, target, slot))
+                elif isinstance(node, Super):
+                    this = Token(TokenType.THIS, 'this', None, node.keyword.line)
+                    upvalue_map[node] = (capture(scope.owner, target, slot, node.keyword),
+                                         capture(scope.owner, _ancestor(scope, depth - 1), 0, this))
+                else:
+                    name = node.keyword if isinstance(node, This) else node.name
+                    upvalue_map[node] = capture(scope.owner, target, slot, name)
+                if node in upvalue_map:
+                    node.__class__ = UPVALUE_NODES[type(node)]
+                    del local_map[node], slot_map[node]
+            elif scope is not None and node in slot_map:
+                # 局部的声明
+                locals_.append((node, scope, slot_map[node]))
+
+            if isinstance(node, Block):
+                stack.append((node.statements, _LexicalScope(node, scope)))
+            elif isinstance(node, Function):
+                function = _LexicalScope(node, scope)
+                functions.append(function)
+                if node not in indices:
+                    captures[node] = []
+                    indices[node] = {}
+                if node.body is not None:
+                    stack.append((node.body, function))
+                    continue
+                # 还没解析的函数体: 和解析函数体时一样, 在记下的作用域中从内向外找token中出现的名字
+                scopes = node.scopes
+                for name in _referenced_names(node.tokens):
+                    for i in range(len(scopes) - 1, -1, -1):
+                        if name.lexeme in scopes[i]:
+                            target = _ancestor(function, len(scopes) - 1 - i)
+                            if target is None or not _reaches(function, target):
+                                capture(function, target, self._slot(scopes[i], name.lexeme), name)
+                            break
+            elif isinstance(node, Class):
+                stack.append((node.super_class, scope))
+                inner = scope
+                if node.super_class is not None:
+                    inner = _LexicalScope(None, inner)
+                stack.append((node.methods, _LexicalScope(None, inner)))
+            else:
+                stack.extend((child, scope) for child in children(node))
+
+        for node, scope, slot in locals_:
+            if (scope, slot) in captured:
+                if isinstance(node, Stmt):
+                    interpreter.cell_decls.add(node)
+                else:
+                    node.__class__ = CELL_NODES[type(node)]
+        for function in functions:
+            params = [i for i in range(len(function.node.params)) if (function, i) in captured]
+            if params:
+                interpreter.cell_params[function.node] = params
+
     def _resolve_stmt(self, statement: Stmt) -> None:
         statement.accept(self)
 
     def _resolve_expr(self, expression: Expr) -> None:
         expression.accept(self)
 
+    def _error(self, token: Token, message: str) -> None:
+        Lox.error(token=token, message=message)
+
     def _begin_scope(self) -> None:
         self.scope_stack.append({})
 
-    def _end_scope(self) -> None:
+    # scope是这个作用域对应的Block或函数, 记下作用域中有多少个槽位, 执行时按这个大小分配帧
+    def _end_scope(self, scope: Stmt = None) -> None:
+        if scope is not None:
+            self.interpreter.allocate(scope, len(self.scope_stack[-1]))
         self.scope_stack.pop()
 
-    # 声明变量
-    def _declare(self, name: Token) -> None:
+    # 变量的槽位: 它是作用域中第几个声明的变量, dict保持插入的顺序
+    @staticmethod
+    def _slot(scope: dict[str, bool], name: str) -> int:
+        for slot, k in enumerate(scope):
+            if k == name:
+                return slot
+        return -1
+
+    # 声明变量, 返回分配给它的槽位, 全局变量返回None
+    def _declare(self, name: Token) -> int | None:
         # 忽略全局变量
         if len(self.scope_stack) == 0:
-            return
+            return None
         scope = self.scope_stack[-1]
         # 同一个作用域中禁止申明同名变量
         if name.lexeme in scope.keys():
-            Lox.error(token=name, message='already variable with this name in this scope.')
+            self._error(name, 'already variable with this name in this scope.')
+            return self._slot(scope, name.lexeme)
 
         scope[name.lexeme] = False
+        return len(scope) - 1
+
+    # 局部的声明语句执行时把值写进slot, 全局的写进全局变量表中分配的下标
+    def _declare_slot(self, stmt: Stmt, slot: int | None) -> None:
+        if slot is not None:
+            self.interpreter.declare(stmt, slot)
+        elif len(self.scope_stack) == 0:
+            self.interpreter.resolve_global(stmt, stmt.name)
 
     # 变量定义
     def _define(self, name: Token) -> None:
@@ -75,14 +382,18 @@ class Resolver(ExprVisitor, StmtVisitor):
 
     # 计算在当前作用域和变量定义的作用域之间隔着多少层作用域
     # 所以，如果在当前作用域中找到该变量，则传入0；如果在紧邻的外网作用域中找到，则传1
+    # 同时传入变量在那一层作用域中的槽位
+    # 哪一层都找不到的是全局变量, 分配全局变量表中的下标, 变量可以在后面才定义
     def _resolve_local(self, expr: Expr, name: Token) -> None:
         i = len(self.scope_stack) - 1
         while i >= 0:
             scope = self.scope_stack[i]
             if name.lexeme in scope.keys():
-                self.interpreter.resolve(expr, len(self.scope_stack) - 1 - i)
+                self.interpreter.resolve(expr, len(self.scope_stack) - 1 - i, self._slot(scope, name.lexeme))
                 return
             i -= 1
+        if isinstance(expr, (Variable, Assign)):
+            self.interpreter.resolve_global(expr, name)
 
     def _resolve_function(self, stmt: Function, type: FunctionType) -> None:
         # 表明进入了函数
@@ -93,9 +404,14 @@ class Resolver(ExprVisitor, StmtVisitor):
         for param in stmt.params:
             self._declare(param)
             self._define(param)
-        # 静态分析中 立即遍历了函数体
-        self.resolve(stmt.body)
-        self._end_scope()
+        if isinstance(stmt, LazyFunction) and not stmt.loaded:
+            # 函数体还没解析, 等第一次调用时在同样的作用域中继续, 作用域的大小也到那时才知道
+            stmt.defer(self.scope_stack, type, self.current_class)
+            self._end_scope()
+        else:
+            # 静态分析中 立即遍历了函数体
+            self.resolve(stmt.body)
+            self._end_scope(stmt)
 
         self.current_function = pre_func
 
@@ -139,16 +455,16 @@ class Resolver(ExprVisitor, StmtVisitor):
 
     def visit_super(self, expr: Super) -> object:
         if self.current_class == ClassType.NONE:
-            Lox.error(token=expr.keyword, message="can not use 'super' outsize of a class")
+            self._error(expr.keyword, "can not use 'super' outsize of a class")
         elif self.current_class == ClassType.CLASS:
-            Lox.error(token=expr.keyword, message="can not use 'super' in a class with no super class")
+            self._error(expr.keyword, "can not use 'super' in a class with no super class")
 
         self._resolve_local(expr, expr.keyword)
         return None
 
     def visit_this(self, expr: This) -> object:
         if self.current_class == ClassType.NONE:
-            Lox.error(token=expr.keyword, message=f"can not use 'this' outside of class")
+            self._error(expr.keyword, f"can not use 'this' outside of class")
             return None
 
         # 只要遇到this表达式（至少是在方法内部），它就会解析为一个“局部变量”
@@ -164,7 +480,7 @@ class Resolver(ExprVisitor, StmtVisitor):
         if len(self.scope_stack) != 0 and expr.name.lexeme in self.scope_stack[-1].keys():
             var = self.scope_stack[-1][expr.name.lexeme]
             if not var:
-                Lox.error(token=expr.name, message='Can not read local variable in its own initializer')
+                self._error(expr.name, 'Can not read local variable in its own initializer')
 
         self._resolve_local(expr, expr.name)
         return None
@@ -173,11 +489,11 @@ class Resolver(ExprVisitor, StmtVisitor):
         pre_class = self.current_class
         self.current_class = ClassType.CLASS
 
-        self._declare(stmt.name)
+        self._declare_slot(stmt, self._declare(stmt.name))
         self._declare(stmt.name)
         if stmt.super_class is not None:
             if stmt.name.lexeme == stmt.super_class.name.lexeme:
-                Lox.error(token=stmt.super_class.name, message='a class can not inherit from itself')
+                self._error(stmt.super_class.name, 'a class can not inherit from itself')
 
             self.current_class = ClassType.SUBCLASS
             self._resolve_expr(stmt.super_class)
@@ -202,7 +518,7 @@ class Resolver(ExprVisitor, StmtVisitor):
     def visit_block(self, stmt: Block) -> object:
         self._begin_scope()
         self.resolve(stmt.statements)
-        self._end_scope()
+        self._end_scope(stmt)
         return None
 
     def visit_expression(self, stmt: Expression) -> object:
@@ -210,7 +526,7 @@ class Resolver(ExprVisitor, StmtVisitor):
         return None
 
     def visit_function(self, stmt: Function) -> object:
-        self._declare(stmt.name)
+        self._declare_slot(stmt, self._declare(stmt.name))
         self._define(stmt.name)
         self._resolve_function(stmt, FunctionType.FUNCTION)
         return None
@@ -238,19 +554,125 @@ class Resolver(ExprVisitor, StmtVisitor):
         return None
 
     def visit_return(self, stmt: Return) -> object:
-        # return 必须要在函数中
-        if self.current_function == FunctionType.NONE:
-            Lox.error(token=stmt.keyword, message='can not return from top level code')
-
+        self._check_return(stmt.keyword, stmt.value is not None)
         if stmt.value is not None:
-            if self.current_function == FunctionType.INITIALIZER:
-                Lox.error(token=stmt.keyword, message='can not return a value from initializer')
             self._resolve_expr(stmt.value)
         return None
 
+    def _check_return(self, keyword: Token, has_value: bool) -> None:
+        # return 必须要在函数中
+        if self.current_function == FunctionType.NONE:
+            self._error(keyword, 'can not return from top level code')
+
+        if has_value and self.current_function == FunctionType.INITIALIZER:
+            self._error(keyword, 'can not return a value from initializer')
+
     # 声明变量 在当前作用域中添加一项
     def visit_var(self, stmt: Var) -> None:
-        self._declare(stmt.name)
+        self._declare_slot(stmt, self._declare(stmt.name))
         if stmt.initializer is not None:
             self._resolve_expr(stmt.initializer)
         self._define(stmt.name)
+
+
+# 逃逸分析中的一层作用域
+class _Scope:
+    __slots__ = ('node', 'parent', 'shared', 'offset')
+    # Block, 函数, 或者类(this和super的作用域)
+    node: Stmt
+    parent: '_Scope | None'
+    # 是否和外层作用域共用一个帧
+    shared: bool
+    # 这个作用域的槽位在帧中的起点
+    offset: int
+
+    def __init__(self, node, parent, shared, offset):
+        self.node = node
+        self.parent = parent
+        self.shared = shared
+        self.offset = offset
+
+
+# 扁平闭包分析中的一层作用域
+# node是Block或函数; 类的this和super的作用域是None
+class _LexicalScope:
+    __slots__ = ('node', 'parent', 'owner')
+    node: Stmt | None
+    parent: '_LexicalScope | None'
+    # 作用域在哪个函数的帧中: 函数本身, 顶层代码为None; this和super的作用域是它自己
+    owner: '_LexicalScope | None'
+
+    def __init__(self, node, parent):
+        self.node = node
+        self.parent = parent
+        if node is None or isinstance(node, Function):
+            self.owner = self
+        else:
+            self.owner = None if parent is None else parent.owner
+
+
+# 从scope向外数depth层作用域, 超出分析的代码时返回None
+def _ancestor(scope: _LexicalScope | None, depth: int) -> _LexicalScope | None:
+    for _ in range(depth):
+        if scope is None:
+            return None
+        scope = scope.parent
+    return scope
+
+
+# target和scope是否在同一个函数的帧中, 方法也能直接用到外面的this和super, 这些不需要闭包捕获
+def _reaches(scope: _LexicalScope | None, target: _LexicalScope) -> bool:
+    owner = None if scope is None else scope.owner
+    if target.owner is owner:
+        return True
+    parent = None if owner is None else owner.parent
+    while parent is not None and parent.node is None:
+        if parent is target:
+            return True
+        parent = parent.parent
+    return False
+
+
+def _distance(scope: _LexicalScope, target: _LexicalScope) -> int:
+    depth = 0
+    while scope is not target:
+        scope = scope.parent
+        depth += 1
+    return depth
+
+
+# 函数体的token中出现的名字, 每个名字一个token; 用到super时也要用到this
+def _referenced_names(tokens: list[Token]) -> list[Token]:
+    names: dict[str, Token] = {}
+    for token in tokens:
+        if token.type in (TokenType.IDENTIFIER, TokenType.THIS, TokenType.SUPER):
+            names.setdefault(token.lexeme, token)
+    if 'super' in names and 'this' not in names:
+        token = names['super']
+        names['this'] = Token(TokenType.THIS, 'this', None, token.line)
+    return list(names.values())
+
+
+# 被捕获的Block和函数: 其中(包括更内层的作用域中)声明了函数或类
+def _captured_scopes(statements: list[Stmt]) -> set[Stmt]:
+    captured = set()
+    # Block和函数 -> 外层的Block或函数
+    parents: dict[Stmt, Stmt | None] = {}
+    stack: list[tuple[object, Stmt | None]] = [(statements, None)]
+    while stack:
+        node, scope = stack.pop()
+        if isinstance(node, list):
+            stack.extend((n, scope) for n in node)
+            continue
+        if not isinstance(node, (Expr, Stmt)):
+            continue
+        if isinstance(node, (Function, Class)):
+            outer = scope
+            while outer is not None and outer not in captured:
+                captured.add(outer)
+                outer = parents[outer]
+        if isinstance(node, (Block, Function)):
+            parents[node] = scope
+            scope = node
+        stack.extend((child, scope) for child in children(node))
+    return captured
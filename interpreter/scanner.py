@@ -1,3 +1,6 @@
+from __future__ import annotations
+from typing import Iterator
+
 from interpreter.lox import Lox
 from interpreter.token_ import Token, TokenType
 
@@ -22,94 +25,85 @@ class Scanner:
         self.line = 1
 
     def scan_tokens(self) -> list[Token]:
+        self.tokens.extend(self.iter_tokens())
+        return self.tokens
+
+    # 边扫描边产出token, 不在内存中保留整个token列表
+    def iter_tokens(self) -> Iterator[Token]:
         while not self._is_at_end():
             self.start = self.current
-            self._scan_token()
+            token = self._scan_token()
+            if token is not None:
+                yield token
 
-        eof_token = Token(TokenType.EOF, "EOF", None, self.line)
-        self.tokens.append(eof_token)
-        return self.tokens
+        yield Token(TokenType.EOF, "EOF", None, self.line)
 
     def _is_at_end(self) -> bool:
         return self.current >= len(self.source)
 
-    def _scan_token(self) -> None:
+    # 扫描出一个token, 空白和注释返回None
+    def _scan_token(self) -> Token | None:
         ch = self._advance()
         # white
         if ch == ' ' or ch == '\r' or ch == '\t':
-            return
+            return None
         if ch == '\n':
             self.line += 1
-            return
+            return None
         # single char token
         if ch == '(':
-            self._add_token(TokenType.LEFT_PAREN)
-            return
+            return self._add_token(TokenType.LEFT_PAREN)
         if ch == ')':
-            self._add_token(TokenType.RIGHT_PAREN)
-            return
+            return self._add_token(TokenType.RIGHT_PAREN)
         if ch == '{':
-            self._add_token(TokenType.LEFT_BRACE)
-            return
+            return self._add_token(TokenType.LEFT_BRACE)
         if ch == '}':
-            self._add_token(TokenType.RIGHT_BRACE)
-            return
+            return self._add_token(TokenType.RIGHT_BRACE)
         if ch == ',':
-            self._add_token(TokenType.COMMA)
-            return
+            return self._add_token(TokenType.COMMA)
         if ch == '.':
-            self._add_token(TokenType.DOT)
-            return
+            return self._add_token(TokenType.DOT)
         if ch == '-':
-            self._add_token(TokenType.MINUS)
-            return
+            return self._add_token(TokenType.MINUS)
         if ch == '+':
-            self._add_token(TokenType.PLUS)
-            return
+            return self._add_token(TokenType.PLUS)
         if ch == ';':
-            self._add_token(TokenType.SEMICOLON)
-            return
+            return self._add_token(TokenType.SEMICOLON)
         if ch == '*':
-            self._add_token(TokenType.STAR)
-            return
+            return self._add_token(TokenType.STAR)
         # 2 char token
         if ch == '!':
-            self._add_token(self._match_type('=', TokenType.BANG_EQUAL, TokenType.BANG))
-            return
+            return self._add_token(self._match_type('=', TokenType.BANG_EQUAL, TokenType.BANG))
         if ch == '=':
-            self._add_token(self._match_type('=', TokenType.EQUAL_EQUAL, TokenType.EQUAL))
-            return
+            return self._add_token(self._match_type('=', TokenType.EQUAL_EQUAL, TokenType.EQUAL))
         if ch == '<':
-            self._add_token(self._match_type('=', TokenType.LESS_EQUAL, TokenType.LESS))
-            return
+            return self._add_token(self._match_type('=', TokenType.LESS_EQUAL, TokenType.LESS))
         if ch == '>':
-            self._add_token(self._match_type('=', TokenType.GREATER_EQUAL, TokenType.GREATER))
-            return
+            return self._add_token(self._match_type('=', TokenType.GREATER_EQUAL, TokenType.GREATER))
         # other
         if ch == '/':
-            self._strip_comment() if self._is_match('/') else self._add_token(TokenType.SLASH)
-            return
+            if self._is_match('/'):
+                self._strip_comment()
+                return None
+            return self._add_token(TokenType.SLASH)
         if ch == '"':
-            self._strip_string()
-            return
+            return self._strip_string()
         if ch.isdigit():
-            self._strip_number()
-            return
+            return self._strip_number()
         if ch.isalpha() or ch == '_':
-            self._strip_identifier()
-            return
+            return self._strip_identifier()
 
         Lox.error(line=self.line, where=ch, message='unexpected character')
+        return None
 
     def _advance(self) -> str:
         ch = self.source[self.current]
         self.current += 1
         return ch
 
-    def _add_token(self, type: TokenType, literal: object = None) -> None:
+    def _add_token(self, type: TokenType, literal: object = None) -> Token:
         text = self.source[self.start:self.current]
-        token = Token(type, text, literal, self.line)
-        self.tokens.append(token)
+        return Token(type, text, literal, self.line)
 
     def _peek(self) -> str:
         if self._is_at_end():
@@ -137,18 +131,21 @@ class Scanner:
         while (not self._is_at_end()) and (self._peek() != '\n'):
             self._advance()
 
-    def _strip_string(self) -> None:
+    def _strip_string(self) -> Token | None:
         # "foo"
         while (not self._is_at_end()) and (self._peek() != '"'):
             if self._peek() == '\n':
                 self.line += 1
             self._advance()
+        if self._is_at_end():
+            Lox.error(line=self.line, where='"', message='unterminated string')
+            return None
         # end "
         self._advance()
         value = self.source[self.start + 1:self.current - 1]
-        self._add_token(TokenType.STRING, value)
+        return self._add_token(TokenType.STRING, value)
 
-    def _strip_number(self) -> None:
+    def _strip_number(self) -> Token:
         # 123
         # 123.55
         # todo is end 判断
@@ -167,9 +164,9 @@ class Scanner:
         value = self.source[self.start:self.current]
         # value = float(value) if is_float else int(value)
         value = float(value)
-        self._add_token(TokenType.NUMBER, value)
+        return self._add_token(TokenType.NUMBER, value)
 
-    def _strip_identifier(self) -> None:
+    def _strip_identifier(self) -> Token:
         ch = self._peek()
         while ch.isalnum() or ch == '_':
             self._advance()
@@ -177,4 +174,4 @@ class Scanner:
 
         text = self.source[self.start:self.current]
         type = TokenType.KEYWORD_MAP.get(text, TokenType.IDENTIFIER)
-        self._add_token(type)
+        return self._add_token(type)
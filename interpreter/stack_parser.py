@@ -0,0 +1,277 @@
+from typing import Generator
+
+from interpreter.error import ParseException
+from interpreter.expr import Expr, Binary, Unary, Literal, Grouping, Variable, Assign, Logical, Call, Get, Set, This, \
+    Super
+from interpreter.parser import Parser
+from interpreter.pratt_parser import Precedence, PRECEDENCES
+from interpreter.stmt import Stmt, Print, Expression, Var, Block, If, While, Function, Return, Class
+from interpreter.token_ import TokenType
+
+# 解析函数都是生成器: 需要解析子结构时 yield 子生成器, 由驱动循环执行完后把结果send回来
+# 所以 x = yield self._parse_xxx() 相当于递归版本中的 x = self._parse_xxx()
+Parse = Generator[Generator, object, object]
+
+
+# 不递归的解析器: 嵌套结构保存在显式的生成器栈中, 而不是Python调用栈中
+# 无论源码嵌套多深, 解析时Python调用栈的深度都是固定的
+# 语句的写法和Parser一一对应, 表达式按优先级表解析(同PrattParser), 语法树和报错都和Parser一样
+class StackParser(Parser):
+
+    def parse(self) -> list[Stmt]:
+        stmts = []
+        while not self._is_at_end():
+            stmts.append(self._run(self._parse_declaration()))
+        return stmts
+
+    # 驱动循环: 栈顶的生成器yield子生成器时入栈, return时出栈并把返回值交给下面的生成器
+    def _run(self, parse: Parse) -> object:
+        stack = [parse]
+        value = None
+        error = None
+        while True:
+            top = stack[-1]
+            try:
+                if error is None:
+                    child = top.send(value)
+                else:
+                    error, e = None, error
+                    child = top.throw(e)
+            except StopIteration as e:
+                stack.pop()
+                if not stack:
+                    return e.value
+                value = e.value
+                continue
+            except ParseException as e:
+                # 异常沿着生成器栈向下传, 直到某个_parse_declaration处理它
+                stack.pop()
+                if not stack:
+                    raise
+                error = e
+                continue
+            stack.append(child)
+            value = None
+
+    def _parse_declaration(self) -> Parse:
+        try:
+            if self._match_any_type(TokenType.CLASS):
+                return (yield self._parse_class_declaration())
+            if self._match_any_type(TokenType.FUN):
+                return (yield self._parse_function("function"))
+            if self._match_any_type(TokenType.VAR):
+                return (yield self._parse_var_declaration())
+            return (yield self._parse_statement())
+        except ParseException as e:
+            self._synchronize()
+            return None
+
+    def _parse_class_declaration(self) -> Parse:
+        name = self._ensure(TokenType.IDENTIFIER, 'expect class name')
+
+        super_class = None
+        if self._match_any_type(TokenType.LESS):
+            self._ensure(TokenType.IDENTIFIER, 'expect supper class name')
+            super_class = Variable(self._peek_pre())
+
+        self._ensure(TokenType.LEFT_BRACE, "expect '{' before class body")
+
+        methods = []
+        while not self._is_match(TokenType.RIGHT_BRACE) and not self._is_at_end():
+            m = yield self._parse_function("method")
+            methods.append(m)
+
+        self._ensure(TokenType.RIGHT_BRACE, "expect '}' after class body")
+        return Class(name, super_class, methods)
+
+    def _parse_function(self, kind: str) -> Parse:
+        name = self._ensure(TokenType.IDENTIFIER, f'expect {kind} name')
+        self._ensure(TokenType.LEFT_PAREN, f"expect '(' after {kind} name")
+        params = []
+        while not self._is_match(TokenType.RIGHT_PAREN):
+            if len(params) >= 255:
+                self._error(self._peek(), 'can not have more than 255 parameters')
+
+            params.append(self._ensure(TokenType.IDENTIFIER, 'expect parameter name'))
+            self._match_any_type(TokenType.COMMA)
+
+        self._ensure(TokenType.RIGHT_PAREN, "expect ')' after parameters")
+        self._ensure(TokenType.LEFT_BRACE, f"expect {'{'} before {kind} body")
+        body = yield self._parse_block()
+        return Function(name, params, body)
+
+    def _parse_var_declaration(self) -> Parse:
+        token = self._ensure(TokenType.IDENTIFIER, 'Expect a identifier after var.')
+        initializer = None
+        if self._match_any_type(TokenType.EQUAL):
+            initializer = yield self._parse_expression()
+        self._ensure(TokenType.SEMICOLON, "expected ';' after var statement")
+        return Var(token, initializer)
+
+    def _parse_statement(self) -> Parse:
+        if self._match_any_type(TokenType.RETURN):
+            return (yield self._parse_return())
+        if self._match_any_type(TokenType.BREAK):
+            return self._parse_break()
+        if self._match_any_type(TokenType.CONTINUE):
+            return self._parse_continue()
+        if self._match_any_type(TokenType.FOR):
+            return (yield self._parse_for())
+        if self._match_any_type(TokenType.WHILE):
+            return (yield self._parse_while())
+        if self._match_any_type(TokenType.IF):
+            return (yield self._parse_if())
+        if self._match_any_type(TokenType.PRINT):
+            return (yield self._parse_print())
+        if self._match_any_type(TokenType.LEFT_BRACE):
+            return Block((yield self._parse_block()))
+
+        return (yield self._parse_expr_stmt())
+
+    def _parse_return(self) -> Parse:
+        keyword = self._peek_pre()
+        value = None
+        if not self._is_match(TokenType.SEMICOLON):
+            value = yield self._parse_expression()
+        self._ensure(TokenType.SEMICOLON, "expect ';' after return value")
+        return Return(keyword, value)
+
+    # 语法糖 没有真正的For节点, 展开方式同Parser._parse_for
+    def _parse_for(self) -> Parse:
+        self._ensure(TokenType.LEFT_PAREN, "expect '(' after for")
+        initializer = None
+        if self._match_any_type(TokenType.VAR):
+            initializer = yield self._parse_var_declaration()
+        elif self._match_any_type(TokenType.SEMICOLON):
+            initializer = None
+        else:
+            initializer = yield self._parse_expr_stmt()
+
+        condition = Literal(True)
+        if not self._is_match(TokenType.SEMICOLON):
+            condition = yield self._parse_expression()
+        self._ensure(TokenType.SEMICOLON, "expect ';' after condition")
+
+        increment = None
+        if not self._is_match(TokenType.RIGHT_PAREN):
+            increment = yield self._parse_expression()
+        self._ensure(TokenType.RIGHT_PAREN, "expect ')' after clauses")
+
+        body = yield self._parse_statement()
+
+        if increment is not None:
+            body = Block([body, Expression(increment)])
+        body = While(condition, body)
+        if initializer is not None:
+            body = Block([initializer, body])
+        return body
+
+    def _parse_while(self) -> Parse:
+        self._ensure(TokenType.LEFT_PAREN, "expect '(' after while")
+        condition = yield self._parse_expression()
+        self._ensure(TokenType.RIGHT_PAREN, "expect ')' after condition")
+        body = yield self._parse_statement()
+        return While(condition, body)
+
+    def _parse_if(self) -> Parse:
+        self._ensure(TokenType.LEFT_PAREN, "expect '(' after if")
+        condition = yield self._parse_expression()
+        self._ensure(TokenType.RIGHT_PAREN, "expect ')' after condition")
+        then_branch = yield self._parse_statement()
+        else_branch = None
+        if self._match_any_type(TokenType.ELSE):
+            else_branch = yield self._parse_statement()
+        return If(condition, then_branch, else_branch)
+
+    def _parse_block(self) -> Parse:
+        stmts = []
+        while not self._is_at_end() and not self._is_match(TokenType.RIGHT_BRACE):
+            stmts.append((yield self._parse_declaration()))
+        self._ensure(TokenType.RIGHT_BRACE, "expected '}' after block")
+        return stmts
+
+    def _parse_print(self) -> Parse:
+        expr = yield self._parse_expression()
+        self._ensure(TokenType.SEMICOLON, "expected ';' after print statement")
+        return Print(expr)
+
+    def _parse_expr_stmt(self) -> Parse:
+        expr = yield self._parse_expression()
+        self._ensure(TokenType.SEMICOLON, "expected ';' after expression")
+        return Expression(expr)
+
+    def _parse_expression(self) -> Parse:
+        return (yield self._parse_precedence(Precedence.ASSIGNMENT))
+
+    # 解析优先级不低于precedence的表达式, 规则同PrattParser
+    def _parse_precedence(self, precedence: int) -> Parse:
+        token = self._peek()
+        type = token.type
+        if type == TokenType.LEFT_PAREN:
+            self._advance()
+            expr = yield self._parse_precedence(Precedence.ASSIGNMENT)
+            self._ensure(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
+            expr = Grouping(expr)
+        elif type == TokenType.MINUS or type == TokenType.BANG:
+            self._advance()
+            right = yield self._parse_precedence(Precedence.UNARY)
+            expr = Unary(token, right)
+        else:
+            expr = self._parse_primary()
+
+        while precedence <= PRECEDENCES[self._peek().type]:
+            op = self._advance()
+            type = op.type
+            if type == TokenType.LEFT_PAREN:
+                expr = yield self._parse_finish_call(expr)
+            elif type == TokenType.DOT:
+                name = self._ensure(TokenType.IDENTIFIER, "expect property name after '.'")
+                expr = Get(expr, name)
+            elif type == TokenType.EQUAL:
+                # 右结合: a = b = c
+                value = yield self._parse_precedence(Precedence.ASSIGNMENT)
+                if isinstance(expr, Variable):
+                    expr = Assign(expr.name, value)
+                elif isinstance(expr, Get):
+                    expr = Set(expr.object, expr.name, value)
+                else:
+                    self._error(op, 'Invalid assigment target')
+            elif type == TokenType.AND or type == TokenType.OR:
+                right = yield self._parse_precedence(PRECEDENCES[type] + 1)
+                expr = Logical(expr, op, right)
+            else:
+                right = yield self._parse_precedence(PRECEDENCES[type] + 1)
+                expr = Binary(expr, op, right)
+        return expr
+
+    def _parse_finish_call(self, callee: Expr) -> Parse:
+        args = []
+        while not self._is_match(TokenType.RIGHT_PAREN):
+            if len(args) >= 255:
+                self._error(self._peek(), 'can not have more than 255 arguments')
+
+            args.append((yield self._parse_expression()))
+            self._match_any_type(TokenType.COMMA)
+        paren = self._ensure(TokenType.RIGHT_PAREN, "expect ')' after arguments")
+        return Call(callee, paren, args)
+
+    # 不含子表达式的primary, 不需要入栈
+    def _parse_primary(self) -> Expr:
+        if self._match_any_type(TokenType.IDENTIFIER):
+            return Variable(self._peek_pre())
+        if self._match_any_type(TokenType.NUMBER, TokenType.STRING):
+            return Literal(self._peek_pre().literal)
+        if self._match_any_type(TokenType.THIS):
+            return This(self._peek_pre())
+        if self._match_any_type(TokenType.FALSE):
+            return Literal(False)
+        if self._match_any_type(TokenType.TRUE):
+            return Literal(True)
+        if self._match_any_type(TokenType.NIL):
+            return Literal(None)
+        if self._match_any_type(TokenType.SUPER):
+            keyword = self._peek_pre()
+            self._ensure(TokenType.DOT, "expect '.' after super")
+            method = self._ensure(TokenType.IDENTIFIER, 'expect super class method name')
+            return Super(keyword, method)
+        raise self._error(self._peek(), 'expect expression.')
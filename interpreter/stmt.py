@@ -1,4 +1,4 @@
-# generate time: 2023-02-20 20:36:25
+# generate time: 2026-10-18 05:05:53
 from __future__ import annotations
 from abc import abstractmethod, ABCMeta
 
@@ -6,7 +6,14 @@ from interpreter.expr import Expr, Variable
 from interpreter.token_ import Token
 
 
+# 节点类都用__slots__, 没有每个实例的__dict__, 大脚本的语法树能省一半内存
+# 子类(比如LazyFunction)不声明__slots__时仍然可以加属性
 class Stmt(metaclass=ABCMeta):
+    __slots__ = ()
+    # 子节点和token等字段的名字, 按构造函数参数的顺序; 遍历语法树的代码按它取字段
+    # 特化的子类(见quicken)和LazyFunction不加字段, 直接继承
+    FIELDS: tuple[str, ...] = ()
+
     @abstractmethod
     def accept(self, visitor: StmtVisitor) -> object:
         pass
@@ -60,6 +67,8 @@ class StmtVisitor(metaclass=ABCMeta):
 
 
 class Block(Stmt):
+    __slots__ = ('statements', )
+    FIELDS = __slots__
     statements: list[Stmt]
 
     def __init__(self, statements: list[Stmt], ):
@@ -70,6 +79,8 @@ class Block(Stmt):
 
 
 class Class(Stmt):
+    __slots__ = ('name', 'super_class', 'methods', )
+    FIELDS = __slots__
     name: Token
     super_class: Variable
     methods: list[Function]
@@ -84,6 +95,8 @@ class Class(Stmt):
 
 
 class Expression(Stmt):
+    __slots__ = ('expression', )
+    FIELDS = __slots__
     expression: Expr
 
     def __init__(self, expression: Expr, ):
@@ -94,6 +107,8 @@ class Expression(Stmt):
 
 
 class Function(Stmt):
+    __slots__ = ('name', 'params', 'body', )
+    FIELDS = __slots__
     name: Token
     params: list[Token]
     body: list[Stmt]
@@ -108,6 +123,8 @@ class Function(Stmt):
 
 
 class Break(Stmt):
+    __slots__ = ('break_', )
+    FIELDS = __slots__
     break_: Token
 
     def __init__(self, break_: Token, ):
@@ -118,6 +135,8 @@ class Break(Stmt):
 
 
 class Continue(Stmt):
+    __slots__ = ('continue_', )
+    FIELDS = __slots__
     continue_: Token
 
     def __init__(self, continue_: Token, ):
@@ -128,6 +147,8 @@ class Continue(Stmt):
 
 
 class If(Stmt):
+    __slots__ = ('condition', 'then_branch', 'else_branch', )
+    FIELDS = __slots__
     condition: Expr
     then_branch: Stmt
     else_branch: Stmt
@@ -142,6 +163,8 @@ class If(Stmt):
 
 
 class Print(Stmt):
+    __slots__ = ('expression', )
+    FIELDS = __slots__
     expression: Expr
 
     def __init__(self, expression: Expr, ):
@@ -152,6 +175,8 @@ class Print(Stmt):
 
 
 class While(Stmt):
+    __slots__ = ('condition', 'body', )
+    FIELDS = __slots__
     condition: Expr
     body: Stmt
 
@@ -164,6 +189,8 @@ class While(Stmt):
 
 
 class Return(Stmt):
+    __slots__ = ('keyword', 'value', )
+    FIELDS = __slots__
     keyword: Token
     value: Expr
 
@@ -176,6 +203,8 @@ class Return(Stmt):
 
 
 class Var(Stmt):
+    __slots__ = ('name', 'initializer', )
+    FIELDS = __slots__
     name: Token
     initializer: Expr
 
@@ -0,0 +1,97 @@
+import io
+import pickle
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.arena import Arena
+from interpreter.arena_interpreter import ArenaInterpreter
+from interpreter.expr import Binary, Variable
+from interpreter.interpreter_ import Interpreter
+from interpreter.lox import Lox
+from interpreter.scanner import Scanner
+from interpreter.stack_parser import StackParser
+from interpreter.stmt import Class, Function
+from interpreter.test.compact_ast_test import SOURCE
+from interpreter.utils.ast_printer import AstPrinter
+
+
+class ArenaTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _compile(self, source: str) -> tuple[list, Interpreter, Arena]:
+        stmts, interpreter = Lox.compile(source, flat_closures=False)
+        return stmts, interpreter, Arena.from_tree(stmts, interpreter.local_map, interpreter.slot_map,
+                                                   interpreter.frame_sizes)
+
+    def _output(self, run) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            run()
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def test_round_trip(self):
+        stmts, interpreter, arena = self._compile(SOURCE)
+        tree, local_map, slot_map, frame_sizes = arena.to_tree()
+        self.assertEqual(AstPrinter().build_stmts(tree), AstPrinter().build_stmts(stmts))
+        self.assertEqual(sorted(local_map.values()), sorted(interpreter.local_map.values()))
+        self.assertEqual(sorted(slot_map.values()), sorted(interpreter.slot_map.values()))
+        self.assertEqual(sorted(frame_sizes.values()), sorted(interpreter.frame_sizes.values()))
+
+        rebuilt = Interpreter()
+        rebuilt.local_map, rebuilt.slot_map, rebuilt.frame_sizes = local_map, slot_map, frame_sizes
+        self.assertEqual(self._output(lambda: rebuilt.interpret(tree)), self._output(lambda: Lox.run(SOURCE)))
+
+    def test_execute_from_arena(self):
+        expected = self._output(lambda: Lox.run(SOURCE))
+        self.assertIn('line: 20 at[+]', expected)
+        _, _, arena = self._compile(SOURCE)
+        self.assertEqual(self._output(lambda: ArenaInterpreter().interpret_arena(arena)), expected)
+        loaded = pickle.loads(pickle.dumps(arena))
+        self.assertEqual(self._output(lambda: ArenaInterpreter().interpret_arena(loaded)), expected)
+
+    def test_flat_closures(self):
+        # 默认的编译结果: 没有闭包时可以转换, 有闭包时拒绝, 而不是执行时读错变量
+        source = 'fun f(n) { var m = n * 2; return m + 1; } print f(3);'
+        stmts, interpreter = Lox.compile(source)
+        arena = Arena.from_tree(stmts, interpreter.local_map, interpreter.slot_map, interpreter.frame_sizes)
+        self.assertEqual(self._output(lambda: ArenaInterpreter().interpret_arena(arena)), '7.0\n')
+        for source in [SOURCE, 'class A { m() { fun g() { return this; } return g; } }']:
+            stmts, interpreter = Lox.compile(source)
+            with self.assertRaises(ValueError):
+                Arena.from_tree(stmts, interpreter.local_map, interpreter.slot_map, interpreter.frame_sizes)
+
+    def test_views(self):
+        _, _, arena = self._compile('class A { get(x) { return x; } }\nvar a = 1;\nfun f(b) { return a + b; }')
+        klass, var, function = arena.statements()
+        self.assertIs(klass.kind, Class)
+        self.assertEqual(klass.name.lexeme, 'A')
+        self.assertIsNone(klass.super_class)
+        [method] = klass.methods
+        self.assertIs(method.kind, Function)
+        self.assertEqual([p.lexeme for p in method.params], ['x'])
+        self.assertEqual(var.initializer.value, 1.0)
+
+        [ret] = function.body
+        binary = ret.value
+        self.assertIs(binary.kind, Binary)
+        self.assertEqual(binary.operator.lexeme, '+')
+        self.assertIs(binary.left.kind, Variable)
+        # a是全局变量, b是参数
+        self.assertIsNone(binary.left.depth)
+        self.assertEqual(binary.right.depth, 0)
+        self.assertEqual(arena.node(binary.index), binary)
+        with self.assertRaises(AttributeError):
+            binary.value
+
+    def test_deep_tree(self):
+        depth = 10000
+        # 递归实现的Parser和Resolver处理不了这么深的嵌套
+        stmts = StackParser(Scanner('print ' + '(' * depth + '1' + ')' * depth + ';').iter_tokens()).parse()
+        arena = Arena.from_tree(stmts, {})
+        self.assertEqual(len(arena), depth + 2)
+        tree = arena.to_tree()[0]
+        self.assertEqual(len(tree), 1)
@@ -0,0 +1,96 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from interpreter import ast_cache
+from interpreter.lox import Lox
+
+SOURCE = """
+class A {
+    init(x) { this.x = x; }
+    get() { return this.x; }
+}
+class B < A {
+    get() { return super.get() * 2; }
+}
+fun makeCounter() {
+    var i = 0;
+    fun count() {
+        i = i + 1;
+        return i;
+    }
+    return count;
+}
+var counter = makeCounter();
+counter();
+print counter();
+print B(21).get();
+"""
+
+
+class AstCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'main.lox')
+        self._write(SOURCE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _write(self, source: str) -> None:
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(source)
+
+    def _run_file(self, **kwargs) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run_file(self.path, cache=True, **kwargs)
+        return out.getvalue()
+
+    def test_warm_start_skips_front_end(self):
+        self.assertEqual(self._run_file(), '2.0\n42.0\n')
+        self.assertTrue(os.path.exists(ast_cache.cache_path(self.path)))
+        with mock.patch.object(Lox, 'compile', side_effect=AssertionError('front end should not run')):
+            self.assertEqual(self._run_file(), '2.0\n42.0\n')
+
+    def test_changed_source_invalidates(self):
+        self._run_file()
+        self._write(SOURCE + 'print "changed";')
+        self.assertEqual(self._run_file(), '2.0\n42.0\nchanged\n')
+        with mock.patch.object(Lox, 'compile', side_effect=AssertionError('front end should not run')):
+            self.assertEqual(self._run_file(), '2.0\n42.0\nchanged\n')
+
+    def test_bad_cache_ignored(self):
+        self._run_file()
+        path = ast_cache.cache_path(self.path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        for bad in [b'', data[:10], b'XXXX' + data[4:], data[:ast_cache.HEADER.size] + b'garbage']:
+            with open(path, 'wb') as f:
+                f.write(bad)
+            self.assertEqual(self._run_file(), '2.0\n42.0\n')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_version_in_key(self):
+        self._run_file()
+        with mock.patch.object(ast_cache, 'VERSION', ast_cache.VERSION + 1):
+            self.assertIsNone(ast_cache.load(self.path, SOURCE.encode()))
+
+    def test_custom_cache_dir(self):
+        cache_dir = os.path.join(self.tmp.name, 'cache')
+        self._run_file(cache_dir=cache_dir)
+        self.assertEqual(os.listdir(cache_dir), [os.path.basename(ast_cache.cache_path(self.path))])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, ast_cache.CACHE_DIR)))
+
+    def test_errors_not_cached(self):
+        self._write('print this;')
+        with self.assertRaises(SystemExit):
+            self._run_file()
+        self.assertFalse(os.path.exists(ast_cache.cache_path(self.path)))
@@ -0,0 +1,95 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from interpreter.benchmark.closure_compiler_bench import CLASS_SOURCE
+from interpreter.closure_compiler import ClosureCompiler, CompiledFunction
+from interpreter.lox import Lox
+from interpreter.test import interpreter_test
+from interpreter.test.closure_test import PROGRAMS as CLOSURE_PROGRAMS
+from interpreter.test.global_test import PROGRAMS as GLOBAL_PROGRAMS
+
+# interpreter_test中的所有程序
+INTERPRETER_PROGRAMS = [test() for name, test in vars(interpreter_test).items() if name.startswith('test')]
+PROGRAMS = INTERPRETER_PROGRAMS + CLOSURE_PROGRAMS + GLOBAL_PROGRAMS + [
+    CLASS_SOURCE.replace('10000', '10'),
+    '''
+    fun find(n) { var i = 0; while (true) { if (i * i >= n) return i; i = i + 1; } }
+    print find(50);
+    fun nested() {
+      for (var i = 0; i < 3; i = i + 1) {
+        for (var j = 0; j < 3; j = j + 1) { if (j == i) break; if (i == 2) return i * 10 + j; }
+      }
+      return -1;
+    }
+    print nested();
+    var t = 0; while (t < 5) { t = t + 1; if (t == 3) break; } print t;
+    print nil == nil; print nil == 1; print 1 != 2; print !nil; print "a" + 1; print -(3) < 2 * 3 - 4 / 2;
+    print true and 1; print false or "x"; print nil and 1;
+    fun noret() {} print noret(); print noret; print memoize(find)(99);
+    ''',
+]
+OPTIONS = [
+    {},
+    {'parse_mode': 'lazy'},
+    {'flat_closures': False, 'share_frames': False},
+    {'optimize': True, 'inline': True, 'hoist': True, 'infer': True},
+]
+ERRORS = [
+    'print -"a";',
+    'var x = 1; x();',
+    'fun f(a) {} f(1, 2);',
+    'fun f() { return g(); } f();',
+    'nope = 1;',
+    'var a = 1; a.b = 2;',
+    'class A {} print A().z;',
+    'var B = 1; class A < B {}',
+]
+
+
+class ClosureCompilerTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    # clock()的结果固定下来, 两种执行方式的输出才能比较
+    def _output(self, source: str, **options) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out), mock.patch('time.time', return_value=1.5):
+            Lox.run(source, **options)
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            for options in OPTIONS:
+                expected = self._output(source, **options)
+                self.assertEqual(self._output(source, backend='closures', **options), expected, (source, options))
+
+    def test_interpreter_programs(self):
+        outputs = [self._output(source, backend='closures') for source in INTERPRETER_PROGRAMS]
+        self.assertEqual(outputs, [self._output(source) for source in INTERPRETER_PROGRAMS])
+        self.assertIn('Fry until golden brown.\n', outputs)
+        self.assertIn('1.5\nwyc is doing some work\n', outputs)
+
+    def test_runtime_errors(self):
+        for source in ERRORS:
+            expected = self._output(source)
+            self.assertTrue(expected.startswith('line: 1 at['), expected)
+            self.assertEqual(self._output(source, backend='closures'), expected)
+
+    def test_compiled_functions(self):
+        stmts, interpreter = Lox.compile('fun f(n) { return n + 1; } var g = f; class A { m() { return this; } } '
+                                         'var a = A(); var m = a.m;')
+        compiler = ClosureCompiler(interpreter)
+        compiler.run(stmts)
+        f = interpreter.outermost.lookup('g')
+        self.assertIsInstance(f, CompiledFunction)
+        self.assertIsInstance(interpreter.outermost.lookup('m'), CompiledFunction)
+        # 函数体在第一次调用时才编译
+        self.assertNotIn(f.declaration, compiler.bodies)
+        self.assertEqual(f.call(interpreter, [1.0]), 2.0)
+        self.assertIn(f.declaration, compiler.bodies)
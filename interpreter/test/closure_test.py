@@ -0,0 +1,152 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.benchmark.closure_bench import ACCESS_SOURCE, RETAIN_SOURCE
+from interpreter.env import Cell
+from interpreter.lox import Lox
+from interpreter.quicken import CellAssign, CellVariable, UpvalueAssign, UpvalueSuper, UpvalueThis, UpvalueVariable
+
+PROGRAMS = [
+    ACCESS_SOURCE.replace('30000', '30').replace('20000', '20'),
+    RETAIN_SOURCE.replace('3000', '3'),
+    '''
+    fun A() { var a = 99; fun B() { fun C() { a = a + 1; return a; } return C; } return B; }
+    var c = A()();
+    print c(); print c();
+    fun outer(p) { fun get() { return p; } fun set(v) { p = v; } set(p + 1); return get; }
+    print outer(5)();
+    fun rec() { fun fact(n) { if (n < 2) return 1; return n * fact(n - 1); } return fact; }
+    print rec()(6);
+    var first; var last;
+    for (var i = 0; i < 3; i = i + 1) { var j = i; fun f() { return j; } if (i == 0) first = f; last = f; }
+    print first(); print last();
+    fun loop() { var total = 0; for (var k = 0; k < 4; k = k + 1) { fun add() { total = total + k; } add(); } return total; }
+    print loop();
+    fun shadow() { var a = "outer"; { var a = "inner"; fun g() { return a; } print g(); } fun h() { return a; } return h; }
+    print shadow()();
+    { var top = 7; fun bump() { top = top + 1; return top; } print bump(); print top; }
+    fun broken() { var u; fun g() { return u + 1; } return g; }
+    print broken()();
+    ''',
+    '''
+    var x = 3;
+    class P {
+      init(y) { this.y = y; }
+      get() { return x + this.y; }
+      nested(k) { fun inner() { fun inner2() { return this.y * 10 + x + k; } return inner2(); } return inner; }
+    }
+    class Q < P {
+      init(y) { fun setup() { super.init(y + 1); } setup(); }
+      get() { fun viaSuper() { fun deeper() { return super.get() + 1000; } return deeper(); } return viaSuper(); }
+    }
+    var q = Q(4);
+    print q.get(); print q.nested(7)(); print Q(1).get();
+    ''',
+]
+OPTIONS = [
+    {'parse_mode': 'fused'},
+    {'parse_mode': 'lazy'},
+    {'parse_mode': 'lazy', 'share_frames': False},
+    {'share_frames': False},
+    {'compact': True},
+    {'optimize': True, 'inline': True, 'hoist': True, 'infer': True},
+]
+
+
+class ClosureTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _output(self, source: str, **options) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(source, **options)
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def test_captures(self):
+        source = 'fun make(a) { var b = 1; var c = 2; fun f() { b = b + a; return b; } return f; } var f = make(3);'
+        stmts, interpreter = Lox.compile(source)
+        make = stmts[0]
+        var_b, var_c, function, _ = make.body
+        assign = function.body[0].expression
+        # 只有被f用到的变量放在Cell中
+        self.assertIn(var_b, interpreter.cell_decls)
+        self.assertNotIn(var_c, interpreter.cell_decls)
+        self.assertEqual(interpreter.cell_params[make], [0])
+        self.assertEqual([kind for kind, _ in interpreter.captures[function]], ['cell', 'cell'])
+        self.assertIsInstance(assign, UpvalueAssign)
+        self.assertIsInstance(assign.value.left, UpvalueVariable)
+        self.assertNotIn(assign, interpreter.local_map)
+        self.assertEqual(interpreter.upvalue_map[assign], interpreter.upvalue_map[assign.value.left])
+
+        with redirect_stdout(io.StringIO()):
+            interpreter.interpret(stmts)
+        closure = interpreter.outermost.lookup('f')
+        # 闭包不再引用make的帧
+        self.assertIsNone(closure.closure_env)
+        self.assertEqual([type(cell) for cell in closure.cells], [Cell, Cell])
+        self.assertEqual(sorted(cell.value for cell in closure.cells), [1.0, 3.0])
+
+    def test_transitive(self):
+        stmts, interpreter = Lox.compile(PROGRAMS[2])
+        a = stmts[0]
+        b = a.body[1]
+        c = b.body[0]
+        read = c.body[0].expression.value.left
+        # B先从A的帧中捕获a, C再从B的cells中取
+        self.assertEqual([kind for kind, _ in interpreter.captures[b]], ['cell'])
+        self.assertEqual([kind for kind, _ in interpreter.captures[c]], ['upvalue'])
+        self.assertIsInstance(read, UpvalueVariable)
+        self.assertIn(a.body[0], interpreter.cell_decls)
+
+    def test_this_and_super(self):
+        stmts, interpreter = Lox.compile(PROGRAMS[3])
+        p, q = stmts[1], stmts[2]
+        get = p.methods[1]
+        inner2 = p.methods[2].body[0].body[0]
+        deeper = q.methods[1].body[0].body[0]
+        # 方法直接用this, 不需要捕获; 方法中的函数按值捕获this和super
+        self.assertNotIsInstance(get.body[0].value.right.object, UpvalueThis)
+        self.assertIsInstance(inner2.body[0].value.left.left.left.object, UpvalueThis)
+        self.assertIsInstance(deeper.body[0].value.left.callee, UpvalueSuper)
+        self.assertEqual(interpreter.captures[p.methods[2]], [])
+        self.assertEqual(sorted(kind for kind, _ in interpreter.captures[q.methods[1].body[0]]), ['value', 'value'])
+
+    def test_local_uses(self):
+        stmts, interpreter = Lox.compile('fun f() { var n = 0; fun g() { return n; } n = n + 1; return g; } '
+                                         'print f()();')
+        assign = stmts[0].body[2].expression
+        self.assertIsInstance(assign, CellAssign)
+        self.assertIsInstance(assign.value.left, CellVariable)
+        with redirect_stdout(io.StringIO()) as out:
+            interpreter.interpret(stmts)
+        self.assertEqual(out.getvalue(), '1.0\n')
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            expected = self._output(source, flat_closures=False)
+            self.assertEqual(self._output(source), expected)
+            for options in OPTIONS:
+                self.assertEqual(self._output(source, **options), expected, options)
+        self.assertEqual(self._output(PROGRAMS[2]).splitlines(), [
+            '100.0', '101.0', '6.0', '720.0', '0.0', '2.0', '6.0', 'inner', 'outer', '8.0', '8.0',
+            'line: 17 at[+]: left operand must be number or string.'])
+        self.assertEqual(self._output(PROGRAMS[3]).split(), ['1008.0', '60.0', '1005.0'])
+
+    def test_cached_bindings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'main.lox')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(PROGRAMS[3])
+            expected = self._output(PROGRAMS[3])
+            for _ in range(2):
+                out = io.StringIO()
+                with redirect_stdout(out):
+                    Lox.run_file(path, cache=True)
+                self.assertEqual(out.getvalue(), expected)
@@ -0,0 +1,64 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.compact_ast import compact_tokens
+from interpreter.lox import Lox
+from interpreter.parser import Parser
+from interpreter.scanner import Scanner
+
+SOURCE = '''
+class A {
+    init(n) { this.n = n; }
+    get() { return this.n; }
+}
+class B < A {
+    get() { return super.get() * 2; }
+}
+fun counter() {
+    var i = 0;
+    fun inc() { i = i + 1; return i; }
+    return inc;
+}
+var c = counter();
+c(); c();
+print c();
+print B(21).get();
+for (var i = 0; i < 3; i = i + 1) { print i + i; }
+print "a" + "b";
+print nil + 1;
+'''
+
+
+class CompactAstTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _run(self, compact: bool) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(SOURCE, compact=compact)
+        return out.getvalue()
+
+    def test_nodes_have_no_dict(self):
+        stmts = Parser(Scanner('print a + 1;').scan_tokens()).parse()
+        expr = stmts[0].expression
+        for node in [stmts[0], expr, expr.left, expr.right, expr.operator]:
+            self.assertFalse(hasattr(node, '__dict__'), type(node).__name__)
+
+    def test_same_output(self):
+        expected = self._run(False)
+        self.assertIn('line: 20 at[+]', expected)
+        self.assertEqual(self._run(True), expected)
+
+    def test_tokens_shared(self):
+        stmts = Parser(Scanner('print a + a;\na + a;').scan_tokens()).parse()
+        count = compact_tokens(stmts)
+        self.assertEqual(count, 4)
+        first, second = stmts[0].expression, stmts[1].expression
+        self.assertIs(first.left.name, first.right.name)
+        self.assertIsNot(first.left.name, second.left.name)
+        self.assertIsNone(first.operator.literal)
+        self.assertEqual(second.left.name.line, 2)
@@ -0,0 +1,88 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.benchmark.counting_loop_bench import NESTED_SOURCE
+from interpreter.counting_loop import match_counting_loop
+from interpreter.lox import Lox
+from interpreter.stmt import Block, While
+from interpreter.test.compact_ast_test import SOURCE
+
+PROGRAMS = [
+    SOURCE,
+    NESTED_SOURCE.replace('200', '20').replace('matmul(30)', 'matmul(5)'),
+    '''
+    for (var i = 10; i >= 0; i = i - 2.5) print i;
+    for (var i = 0; i < 10; i = i + 1) { if (i > 3) break; print i; }
+    for (var i = 0; i < 3; i = i + 1) { var j = i * 2; print j; }
+    fun f(n) { for (var i = 0; i < n; i = i + 1) if (i * i > n) return i; }
+    print f(50);
+    ''',
+    # 循环前声明的闭包修改循环变量
+    '{ var i = 0; fun f() { i = i + 5; } while (i < 20) { f(); print i; i = i + 1; } }',
+    # 循环变量和上界不是数字
+    'for (var i = "a"; i < 3; i = i + 1) print i;',
+    'for (var i = 0; i < "x"; i = i + 1) print i;',
+    'for (var i = 0; i < 3; i = i + 1) { print i; i = "s"; }',
+    'var fs = nil; for (var i = 0; i < 3; i = i + 1) { fun g() { return i; } fs = g; } print fs();',
+    # 循环体中重新声明同名的变量, 和外层共用帧时深度也是0
+    'fun f() { var i = 0; var n = 0; while (i < 3) { var i = 10; n = n + 1; if (n > 5) break; i = i + 1; } '
+    'print n; print i; } f();',
+]
+
+
+class CountingLoopTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _output(self, source: str, fast_loops: bool, **options) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            stmts, interpreter = Lox.compile(source, **options)
+            interpreter.fast_loops = fast_loops
+            interpreter.interpret(stmts)
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def _match(self, source: str):
+        stmts, interpreter = Lox.compile(source)
+        loop = stmts[-1].statements[-1] if isinstance(stmts[-1], Block) else stmts[-1]
+        self.assertIsInstance(loop, While)
+        return match_counting_loop(loop, interpreter.local_map, interpreter.frame_sizes)
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            expected = self._output(source, False)
+            self.assertEqual(self._output(source, True), expected, source)
+            self.assertEqual(self._output(source, True, optimize=True, hoist=True), expected, source)
+            self.assertEqual(self._output(source, True, share_frames=False), expected, source)
+            out = io.StringIO()
+            with redirect_stdout(out):
+                Lox.run(source, backend='closures')
+            Lox.had_runtime_error = False
+            self.assertEqual(out.getvalue(), expected, source)
+        self.assertEqual(self._output(PROGRAMS[-1], True), '6.0\n0.0\n')
+
+    def test_match(self):
+        loop = self._match('for (var i = 0; i < 10; i = i - 2) print i;')
+        self.assertEqual((loop.name, loop.step, len(loop.body)), ('i', -2.0, 1))
+        self.assertIsNotNone(self._match('{ var n = 0; while (n <= 3) { print n; n = n + 1; } }'))
+
+    def test_fallback(self):
+        for source in [
+            # 全局变量
+            'var i = 0; while (i < 3) { i = i + 1; }',
+            # 循环体中给循环变量赋值
+            'for (var i = 0; i < 3; i = i + 1) { i = i + 1; }',
+            # 循环体中声明同名的变量
+            '{ var i = 0; while (i < 3) { var i = 10; i = i + 1; } }',
+            # 闭包捕获循环变量
+            'for (var i = 0; i < 3; i = i + 1) { fun g() { return i; } }',
+            # 不是计数的形状
+            'for (var i = 0; i != 3; i = i + 1) print i;',
+            'for (var i = 0; i < 3; i = i * 2) print i;',
+            'for (var i = 0; i < 3;) print i;',
+        ]:
+            self.assertIsNone(self._match(source), source)
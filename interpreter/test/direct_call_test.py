@@ -0,0 +1,89 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.ast_walk import walk
+from interpreter.benchmark.direct_call_bench import CALL_SOURCE
+from interpreter.expr import Call
+from interpreter.lox import Lox
+from interpreter.quicken import DirectCall
+from interpreter.test.compact_ast_test import SOURCE
+
+PROGRAMS = [
+    SOURCE,
+    CALL_SOURCE.replace('fib(20)', 'fib(10)').replace('20000', '200'),
+    # 声明之前调用, 参数个数不对, 父类的init
+    '''
+    fun early() { return late(); }
+    print early;
+    fun late() { return "late"; }
+    print early();
+    fun two(a, b) { return a + b; }
+    print two(1);
+    ''',
+    '''
+    class A { init(x) { this.x = x; } }
+    class B < A {}
+    print B(3).x;
+    print B();
+    ''',
+    'print f(); fun f() { return 1; }',
+    # 重新声明和赋值
+    'fun f() { return 1; } print f(); fun f() { return 2; } print f();',
+    'fun f() { return 1; } print f(); f = nil; print f();',
+    'fun clock() { return 1; } print clock();',
+]
+
+
+class DirectCallTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _output(self, source: str, **options) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(source, **options)
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def _direct(self, source: str, **options) -> list[bool]:
+        stmts, _ = Lox.compile(source, **options)
+        calls = [node for node in walk(stmts) if isinstance(node, Call)]
+        calls.sort(key=lambda c: (c.paren.line, c.callee.name.lexeme))
+        return [isinstance(c, DirectCall) for c in calls]
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            self.assertEqual(self._output(source), self._output(source, direct_calls=False), source)
+            self.assertEqual(self._output(source, parse_mode='lazy'), self._output(source, direct_calls=False),
+                             source)
+
+    def test_bound(self):
+        source = '''
+        fun f(a) { return a; }
+        class A { init(a) {} }
+        class B < A {}
+        class C {}
+        f(1);
+        A(1);
+        B(1);
+        C();
+        { fun g() {} g(); }
+        '''
+        self.assertEqual(self._direct(source), [True, True, True, True, False])
+
+    def test_not_bound(self):
+        for source in [
+            'fun f() {} f(1);',
+            'fun f() {} f(); fun f() {}',
+            'var f; fun f() {} f();',
+            'fun f() {} fun g() { f = nil; } f();',
+            'fun clock() {} clock();',
+            'class A < B {} fun B() {} A();',
+        ]:
+            self.assertNotIn(True, self._direct(source), source)
+        # 还没解析的函数体中给函数赋值
+        self.assertEqual(self._direct('fun f() {} fun g() { f = nil; } f();', parse_mode='lazy'), [False])
+        self.assertEqual(self._direct('fun f() {} fun g() { return f; } f();', parse_mode='lazy'), [True])
@@ -0,0 +1,161 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.benchmark.env_bench import ENV_SOURCE
+from interpreter.lox import Lox
+from interpreter.stmt import Block, Var, While
+from interpreter.test.compact_ast_test import SOURCE
+
+PROGRAMS = [
+    SOURCE,
+    ENV_SOURCE.replace('30000', '30'),
+    '''
+    var a = "global";
+    {
+      fun show() { print a; }
+      show();
+      var a = "block";
+      show();
+      print a;
+    }
+    fun outer(x) {
+      var y = x * 2;
+      fun middle() {
+        var z = y + 1;
+        fun inner() { x = x + z; return x + y; }
+        return inner;
+      }
+      return middle();
+    }
+    var f = outer(1);
+    print f();
+    print f();
+    class A { init(n) { this.n = n; } get() { return this.n; } }
+    class B < A { init(n) { super.init(n + 1); } get() { var m = super.get(); return m * 10; } }
+    print B(2).get();
+    for (var i = 0; i < 3; i = i + 1) { var sq = i * i; { var cube = sq * i; print cube; } }
+    ''',
+]
+OPTIONS = [
+    {'parse_mode': 'fused'},
+    {'parse_mode': 'lazy'},
+    {'parse_mode': 'stack'},
+    {'optimize': True, 'inline': True, 'hoist': True, 'infer': True},
+]
+
+
+class EnvTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _output(self, source: str, **options) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(source, **options)
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def test_slots(self):
+        stmts, interpreter = Lox.compile('fun f(a, b) { var c = a; { var d = b; var e = c + d; print e; } }',
+                                         share_frames=False)
+        [function] = stmts
+        var, block = function.body
+        print_stmt = block.statements[-1]
+        slot_map, local_map = interpreter.slot_map, interpreter.local_map
+        # 形参占前面的槽位, 然后是局部变量, 按声明的顺序
+        self.assertEqual(slot_map[var], 2)
+        self.assertEqual([slot_map[s] for s in block.statements[:2]], [0, 1])
+        self.assertEqual(interpreter.frame_sizes[function], 3)
+        self.assertEqual(interpreter.frame_sizes[block], 2)
+        self.assertEqual((local_map[print_stmt.expression], slot_map[print_stmt.expression]), (0, 1))
+        left = block.statements[1].initializer.left
+        self.assertEqual((local_map[left], slot_map[left]), (1, 2))
+        # 全局的声明没有槽位
+        self.assertNotIn(function, slot_map)
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            expected = self._output(source)
+            for options in OPTIONS:
+                self.assertEqual(self._output(source, **options), expected, options)
+        self.assertEqual(self._output(PROGRAMS[2]).split(), [
+            'global', 'global', 'block', '6.0', '9.0', '30.0', '0.0', '1.0', '8.0'])
+
+    def test_lazy_function_size(self):
+        stmts, interpreter = Lox.compile('fun f(a) { var b = a; var c = b; return c; } print f(1);',
+                                         parse_mode='lazy')
+        function = stmts[0]
+        self.assertNotIn(function, interpreter.frame_sizes)
+        with redirect_stdout(io.StringIO()):
+            interpreter.interpret(stmts)
+        self.assertEqual(interpreter.frame_sizes[function], 3)
+
+    def test_hoisted_temp_slot(self):
+        source = 'fun f(n) { var s = 0; var i = 0; while (i < n) { s = s + n * n; i = i + 1; } return s; } print f(3);'
+        stmts, interpreter = Lox.compile(source, hoist=True)
+        [function] = stmts[:1]
+        temp = next(s for s in function.body if isinstance(s, Var) and s.name.lexeme.startswith('$'))
+        self.assertEqual(interpreter.slot_map[temp], 3)
+        self.assertEqual(interpreter.frame_sizes[function], 4)
+        loop = next(s for s in function.body if isinstance(s, While))
+        self.assertIsInstance(loop.body, Block)
+        self.assertEqual(self._output(source, hoist=True), '27.0\n')
+
+    def test_runtime_errors(self):
+        self.assertEqual(self._output('{ var a = 1; print b; }'), "line: 1 at[b]: undefined variable 'b'\n")
+        self.assertEqual(self._output('fun f() { var a; print a; } f();'), 'nil\n')
+
+    def test_shared_blocks(self):
+        source = 'fun f(a) { var b = a; { var c = b; { var d = c; print d; } } { var e = a; print e; } }'
+        stmts, interpreter = Lox.compile(source)
+        [function] = stmts
+        _, outer, sibling = function.body
+        inner = outer.statements[-1]
+        slot_map, local_map, frame_sizes = interpreter.slot_map, interpreter.local_map, interpreter.frame_sizes
+        # 没有闭包的Block都用函数的帧, 槽位接在外层作用域的后面, 并列的Block共用槽位
+        self.assertNotIn(outer, frame_sizes)
+        self.assertNotIn(inner, frame_sizes)
+        self.assertNotIn(sibling, frame_sizes)
+        self.assertEqual((slot_map[outer.statements[0]], slot_map[inner.statements[0]]), (2, 3))
+        self.assertEqual(slot_map[sibling.statements[0]], 2)
+        self.assertEqual(frame_sizes[function], 4)
+        read = inner.statements[0].initializer
+        self.assertEqual((local_map[read], slot_map[read]), (0, 2))
+        self.assertIn(function, interpreter.frame_pools)
+
+    def test_captured_scopes(self):
+        source = 'fun f() { var a = 1; { var b = 2; { fun g() { return a + b; } print g(); } } } f();'
+        stmts, interpreter = Lox.compile(source, flat_closures=False)
+        function = stmts[0]
+        outer = function.body[1]
+        inner = outer.statements[1]
+        g = inner.statements[0]
+        # 被闭包捕获的作用域和它外面的作用域都有自己的帧
+        self.assertEqual([interpreter.frame_sizes[s] for s in (function, outer, inner)], [1, 1, 1])
+        self.assertNotIn(function, interpreter.frame_pools)
+        self.assertIn(g, interpreter.frame_pools)
+        left, right = g.body[0].value.left, g.body[0].value.right
+        self.assertEqual([interpreter.local_map[e] for e in (left, right)], [3, 2])
+        self.assertEqual(self._output(source), '3.0\n')
+
+    def test_frame_reuse(self):
+        from interpreter.env import Env
+        source = 'fun fib(n) { if (n < 2) return n; { var a = fib(n - 1); return a + fib(n - 2); } } ' \
+                 'var i = 0; while (i < 10) { var x = fib(i); i = i + 1; print x; }'
+        created = []
+        init = Env.__init__
+
+        def counting_init(env, parent=None, size=0):
+            created.append(size)
+            init(env, parent, size)
+
+        Env.__init__ = counting_init
+        try:
+            self.assertEqual(self._output(source).split()[-1], '34.0')
+        finally:
+            Env.__init__ = init
+        # 全局变量表, 循环体的一个帧, 递归最深时同时存在的fib的帧
+        self.assertEqual(len(created), 1 + 1 + 9)
@@ -0,0 +1,148 @@
+import io
+import os
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.expr import Expr
+from interpreter.fused_parser import FusedParser
+from interpreter.interpreter_ import Interpreter
+from interpreter.lox import Lox
+from interpreter.parser import Parser
+from interpreter.resolver import Resolver
+from interpreter.scanner import Scanner
+from interpreter.stmt import Stmt
+from interpreter.token_ import Token
+
+SOURCES = [
+    open(os.path.join(os.path.dirname(__file__), '..', 'test.lox'), encoding='utf-8').read(),
+    """
+    class A {
+        init(x) { this.x = x; }
+        get() { return this.x; }
+    }
+    class B < A {
+        get() { return super.get() * 2; }
+    }
+    fun makeCounter() {
+        var i = 0;
+        fun count() {
+            i = i + 1;
+            return i;
+        }
+        return count;
+    }
+    var counter = makeCounter();
+    counter();
+    print counter();
+    print B(21).get();
+    """,
+    """
+    var a = "global";
+    {
+        fun showA() { print a; }
+        showA();
+        var a = "block";
+        showA();
+        { var b = a = "c"; var c = (b); c.d = -b.e(a, b)(c); }
+    }
+    """,
+    """
+    fun loops(n) {
+        var total = 0;
+        for (var i = 0; i < n; i = i + 1) {
+            for (var j = i; j < n; j = j + 1) total = total + i * j;
+            for (; total > 100;) { var k = total; total = k - 100; }
+            for (total = 0; total < 3;) total = total + 1;
+        }
+        while (n > 0) { var m = n; n = m - 1; if (m == 2) break; }
+        return total;
+    }
+    print loops(5);
+    """,
+]
+
+ERROR_SOURCES = [
+    'var a = 1; { var a = a; }',
+    '{ var a = 1; var a = 2; }',
+    '{ var a = a = 1; print a; var b = b + 1; }',
+    'return 1;',
+    'class A { init() { return 1; } }',
+    'print this; fun f() { return this; }',
+    'fun f() { super.x(); } class A { m() { super.m(); } }',
+    'class A < A {}',
+    '{ class B {} }',
+    'fun f(a, a) { var a; }',
+    'return 1; print ;',
+    '{ var a = 1; print a + ; } return;',
+    'class C { m() { var x = x; } } fun g() { { var y = 1; var y; } }',
+]
+
+
+# 把语法树和绑定深度, 槽位, 作用域大小一起展开, 比较两种前端的结果
+def dump(stmts: list[Stmt], interpreter: Interpreter) -> list:
+    local_map, slot_map, frame_sizes = interpreter.local_map, interpreter.slot_map, interpreter.frame_sizes
+    out = []
+
+    def walk(node):
+        if isinstance(node, Token):
+            out.append((node.type, node.lexeme, node.line))
+        elif isinstance(node, list):
+            for n in node:
+                walk(n)
+        elif isinstance(node, (Expr, Stmt)):
+            out.append(type(node).__name__)
+            if node in local_map:
+                out.append(('depth', local_map[node]))
+            if node in slot_map:
+                out.append(('slot', slot_map[node]))
+            if node in frame_sizes:
+                out.append(('size', frame_sizes[node]))
+            for name in type(node).__annotations__:
+                walk(getattr(node, name))
+        else:
+            out.append(node)
+
+    walk(stmts)
+    return out
+
+
+class FusedParserTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _run(self, source: str, parse_mode: str) -> tuple[str, bool]:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(source, parse_mode=parse_mode)
+        had_error, Lox.had_error = Lox.had_error, False
+        return out.getvalue(), had_error
+
+    def test_same_depths_as_resolver(self):
+        for source in SOURCES:
+            interpreter = Interpreter()
+            stmts = Parser(Scanner(source).iter_tokens()).parse()
+            Resolver(interpreter).resolve(stmts)
+            expected = dump(stmts, interpreter)
+
+            interpreter = Interpreter()
+            parser = FusedParser(Scanner(source).iter_tokens(), interpreter)
+            stmts = parser.parse()
+            self.assertEqual(parser.resolver.errors, [])
+            self.assertEqual(dump(stmts, interpreter), expected)
+
+    def test_same_output(self):
+        for source in SOURCES:
+            self.assertEqual(self._run(source, 'fused'), self._run(source, 'descent'))
+
+    def test_same_errors(self):
+        for source in ERROR_SOURCES:
+            expected = self._run(source, 'descent')
+            self.assertTrue(expected[1], source)
+            self.assertEqual(self._run(source, 'fused'), expected, source)
+
+    def test_resolve_errors_hidden_by_parse_errors(self):
+        output, had_error = self._run('return 1; print this; var = 1;', 'fused')
+        self.assertTrue(had_error)
+        self.assertEqual(output, 'line: 1, at[=]: Expect a identifier after var.\n')
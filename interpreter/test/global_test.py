@@ -0,0 +1,102 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter import ast_cache
+from interpreter.benchmark.global_bench import GLOBAL_SOURCE
+from interpreter.env import UNDEFINED
+from interpreter.lox import Lox
+from interpreter.quicken import GlobalAssign, GlobalVariable
+
+PROGRAMS = [
+    GLOBAL_SOURCE.replace('40000', '40').replace('20000', '20'),
+    '''
+    fun show() { print later; }
+    var later = "late";
+    show();
+    later = later + "r";
+    show();
+    var later = 1;
+    show();
+    { var later = 2; print later; show(); }
+    class A { get() { return later + 1; } }
+    print A().get();
+    ''',
+]
+OPTIONS = [
+    {'parse_mode': 'fused'},
+    {'parse_mode': 'lazy'},
+    {'compact': True},
+    {'optimize': True, 'inline': True, 'hoist': True, 'infer': True},
+]
+
+
+class GlobalTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _output(self, source: str, **options) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(source, **options)
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def test_indices(self):
+        stmts, interpreter = Lox.compile('var a = 1; fun f() { a = a + b; } var b = 2;')
+        var_a, function, var_b = stmts
+        assign = function.body[0].expression
+        global_map, outermost = interpreter.global_map, interpreter.outermost
+        # 绑定时就分配好下标, 后面才定义的b也一样
+        self.assertEqual(global_map[var_a], outermost.names['a'])
+        self.assertEqual(global_map[var_b], outermost.names['b'])
+        self.assertEqual(global_map[assign], global_map[var_a])
+        self.assertEqual(global_map[assign.value.right], global_map[var_b])
+        self.assertIsInstance(assign, GlobalAssign)
+        self.assertIsInstance(assign.value.right, GlobalVariable)
+        self.assertIs(outermost.lookup('b'), UNDEFINED)
+        # 顶层的函数声明也写进全局变量表, 读写全局变量不再查local_map
+        self.assertEqual(global_map[function], outermost.names['f'])
+        self.assertNotIn(assign, interpreter.local_map)
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            expected = self._output(source)
+            for options in OPTIONS:
+                self.assertEqual(self._output(source, **options), expected, options)
+        self.assertEqual(self._output(PROGRAMS[1]).split(), ['late', 'later', '1.0', '2.0', '1.0', '2.0'])
+
+    def test_redefine_reuses_index(self):
+        stmts, interpreter = Lox.compile('var a = 1; var a = a + 1; print a;')
+        self.assertEqual(interpreter.global_map[stmts[0]], interpreter.global_map[stmts[1]])
+        with redirect_stdout(io.StringIO()) as out:
+            interpreter.interpret(stmts)
+        self.assertEqual(out.getvalue(), '2.0\n')
+        self.assertEqual(len(interpreter.outermost.values), len(interpreter.outermost.names))
+
+    def test_runtime_errors(self):
+        self.assertEqual(self._output('print a; var a = 1;'), "line: 1 at[a]: undefined variable 'a'\n")
+        self.assertEqual(self._output('a = 1; var a;'), "line: 1 at[a]: undefined variable 'a'\n")
+        self.assertEqual(self._output('fun f() { b = 1; } f();'), "line: 1 at[b]: undefined variable 'b'\n")
+        self.assertEqual(self._output('var a; print a;'), 'nil\n')
+
+    def test_cached_bindings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'main.lox')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(PROGRAMS[1])
+            expected = self._output(PROGRAMS[1])
+            for _ in range(2):
+                out = io.StringIO()
+                with redirect_stdout(out):
+                    Lox.run_file(path, cache=True)
+                self.assertEqual(out.getvalue(), expected)
+            with open(path, 'rb') as f:
+                stmts, bindings = ast_cache.load(path, f.read())
+        global_map, names = bindings['global_map'], bindings['globals']
+        self.assertEqual(global_map[stmts[0]], names.index('show'))
+        self.assertIsInstance(stmts[0].body[0].expression, GlobalVariable)
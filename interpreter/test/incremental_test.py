@@ -0,0 +1,117 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.expr import Expr
+from interpreter.incremental import Document
+from interpreter.lox import Lox
+from interpreter.stmt import Stmt
+from interpreter.token_ import Token
+
+SOURCE = """fun add(a, b) {
+    var c = a + b;
+    return c;
+}
+
+class Counter {
+    init() { this.n = 0; }
+    inc() {
+        fun step(x) { return x + this.n; }
+        this.n = step(1);
+    }
+}
+
+var total = add(1, 2); // 注释
+{
+    var local = total;
+    print local;
+}
+print "多
+行";
+fun last() { return total; }
+"""
+
+
+# 把语法树展开成带行号和绑定深度的列表, 用来和全量解析的结果比较
+def dump(doc: Document) -> list:
+    local_map = doc.local_map()
+    out = []
+
+    def walk(node):
+        if isinstance(node, Token):
+            out.append((node.type, node.lexeme, node.line))
+        elif isinstance(node, list):
+            for n in node:
+                walk(n)
+        elif isinstance(node, (Expr, Stmt)):
+            out.append(type(node).__name__)
+            if node in local_map:
+                out.append(('depth', local_map[node]))
+            for name in type(node).__annotations__:
+                walk(getattr(node, name))
+        else:
+            out.append(node)
+
+    walk(doc.statements())
+    return out
+
+
+class IncrementalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.out = io.StringIO()
+        self.redirect = redirect_stdout(self.out)
+        self.redirect.__enter__()
+
+    def tearDown(self):
+        self.redirect.__exit__(None, None, None)
+        Lox.had_error = False
+
+    def _edit(self, doc: Document, old: str, new: str, nth: int = 0) -> None:
+        start = -1
+        for _ in range(nth + 1):
+            start = doc.source.index(old, start + 1)
+        doc.edit(start, start + len(old), new)
+        fresh = Document(doc.source)
+        self.assertEqual(dump(doc), dump(fresh))
+        self.assertEqual(doc.had_error(), fresh.had_error())
+
+    def test_edits_match_full_parse(self):
+        doc = Document(SOURCE)
+        self._edit(doc, 'a + b', 'a * b')
+        self._edit(doc, 'var c', '\n\n    var d = 1;\n    var c')
+        self._edit(doc, 'return x', 'var y = x; return y')
+        self._edit(doc, '// 注释', '')
+        self._edit(doc, '{\n    var local', 'fun f(){}\n{\n    var local')
+        self._edit(doc, 'total;\n    print', 'total; // print')
+        self._edit(doc, '多\n行', 'one line')
+        self._edit(doc, 'last', 'first')
+        self._edit(doc, 'add', 'addd', 1)
+        self._edit(doc, '}\n\nclass', '\n\nclass')
+        self._edit(doc, '\n\nclass', '}\n\nclass')
+        self._edit(doc, '"one', '"open')
+        self._edit(doc, 'line";', 'line;')
+        self._edit(doc, 'line;', 'line";')
+        self._edit(doc, '', '// 开头\n')
+
+    def test_reuse_untouched_statements(self):
+        doc = Document(SOURCE)
+        before = doc.statements()
+        self._edit(doc, 'this.n = 0', 'this.n = 1')
+        after = doc.statements()
+        self.assertEqual(len(before), len(after))
+        changed = [i for i in range(len(before)) if before[i] is not after[i]]
+        self.assertEqual(changed, [1])
+        # 插入换行后, 后面复用的语句行号也要跟着变
+        self._edit(doc, 'class', '\n\nclass')
+        self.assertIs(doc.statements()[-1], after[-1])
+        self.assertEqual(doc.statements()[-1].name.line, 23)
+
+    def test_errors(self):
+        doc = Document(SOURCE)
+        self._edit(doc, 'var c = a + b;', 'var c = a + ;')
+        self.assertTrue(doc.had_error())
+        self._edit(doc, 'var c = a + ;', 'var c = a + b;')
+        self.assertFalse(doc.had_error())
+        self._edit(doc, 'print local;', 'return local;')
+        self.assertTrue(doc.had_error())
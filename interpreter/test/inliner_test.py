@@ -0,0 +1,80 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.benchmark.inliner_bench import HELPER_SOURCE
+from interpreter.lox import Lox
+from interpreter.utils.ast_printer import AstPrinter
+
+HELPERS = '''
+fun square(x) { return x * x; }
+fun add(a, b) { return a + b; }
+fun first(a, b) { return a; }
+fun getX(p) { return p.x; }
+'''
+
+PROGRAMS = [
+    HELPER_SOURCE.replace('30000', '300'),
+    HELPERS + 'print add(1, 2); print first(1, undefined);',
+    HELPERS + 'print add(nil, undefined);',
+    HELPERS + 'print getX(1) + undefined;',
+    HELPERS + 'fun f() { return square(n); } var n = 3; print f();',
+    HELPERS + 'var i = 0; fun inc() { i = i + 1; return i; } print add(inc(), inc()); print square(i);',
+    HELPERS + 'class A { init() { this.x = 2; } get() { return square(this.x); } } print A().get();',
+]
+
+
+class InlinerTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _tree(self, source: str) -> str:
+        stmts, _ = Lox.compile(HELPERS + source, inline=True)
+        return AstPrinter().build_stmts(stmts[4:])
+
+    def _output(self, source: str, inline: bool, **options) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(source, inline=inline, **options)
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            self.assertEqual(self._output(source, True), self._output(source, False), source)
+
+    def test_lazy_bodies(self):
+        # 还没解析的函数体中可能给任何全局变量赋值, 不内联, 也不能访问空的函数体
+        for source in PROGRAMS:
+            self.assertEqual(self._output(source, True, parse_mode='lazy'), self._output(source, False), source)
+
+    def test_inlined(self):
+        self.assertEqual(self._tree('print add(1, square(2));'), '(print (+ 1.0 (* 2.0 2.0)))')
+        self.assertEqual(self._tree('{ var a = 1; print first(a, 2); }'), '(block (var a 1.0) (print a))')
+        self.assertEqual(self._tree('var p; print getX(p);'), '(var p)\n(print (. p x))')
+        # 可能出错的实参只用到一次, 并且在函数体中可能出错的运算之前求值
+        self.assertEqual(self._tree('print add(-x, -y);'), '(print (+ (- x) (- y)))')
+
+    def test_not_inlined(self):
+        # 调用处在函数声明之前, 函数体内有调用, 函数被重新赋值, 递归
+        cases = [
+            'print later(1); fun later(a) { return a; }',
+            'fun twice(a) { return add(a, a); } print twice(1);',
+            'fun f(a) { return a; } f = nil; print f(1);',
+            'fun fib(n) { return fib(n - 1); } print fib(1);',
+        ]
+        for source in cases:
+            self.assertIn('(call', self._tree(source), source)
+        # 可能出错的实参被丢掉, 重复求值, 或者求值顺序变了
+        self.assertEqual(self._tree('print first(1, x);'), '(print (call first 1.0 x))')
+        self.assertEqual(self._tree('print square(-x);'), '(print (call square (- x)))')
+        self.assertEqual(self._tree('{ var a = 1; print first(a, a + 1); }'),
+                         '(block (var a 1.0) (print (call first a (+ a 1.0))))')
+        self.assertEqual(self._tree('fun g(a, b) { return a.y + b; } print g(-x, -y);'),
+                         '(fun g (a b) (return (+ (. a y) b)))\n(print (call g (- x) (- y)))')
+        self.assertEqual(self._tree('fun sub(a, b) { return b - a; } print sub(-x, -y);'),
+                         '(fun sub (a b) (return (- b a)))\n(print (call sub (- x) (- y)))')
+        # 闭包和方法不内联
+        self.assertIn('(call g', self._tree('{ var k = 1; fun g(a) { return a + k; } print g(1); }'))
@@ -0,0 +1,107 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.interpreter_ import Interpreter
+from interpreter.lazy_parser import LazyParser, LazyFunction
+from interpreter.lox import Lox
+from interpreter.resolver import Resolver
+from interpreter.scanner import Scanner
+from interpreter.stmt import Class
+
+SOURCE = """
+class A {
+    init(x) { this.x = x; }
+    get() { return this.x; }
+}
+class B < A {
+    get() { return super.get() * 2; }
+}
+fun makeCounter() {
+    var i = 0;
+    fun count() {
+        i = i + 1;
+        return i;
+    }
+    return count;
+}
+var counter = makeCounter();
+counter();
+print counter();
+print B(21).get();
+
+var a = "global";
+{
+    fun showA() { print a; }
+    showA();
+    var a = "block";
+    showA();
+}
+"""
+
+
+class LazyParserTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _run(self, source: str, parse_mode: str) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(source, parse_mode=parse_mode)
+        return out.getvalue()
+
+    def test_same_output_as_eager(self):
+        expected = self._run(SOURCE, 'descent')
+        self.assertEqual(expected, '2.0\n42.0\nglobal\nglobal\n')
+        self.assertEqual(self._run(SOURCE, 'lazy'), expected)
+
+    def test_bodies_parsed_on_first_call(self):
+        stmts = LazyParser(Scanner(SOURCE + 'fun unused() { return 1; }').iter_tokens()).parse()
+        make_counter, unused = stmts[2], stmts[-1]
+        self.assertIsInstance(make_counter, LazyFunction)
+        self.assertIsNone(make_counter.body)
+        self.assertEqual(make_counter.tokens[-2].lexeme, '}')
+
+        interpreter = Interpreter()
+        Resolver(interpreter).resolve(stmts)
+        with redirect_stdout(io.StringIO()):
+            interpreter.interpret(stmts)
+        self.assertTrue(make_counter.loaded)
+        self.assertEqual(len(make_counter.body), 3)
+        self.assertFalse(unused.loaded)
+
+    def test_uncalled_body_not_parsed(self):
+        source = 'fun unused() { var = ; } class C { m() { return return; } } print "ok";'
+        self.assertEqual(self._run(source, 'lazy'), 'ok\n')
+        self.assertFalse(Lox.had_error)
+        self.assertFalse(Lox.had_runtime_error)
+
+    def test_unbalanced_braces_reported_up_front(self):
+        output = self._run('print "start"; fun f() { { print 1; }', 'lazy')
+        self.assertEqual(output, "line: 1, at[EOF]: expected '}' after block\n")
+        self.assertTrue(Lox.had_error)
+
+    def test_body_errors_reported_on_call(self):
+        source = 'class C { init() { return 1; } } print "start"; C();'
+        output = self._run(source, 'lazy')
+        self.assertEqual(output, "start\n"
+                                 "line: 1, at[return]: can not return a value from initializer\n"
+                                 "line: 1 at[init]: can not compile function 'init'\n")
+        self.assertTrue(Lox.had_error)
+        self.assertTrue(Lox.had_runtime_error)
+
+    def test_syntax_errors_reported_on_call(self):
+        source = 'fun broken() {\n  print 1;\n  var = ;\n}\nprint "before";\nbroken();'
+        output = self._run(source, 'lazy')
+        self.assertEqual(output, "before\n"
+                                 "line: 3, at[=]: Expect a identifier after var.\n"
+                                 "line: 1 at[broken]: can not compile function 'broken'\n")
+        self.assertTrue(Lox.had_error)
+        self.assertTrue(Lox.had_runtime_error)
+
+    def test_methods_are_lazy(self):
+        stmts = LazyParser(Scanner(SOURCE).iter_tokens()).parse()
+        self.assertIsInstance(stmts[0], Class)
+        self.assertTrue(all(isinstance(m, LazyFunction) for m in stmts[0].methods))
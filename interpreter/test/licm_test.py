@@ -0,0 +1,107 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.benchmark.licm_bench import LOOP_SOURCE
+from interpreter.lox import Lox
+from interpreter.test.compact_ast_test import SOURCE
+from interpreter.utils.ast_printer import AstPrinter
+
+PROGRAMS = [
+    SOURCE,
+    LOOP_SOURCE.replace('300, 200', '30, 20'),
+    # 循环中给变量赋值, 读属性, 调用会修改变量的闭包
+    '''
+    var n = 10;
+    var c = 0;
+    while (c < n - 5) { n = n - 1; c = c + 1; }
+    print c;
+    class Box { init(v) { this.v = v; } }
+    var b = Box(1);
+    var sum = 0;
+    for (var i = 0; i < 5; i = i + 1) { sum = sum + b.v * 2; b.v = b.v + 1; }
+    print sum;
+    var k = 1;
+    fun bump() { k = k + 1; }
+    for (var i = 0; i < 3; i = i + 1) { print k * 10; bump(); }
+    fun make() {
+        var m = 1;
+        fun inc() { m = m + 1; }
+        var out = 0;
+        for (var i = 0; i < 3; i = i + 1) { out = out + m * 100; inc(); }
+        return out;
+    }
+    print make();
+    ''',
+    # 循环中声明的同名变量
+    '''
+    var a = 1;
+    for (var i = 0; i < 3; i = i + 1) { var a = i; print a * 2; }
+    for (var i = 0; i < 3; i = i + 1) { { var a = i; } print a * 2; }
+    ''',
+    # 循环一次都不执行, 不变的表达式求值会出错
+    'var x = nil; while (false == true) print x + 1; print "ok";',
+    'var x = nil; var i = 0; while (i < 2) { i = i + 1; if (i > 1) print x + 1; print i; }',
+    'var i = 0; while (i < 2) { i = i + 1; print undefined * 2; }',
+    # 不变的表达式值是nil
+    'class A {} var a = A(); a.f = nil; var i = 0; while (i < 3) { print a.f; i = i + 1; }',
+    # 每次读方法都绑定出新的函数对象
+    'class P { m() {} } var p = P(); var prev; var i = 0; '
+    'while (i < 3) { var f = p.m; print f == prev; prev = f; i = i + 1; }',
+]
+
+
+class LicmTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _tree(self, source: str) -> str:
+        stmts, _ = Lox.compile(source, hoist=True)
+        return AstPrinter().build_stmts(stmts)
+
+    def _output(self, source: str, hoist: bool) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(source, optimize=hoist, hoist=hoist)
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            self.assertEqual(self._output(source, True), self._output(source, False), source)
+
+    def test_hoisted(self):
+        self.assertEqual(self._tree('var n = 3; var i = 0; while (i < n * 2) i = i + 1;'),
+                         '(var n 3.0)\n(var i 0.0)\n(var $licm1)\n'
+                         '(while (< i (or $licm1 (= $licm1 (* n 2.0)))) (; (= i (+ i 1.0))))')
+
+    def test_not_hoisted(self):
+        for source in [
+            # 循环中被赋值
+            'var n = 3; while (n > 0) { print n * 2; n = n - 1; }',
+            # 循环中声明
+            'while (true) { var n = 1; print n * 2; }',
+            # 有调用时全局变量可能被修改
+            'var n = 1; while (true) { print n * 2; clock(); }',
+            # 读属性: 每次读方法都是新绑定的函数
+            'fun f(p, n) { for (var i = 0; i < n; i = i + 1) print p.x + i; }',
+            # 比较运算的结果可能是false
+            'var n = 1; while (true) print n < 2;',
+        ]:
+            self.assertNotIn('$licm', self._tree(source), source)
+
+    def test_nested_loops(self):
+        # 外层循环不变的表达式提到外层循环外, 只和外层循环变量有关的提到内层循环外
+        tree = self._tree('''
+        fun f(n) {
+            for (var y = 0; y < n; y = y + 1)
+                for (var x = 0; x < n; x = x + 1)
+                    print x + y * 2 + n * 3;
+        }''')
+        self.assertIn('(var $licm1) (while (< y n)', tree)
+        self.assertIn('(var $licm2) (while (< x n)', tree)
+        self.assertIn('(or $licm1 (= $licm1 (* n 3.0)))', tree)
+        self.assertIn('(or $licm2 (= $licm2 (* y 2.0)))', tree)
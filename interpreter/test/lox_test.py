@@ -0,0 +1,60 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+
+SOURCE = open(os.path.join(os.path.dirname(__file__), '..', 'test.lox'), encoding='utf-8').read()
+
+
+class LoxTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _run_file(self, path: str, scan_mode: str) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run_file(path, scan_mode)
+        return out.getvalue()
+
+    def test_run_file_modes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'test.lox')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(SOURCE + '\nprint "多字节" + "字符串";\n')
+            expected = self._run_file(path, 'char')
+            self.assertEqual(expected, '10.0\nhaha\nfalse\n多字节字符串\n')
+            self.assertEqual(self._run_file(path, 'regex'), expected)
+            self.assertEqual(self._run_file(path, 'mmap'), expected)
+
+    def test_run_file_non_ascii_mmap(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'digits.lox')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('var 变量 = 9١;\nprint 变量 + ٢.٥;\nvar x١ = 1; print x١;\n')
+            expected = self._run_file(path, 'char')
+            self.assertEqual(expected, '93.5\n1.0\n')
+            self.assertEqual(self._run_file(path, 'mmap'), expected)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run('print 1;\nprint 2 ½;\n'.encode())
+        self.assertEqual(out.getvalue(), 'line: 2, at[½]: unexpected character\n')
+
+    def test_run_empty_file_mmap(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'empty.lox')
+            open(path, 'w').close()
+            self.assertEqual(self._run_file(path, 'mmap'), '')
+
+    def test_run_parse_modes(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run(SOURCE, parse_mode='descent')
+            Lox.run(SOURCE, parse_mode='pratt')
+            Lox.run(SOURCE, parse_mode='stack')
+        expected = '10.0\nhaha\nfalse\n'
+        self.assertEqual(out.getvalue(), expected * 3)
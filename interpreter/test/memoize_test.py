@@ -0,0 +1,107 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.benchmark.memoize_bench import MEMO_SOURCE
+from interpreter.lox import Lox
+from interpreter.memoize import LruCache, MISSING, memo_key
+
+
+class MemoizeTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _run(self, source: str, **options) -> tuple[str, object]:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            stmts, interpreter = Lox.compile(source, **options)
+            interpreter.interpret(stmts)
+        Lox.had_runtime_error = False
+        return out.getvalue(), interpreter
+
+    def _memo(self, source: str, name: str = 'f', **options):
+        _, interpreter = self._run(source, **options)
+        return interpreter.outermost.lookup(name).memo
+
+    def test_same_output(self):
+        source = MEMO_SOURCE.replace('fib(22)', 'fib(12)').replace('paths(9, 9)', 'paths(4, 4)')
+        self.assertEqual(self._run(source % 'memoize(fib); memoize(paths);')[0], self._run(source % '')[0])
+
+    def test_pure(self):
+        memo = self._memo('''
+        fun sq(x) { return x * x; }
+        fun f(a, b) {
+            var s = 0;
+            for (var i = 0; i < a; i = i + 1) { var t = sq(i); s = s + t; }
+            if (b) return -s;
+            return s + "";
+        }
+        memoize(f);
+        print f(3, true);
+        print f(3, true);
+        print f(3, false);
+        print f(3, nil);
+        print f(3, 1);
+        print f(3, "x");
+        ''')
+        self.assertIsNotNone(memo)
+        # true和1是不同的参数
+        self.assertEqual((memo.hits, memo.misses, len(memo)), (1, 5, 5))
+
+    def test_not_pure(self):
+        for source in [
+            'var g = 1; fun f() { return g; }',
+            'var g = 1; fun f() { g = 2; }',
+            'fun f() { print 1; }',
+            'fun f(o) { return o.x; }',
+            'fun f(o) { o.x = 1; }',
+            'fun f() { fun g() {} return g; }',
+            'fun f() { return clock(); }',
+            'fun h() { print 1; } fun f() { h(); }',
+            'fun f() { return f; }',
+            'var h; fun f() { return h(); }',
+            '{ var a = 1; fun f() { return a; } memoize(f); }',
+        ]:
+            for options in [{}, {'parse_mode': 'lazy'}, {'direct_calls': False}]:
+                _, interpreter = self._run(source + ' memoize(f);', **options)
+                self.assertIsNone(getattr(interpreter.outermost.lookup('f'), 'memo', None), (source, options))
+        # 被重新赋值过的函数, 证明不了调用的是同一个函数
+        for options in [{}, {'parse_mode': 'lazy'}, {'direct_calls': False}]:
+            self.assertIsNone(self._memo('fun h() {} fun f() { return h(); } h = nil; memoize(f);', **options))
+
+    def test_without_direct_calls(self):
+        # 预解析的函数体没有经过bind_direct_calls, 关闭直接绑定时也没有DirectCall, 按全局变量的名字判断
+        source = MEMO_SOURCE.replace('fib(22)', 'fib(12)').replace('paths(9, 9)', 'paths(4, 4)')
+        expected = self._run(source % '')[0]
+        for options in [{'parse_mode': 'lazy'}, {'direct_calls': False},
+                        {'parse_mode': 'lazy', 'direct_calls': False}]:
+            out, interpreter = self._run(source % 'memoize(fib); memoize(paths);', **options)
+            self.assertEqual(out, expected, options)
+            for name in ['fib', 'paths']:
+                memo = interpreter.outermost.lookup(name).memo
+                self.assertIsNotNone(memo, (name, options))
+                self.assertGreater(memo.hits, 0, (name, options))
+
+    def test_uncached_arguments(self):
+        memo = self._memo('class A {} fun f(x) { return x; } memoize(f); print f(A()); print f(A);')
+        self.assertEqual((memo.hits, memo.misses, len(memo)), (0, 0, 0))
+
+    def test_errors_not_cached(self):
+        out, interpreter = self._run('fun f(x) { return -x; } memoize(f); print f(1); print f("a");')
+        self.assertEqual(out, '-1.0\nline: 1 at[-]: Operand must be a number\n')
+        self.assertEqual(len(interpreter.outermost.lookup('f').memo), 1)
+
+    def test_lru(self):
+        cache = LruCache(2)
+        cache.put(memo_key([1.0]), 'a')
+        cache.put(memo_key([2.0]), 'b')
+        self.assertEqual(cache.get(memo_key([1.0])), 'a')
+        cache.put(memo_key([3.0]), 'c')
+        self.assertIs(cache.get(memo_key([2.0])), MISSING)
+        self.assertEqual(cache.get(memo_key([1.0])), 'a')
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 1, 2))
+        self.assertNotEqual(memo_key([0.0]), memo_key([-0.0]))
+        self.assertNotEqual(memo_key([True]), memo_key([1.0]))
+        self.assertIsNone(memo_key([[]]))
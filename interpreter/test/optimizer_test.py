@@ -0,0 +1,105 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.lox import Lox
+from interpreter.test.compact_ast_test import SOURCE
+from interpreter.utils.ast_printer import AstPrinter
+
+PROGRAMS = [
+    SOURCE,
+    '''
+    var a = (1 + 2) * 3 - 4 / 2;
+    print a;
+    print "x" + "y" + 1;
+    print 1 == 1 and "s" != "t";
+    print nil or "default";
+    print false and undefined;
+    if (1 > 2) print "no"; else print "yes";
+    while (false) print "never";
+    fun f(n) {
+        var unused = 10;
+        var side = clock() > 0;
+        var k = n * (2 + 3);
+        return k;
+        print "dead";
+    }
+    print f(2);
+    {
+        var outer = 1;
+        fun g() { return outer; }
+        print g();
+    }
+    ''',
+    'print 1 / 0 == 1;',
+    'print -"x";',
+    'print "a" - 1;',
+    'print !nil == true;',
+]
+
+
+class OptimizerTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _tree(self, source: str) -> str:
+        stmts, _ = Lox.compile(source, optimize=True)
+        return AstPrinter().build_stmts(stmts)
+
+    def _output(self, source: str, optimize: bool) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            try:
+                Lox.run(source, optimize=optimize)
+            except ZeroDivisionError:
+                print('ZeroDivisionError')
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            self.assertEqual(self._output(source, True), self._output(source, False), source)
+
+    def test_constant_folding(self):
+        self.assertEqual(self._tree('print (1 + 2) * -3;'), '(print -9.0)')
+        self.assertEqual(self._tree('print "a" + ("b" + 1);'), '(print "ab1.0")')
+        self.assertEqual(self._tree('print 2 >= 1 == !false;'), '(print true)')
+        self.assertEqual(self._tree('print nil or x;'), '(print x)')
+        self.assertEqual(self._tree('print 0 and x;'), '(print x)')
+        self.assertEqual(self._tree('print false and x;'), '(print false)')
+        # 运行时会出错的表达式不折叠
+        self.assertEqual(self._tree('print (1 / 0);'), '(print (/ 1.0 0.0))')
+        self.assertEqual(self._tree('print -"a";'), '(print (- "a"))')
+        self.assertEqual(self._tree('print true + 1;'), '(print (+ true 1.0))')
+
+    def test_dead_branches(self):
+        self.assertEqual(self._tree('if (1 < 2) print 1; else print 2;'), '(print 1.0)')
+        self.assertEqual(self._tree('if (nil) print 1;'), '')
+        self.assertEqual(self._tree('while (false) print 1; print 2;'), '(print 2.0)')
+        self.assertEqual(self._tree('fun f() { return 1; print 2; }'), '(fun f () (return 1.0))')
+        self.assertEqual(self._tree('while (x) { break; print 1; }'), '(while x (block (break)))')
+
+    def test_dead_stores(self):
+        self.assertEqual(self._tree('{ var a = 1; var b = f(); var c; }'), '(block (; (call f)))')
+        self.assertEqual(self._tree('{ var a = 1; fun g() { return a; } g(); }'),
+                         '(block (var a 1.0) (fun g () (return a)) (; (call g)))')
+        self.assertEqual(self._tree('{ var a = 1; if (false) print a; }'), '')
+        # 全局变量可能被之后的代码用到, 不删除
+        self.assertEqual(self._tree('var a = 1;'), '(var a 1.0)')
+
+    def test_static_errors_in_dead_code(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertIsNone(Lox.compile('if (false) return 1;', optimize=True))
+        self.assertIn('can not return from top level code', out.getvalue())
+
+    def test_lazy_functions_keep_outer_vars(self):
+        source = '{ var a = 1; fun f() { print a; } f(); }'
+        out = io.StringIO()
+        with redirect_stdout(out):
+            stmts, interpreter = Lox.compile(source, parse_mode='lazy', optimize=True)
+            interpreter.interpret(stmts)
+        self.assertEqual(out.getvalue(), '1.0\n')
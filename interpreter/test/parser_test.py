@@ -1 +1,190 @@
-# todo
\ No newline at end of file
+import io
+import unittest
+import weakref
+from contextlib import redirect_stdout
+
+from interpreter.expr import Expr, Grouping, Assign, Unary, Call
+from interpreter.lox import Lox
+from interpreter.parser import Parser
+from interpreter.pratt_parser import PrattParser
+from interpreter.regex_scanner import RegexScanner
+from interpreter.scanner import Scanner
+from interpreter.stack_parser import StackParser
+from interpreter.stmt import Stmt, Block, Print, If
+from interpreter.token_ import Token
+from interpreter.utils.ast_printer import AstPrinter
+
+SOURCE = """
+class A < B {
+    init(x) { this.x = x; }
+    get() { return super.get() + this.x * -2; }
+}
+fun f(a, b) {
+    for (var i = 0; i < a; i = i + 1) {
+        if (i == b or !a and nil) print i; else break;
+    }
+    while (true) { a.b.c = f(1)(2).d; }
+    return;
+}
+var s = "str";
+print (1 + 2) * 3 - 4 / 5 >= 6 != false;
+"""
+
+EXPRESSIONS = [
+    'a = b = c or d and !e == -f(1, g.h)(i).j < 2 + 3 * 4 - 5 / --6;',
+    'x.y.z = -a.b(c) * !!d or (e = f) and g != h >= i;',
+    '1 < 2 < 3 == 4 - 5 - 6 / 7 / 8;',
+    'super.m(this, "s", nil, true, false).n = 1;',
+    'f()()().a.b()(c = d);',
+]
+
+# 解析出错的表达式, 报错信息和恢复后的结果也要一致
+BAD_EXPRESSIONS = [
+    'a + b = c;',
+    '-a = 1; print ;',
+    'print a.;',
+    'f(1, 2;',
+    '(1 + 2;',
+    'a = ;',
+    'print 1 +;',
+    'super;',
+]
+
+
+class ParserTest(unittest.TestCase):
+
+    def _print(self, parser: Parser) -> str:
+        return AstPrinter().build_stmts(parser.parse())
+
+    def test_precedence(self):
+        parser = Parser(Scanner('print (1 + 2) * 3 - 4 / 5 >= 6 != false;').scan_tokens())
+        self.assertEqual(self._print(parser), '(print (!= (>= (- (* (group (+ 1.0 2.0)) 3.0) (/ 4.0 5.0)) 6.0) false))')
+
+    def test_stream_same_as_list(self):
+        from_list = self._print(Parser(Scanner(SOURCE).scan_tokens()))
+        from_stream = self._print(Parser(Scanner(SOURCE).iter_tokens()))
+        self.assertEqual(from_stream, from_list)
+
+    def test_token_table_source(self):
+        from_list = self._print(Parser(Scanner(SOURCE).scan_tokens()))
+        from_table = self._print(Parser(RegexScanner(SOURCE).scan_table()))
+        self.assertEqual(from_table, from_list)
+
+    def test_stream_keeps_bounded_tokens(self):
+        live = weakref.WeakSet()
+        max_live = 0
+
+        def tracked(tokens):
+            nonlocal max_live
+            for token in tokens:
+                live.add(token)
+                max_live = max(max_live, len(live))
+                yield token
+
+        # print和字面量节点不会在语法树中保留token
+        source = 'print (1);\n' * 2000
+        stmts = Parser(tracked(Scanner(source).iter_tokens())).parse()
+        self.assertEqual(len(stmts), 2000)
+        self.assertLessEqual(max_live, 4)
+
+    def _print_with_errors(self, parser_class, source: str) -> tuple[str, str, bool]:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            tree = self._print(parser_class(Scanner(source).iter_tokens()))
+        had_error, Lox.had_error = Lox.had_error, False
+        return tree, out.getvalue(), had_error
+
+    def test_pratt_same_as_descent(self):
+        for source in [SOURCE, *EXPRESSIONS, *BAD_EXPRESSIONS]:
+            expected = self._print_with_errors(Parser, source)
+            self.assertEqual(self._print_with_errors(PrattParser, source), expected, source)
+            self.assertEqual(self._print_with_errors(StackParser, source), expected, source)
+
+    def test_pratt_same_tree_nodes(self):
+        def dump(node):
+            if isinstance(node, list):
+                return [dump(n) for n in node]
+            if isinstance(node, (Expr, Stmt)):
+                return [type(node).__name__, *(dump(getattr(node, name)) for name in type(node).__annotations__)]
+            if isinstance(node, Token):
+                return node.type, node.lexeme, node.line
+            return node
+
+        for source in [SOURCE, *EXPRESSIONS]:
+            expected = dump(Parser(Scanner(source).iter_tokens()).parse())
+            self.assertEqual(dump(PrattParser(Scanner(source).iter_tokens()).parse()), expected, source)
+            self.assertEqual(dump(StackParser(Scanner(source).iter_tokens()).parse()), expected, source)
+
+    def test_stack_parser_nested_errors(self):
+        source = '{ if (a) { while (b) { print (1 + ; } } else print 2; } print 3;'
+        expected = self._print_with_errors(Parser, source)
+        self.assertEqual(self._print_with_errors(StackParser, source), expected)
+
+
+# 嵌套深度远超Python的递归上限
+DEPTH = 100000
+
+
+class DeepNestingTest(unittest.TestCase):
+
+    def _parse(self, source: str) -> list[Stmt]:
+        stmts = StackParser(RegexScanner(source).iter_tokens()).parse()
+        self.assertFalse(Lox.had_error)
+        self.assertEqual(len(stmts), 1)
+        return stmts
+
+    def test_nested_blocks(self):
+        [stmt] = self._parse('{' * DEPTH + 'print 1;' + '}' * DEPTH)
+        for _ in range(DEPTH):
+            self.assertIsInstance(stmt, Block)
+            [stmt] = stmt.statements
+        self.assertIsInstance(stmt, Print)
+
+    def test_else_if_chain(self):
+        [stmt] = self._parse('if (a) print 0;' + ' else if (a) print 1;' * DEPTH)
+        for _ in range(DEPTH):
+            self.assertIsInstance(stmt, If)
+            stmt = stmt.else_branch
+        self.assertIsInstance(stmt, If)
+        self.assertIsNone(stmt.else_branch)
+
+    def test_nested_parentheses(self):
+        [stmt] = self._parse('print ' + '(' * DEPTH + '1' + ')' * DEPTH + ';')
+        expr = stmt.expression
+        for _ in range(DEPTH):
+            self.assertIsInstance(expr, Grouping)
+            expr = expr.expression
+        self.assertEqual(expr.value, 1.0)
+
+    def test_right_nested_expressions(self):
+        [stmt] = self._parse('a = ' * DEPTH + '-!' * DEPTH + 'f(1);')
+        expr = stmt.expression
+        for _ in range(DEPTH):
+            self.assertIsInstance(expr, Assign)
+            expr = expr.value
+        for _ in range(DEPTH * 2):
+            self.assertIsInstance(expr, Unary)
+            expr = expr.right
+        self.assertIsInstance(expr, Call)
+
+    def test_deep_error_recovery(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            StackParser(RegexScanner('{' * DEPTH + 'print ;' + '}' * DEPTH).iter_tokens()).parse()
+        Lox.had_error = False
+        self.assertEqual(out.getvalue().splitlines()[0], 'line: 1, at[;]: expect expression.')
+
+    def test_full_pipeline(self):
+        # 解析不会出错, 但之后的绑定和执行仍是递归的, 太深时报告错误而不是崩溃
+        for parse_mode in ['stack', 'descent']:
+            out = io.StringIO()
+            with redirect_stdout(out):
+                Lox.run('{' * DEPTH + 'print 1;' + '}' * DEPTH, parse_mode=parse_mode)
+            self.assertTrue(Lox.had_error)
+            Lox.had_error = False
+            self.assertEqual(out.getvalue(), 'line: 1, at[EOF]: nesting too deep\n')
+        out = io.StringIO()
+        with redirect_stdout(out):
+            Lox.run('{' * 100 + 'print 1;' + '}' * 100 + 'print ' + '(' * 100 + '2' + ')' * 100 + ';',
+                    parse_mode='stack')
+        self.assertEqual(out.getvalue(), '1.0\n2.0\n')
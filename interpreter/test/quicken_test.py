@@ -0,0 +1,87 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter import quicken
+from interpreter.arena import Arena
+from interpreter.benchmark.quicken_bench import FIB_SOURCE
+from interpreter.expr import Binary
+from interpreter.lox import Lox
+from interpreter.stmt import Function
+from interpreter.test.compact_ast_test import SOURCE
+from interpreter.utils.ast_printer import AstPrinter
+
+PROGRAMS = [
+    SOURCE,
+    FIB_SOURCE.replace('fib(20)', 'fib(10)').replace('20000', '200'),
+    # 同一个节点先后遇到不同类型的操作数
+    '''
+    fun add(a, b) { return a + b; }
+    fun neg(a) { return -a; }
+    fun less(a, b) { return a < b; }
+    print add(1, 2);
+    print add("a", "b");
+    print add(3, 4);
+    print add("a", 1);
+    print neg(1);
+    print less(1, 2);
+    print !nil or false;
+    print nil and 1;
+    print 1 == 1 and 1 != 2;
+    print neg("x");
+    ''',
+    'fun div(a, b) { return a / b; } print div(1, 2); print div(1, 0);',
+]
+
+
+class QuickenTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _run(self, source: str, quicken: bool, **options) -> tuple[str, list]:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            stmts, interpreter = Lox.compile(source, **options)
+            interpreter.quicken = quicken
+            try:
+                interpreter.interpret(stmts)
+            except ZeroDivisionError:
+                print('ZeroDivisionError')
+        Lox.had_runtime_error = False
+        return out.getvalue(), stmts
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            expected, _ = self._run(source, False)
+            self.assertEqual(self._run(source, True)[0], expected, source)
+            self.assertEqual(self._run(source, True, infer=True)[0], expected, source)
+
+    def _body(self, source: str, **options) -> Binary:
+        out, stmts = self._run(source, True, **options)
+        function = next(s for s in stmts if isinstance(s, Function))
+        return function.body[-1].value
+
+    def test_specialize(self):
+        self.assertIs(type(self._body('fun f(a) { return a + 1; } f(1); f(2);')), quicken.NumberAdd)
+        self.assertIs(type(self._body('fun f(a) { return a + "s"; } f("x");')), quicken.StringConcat)
+        self.assertIs(type(self._body('fun f(a) { return a == 1; } f("x");')), quicken.Equal)
+        self.assertIs(type(self._body('fun f(a) { return a and 1; } f(1);')), quicken.And)
+        self.assertIs(type(self._body('fun f(a) { return !a; } f(1);')), quicken.Not)
+        self.assertIs(type(self._body('fun f() { var a = 1; return a * 2; } f();', infer=True)),
+                      quicken.ProvenMultiply)
+        # 没有执行过的节点保持原样
+        self.assertIs(type(self._body('fun f(a) { return a + 1; }')), Binary)
+
+    def test_despecialize(self):
+        expr = self._body('fun f(a) { return a + 1; } f(1); f("s"); f(2);')
+        self.assertIs(type(expr), quicken.GenericBinary)
+
+    def test_other_visitors(self):
+        source = 'fun f(a, b) { return -a * b + 1 < 2 or !b; } print f(1, 2);'
+        expected = AstPrinter().build_stmts(Lox.compile(source)[0])
+        _, stmts = self._run(source, True)
+        self.assertIsInstance(stmts[0].body[0].value, quicken.Or)
+        self.assertEqual(AstPrinter().build_stmts(stmts), expected)
+        self.assertEqual(AstPrinter().build_stmts(Arena.from_tree(stmts, {}).to_tree()[0]), expected)
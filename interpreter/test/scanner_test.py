@@ -1,18 +1,43 @@
+import io
 import unittest
+from contextlib import redirect_stdout
 
+from interpreter.lox import Lox
+from interpreter.regex_scanner import RegexScanner
 from interpreter.scanner import Scanner
 
 
+def bytes_scanner(source: str) -> RegexScanner:
+    return RegexScanner(source.encode())
+
+
+SCANNERS = [Scanner, RegexScanner, bytes_scanner]
+
+
 class ScannerTest(unittest.TestCase):
 
     def _run_test(self, source: str, expected: list[str], debug: bool = False) -> None:
-        scanner = Scanner(source)
-        tokens = scanner.scan_tokens()
-        for i, token in enumerate(tokens):
-            if debug:
-                print(token)
-            else:
-                self.assertEqual(str(token), expected[i])
+        for scanner_class in SCANNERS:
+            scanner = scanner_class(source)
+            tokens = scanner.scan_tokens()
+            self.assertEqual(len(tokens), len(expected))
+            for i, token in enumerate(tokens):
+                if debug:
+                    print(token)
+                else:
+                    self.assertEqual(str(token), expected[i])
+
+    def _scan_with_log(self, scanner_class, source: str) -> tuple[list[tuple], str]:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            tokens = scanner_class(source).scan_tokens()
+        Lox.had_error = False
+        return [(t.type, t.lexeme, t.literal, t.line) for t in tokens], out.getvalue()
+
+    def _assert_same_as_scanner(self, source: str) -> None:
+        expected = self._scan_with_log(Scanner, source)
+        for scanner_class in SCANNERS[1:]:
+            self.assertEqual(self._scan_with_log(scanner_class, source), expected)
 
     def test_single_char_tokens(self):
         source = """
@@ -166,3 +191,62 @@ class ScannerTest(unittest.TestCase):
             'TokenType.EOF EOF None',
         ]
         self._run_test(source, expected, )
+
+    def test_unterminated_string(self):
+        source = """
+            var a = "abc
+            def
+        """
+        tokens, log = self._scan_with_log(Scanner, source)
+        self.assertEqual(log, 'line: 4, at["]: unterminated string\n')
+        self._assert_same_as_scanner(source)
+
+    def test_same_tokens_and_errors(self):
+        source = """
+            // 行号和错误要和逐字符扫描完全一致
+            class A < B {
+                init(x) { this.x = x; }
+                get() { return this.x >= 1.5 and !(2 != 3) or nil; }
+            }
+            var s = "跨
+            两行";
+            print s; $ @ 12.a 7. _a1 变量 # a，b ١٢ é
+            a<=b==c/d*e-f,g;
+            12.34.5
+        """
+        self._assert_same_as_scanner(source)
+        self._assert_same_as_scanner('')
+        self._assert_same_as_scanner('// 没有换行的注释')
+        self._assert_same_as_scanner('print 1;\r\n\tprint 2;   ')
+
+    def test_unicode_characters(self):
+        # 按str.isalpha()/isdigit()判断, 而不是正则的\w和\d
+        for source in ['½', 'Ⅻ', 'x½ Ⅻy', '一二 ٣.٤ 9١ 1.١ 7é a.b½ 1.½ _١ abc١ x.٢', 'print ½ + Ⅻ; var 变量 = 12.5;']:
+            self._assert_same_as_scanner(source)
+        _, log = self._scan_with_log(RegexScanner, '½ Ⅻ')
+        self.assertEqual(log, 'line: 1, at[½]: unexpected character\nline: 1, at[Ⅻ]: unexpected character\n')
+        # isdigit()为真但不是十进制数字, Scanner按数字扫描后float()失败
+        for source in ['²', '3²']:
+            for scanner_class in SCANNERS:
+                with self.assertRaises(ValueError):
+                    scanner_class(source).scan_tokens()
+
+    def test_token_table(self):
+        source = """
+            var 变量 = "两
+            行" + 12.5; // 注释
+            fun f(a) { return a >= 1 and f(a - 1); } $
+            print ½ + x١.٢ + 9١;
+        """
+        expected, expected_log = self._scan_with_log(RegexScanner, source)
+        out = io.StringIO()
+        with redirect_stdout(out):
+            table = RegexScanner(source).scan_table()
+        Lox.had_error = False
+        self.assertEqual(out.getvalue(), expected_log)
+        self.assertEqual([(t.type, t.lexeme, t.literal, t.line) for t in table], expected)
+        # bytes先解码再建表
+        self.assertEqual([(t.type, t.lexeme, t.literal, t.line) for t in bytes_scanner(source).scan_table()], expected)
+        # 同名标识符共享同一个字符串对象
+        names = [table.lexeme(i) for i in range(len(table)) if table.lexeme(i) == 'a']
+        self.assertTrue(all(name is names[0] for name in names))
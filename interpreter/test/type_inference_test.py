@@ -0,0 +1,92 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from interpreter.benchmark.type_inference_bench import NUMERIC_SOURCE
+from interpreter.lox import Lox
+from interpreter.test.compact_ast_test import SOURCE
+from interpreter.utils.ast_printer import AstPrinter
+
+PROGRAMS = [
+    SOURCE,
+    NUMERIC_SOURCE.replace('mandelbrot(60)', 'mandelbrot(10)'),
+    '''
+    fun f(a) {
+        var s = 0;
+        var t = "x";
+        for (var i = 0; i < 3; i = i + 1) { s = s + i * a; t = t + i; }
+        print s;
+        print t;
+        var u = 1;
+        fun g() { u = "changed"; }
+        g();
+        print u + "!";
+    }
+    f(2);
+    f("oops");
+    ''',
+    'print 1 / 0 == 1;',
+    '{ var a = 1; var b = -a; print b - 2 * a < 0; }',
+]
+
+
+class NumberInferenceTest(unittest.TestCase):
+
+    def tearDown(self):
+        Lox.had_error = False
+        Lox.had_runtime_error = False
+
+    def _number_ops(self, source: str, **options) -> set[str]:
+        _, interpreter = Lox.compile(source, infer=True, **options)
+        printer = AstPrinter()
+        return {e.accept(printer) for e in interpreter.number_ops}
+
+    def _output(self, source: str, infer: bool) -> str:
+        out = io.StringIO()
+        with redirect_stdout(out):
+            try:
+                Lox.run(source, infer=infer)
+            except ZeroDivisionError:
+                print('ZeroDivisionError')
+        Lox.had_runtime_error = False
+        return out.getvalue()
+
+    def test_same_output(self):
+        for source in PROGRAMS:
+            self.assertEqual(self._output(source, True), self._output(source, False), source)
+
+    def test_numbers(self):
+        ops = self._number_ops('''
+        fun f(a, b) {
+            var x = a * 2;
+            var y = x;
+            for (var i = 0; i < 10; i = i + 1) y = y + i;
+            return -y + x / b;
+        }''')
+        # 形参的类型不知道, 但 - * / 的结果一定是数字
+        self.assertEqual(ops, {'(+ y i)', '(< i 10.0)', '(+ i 1.0)', '(- y)', '(+ (- y) (/ x b))'})
+
+    def test_not_numbers(self):
+        ops = self._number_ops('''
+        var g = 1;
+        print g + 1;
+        fun f(a) {
+            var s = "s";
+            var n;
+            var m = 1;
+            m = a;
+            print s + 1;
+            print n + 1;
+            print m + 1;
+            print a + 1;
+            print a < 1;
+        }''')
+        self.assertEqual(ops, set())
+
+    def test_closure_assignment(self):
+        source = '{ var u = 1; fun g() { u = "s"; } g(); print u + 1; }'
+        self.assertEqual(self._number_ops(source), set())
+        # 函数体还没解析时, 不知道里面有没有赋值
+        source = '{ var u = 1; fun g() { print u; } print u + 1; }'
+        self.assertEqual(self._number_ops(source), {'(+ u 1.0)'})
+        self.assertEqual(self._number_ops(source, parse_mode='lazy'), set())
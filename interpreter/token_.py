@@ -112,6 +112,8 @@ TokenType.static_init()
 
 
 class Token:
+    # __weakref__: 允许弱引用, 用来检查流式解析时token能否及时释放
+    __slots__ = ('type', 'lexeme', 'literal', 'line', '__weakref__')
     # token类型
     type: TokenType
     # token的文本内容
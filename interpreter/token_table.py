@@ -0,0 +1,73 @@
+import sys
+from array import array
+from typing import Iterator
+
+from interpreter.token_ import Token, TokenType
+
+# TokenType.value -> TokenType, 比调用TokenType(code)快
+TYPE_OF_CODE: dict[int, TokenType] = {t.value: t for t in TokenType}
+
+
+# 紧凑的token表: 每个token只占几个数组槽位, 不创建Token对象
+# 词素和字面量在需要时才从源码中切出来, 标识符统一intern
+class TokenTable:
+    # 源代码
+    source: str
+    # 每个token的类型(TokenType.value)
+    types: array
+    # 每个token在源码中的起止位置 [start, end)
+    starts: array
+    ends: array
+    # 每个token的行号
+    lines: array
+
+    def __init__(self, source):
+        self.source = source
+        self.types = array('H')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.lines = array('I')
+
+    def append(self, type: TokenType, start: int, end: int, line: int) -> None:
+        self.types.append(type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def type_of(self, i: int) -> TokenType:
+        return TYPE_OF_CODE[self.types[i]]
+
+    def line(self, i: int) -> int:
+        return self.lines[i]
+
+    def lexeme(self, i: int) -> str:
+        code = self.types[i]
+        if code == TokenType.EOF.value:
+            return 'EOF'
+        text = self.source[self.starts[i]:self.ends[i]]
+        if code == TokenType.IDENTIFIER.value:
+            return sys.intern(text)
+        return text
+
+    def literal(self, i: int) -> object:
+        code = self.types[i]
+        if code == TokenType.NUMBER.value:
+            return float(self.source[self.starts[i]:self.ends[i]])
+        if code == TokenType.STRING.value:
+            return self.source[self.starts[i] + 1:self.ends[i] - 1]
+        return None
+
+    # 按需构造出完整的Token
+    def token(self, i: int) -> Token:
+        return Token(self.type_of(i), self.lexeme(i), self.literal(i), self.lines[i])
+
+    def __getitem__(self, i: int) -> Token:
+        return self.token(i)
+
+    # Parser只需要一个可迭代的token来源, 所以可以直接 Parser(table)
+    def __iter__(self) -> Iterator[Token]:
+        for i in range(len(self.types)):
+            yield self.token(i)
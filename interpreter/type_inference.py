@@ -0,0 +1,248 @@
+from __future__ import annotations
+import operator
+
+from interpreter.expr import ExprVisitor, Expr, Assign, Binary, Call, Get, Super, Set, Grouping, Literal, Logical, \
+    This, Unary, Variable
+from interpreter.interpreter_ import Interpreter
+from interpreter.lazy_parser import LazyFunction
+from interpreter.stmt import StmtVisitor, Stmt, Block, Class, Expression, Function, Break, Continue, If, Print, \
+    While, Return, Var
+from interpreter.token_ import TokenType, Token
+
+# 结果是数字的运算
+ARITHMETIC = {
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.STAR: operator.mul,
+    TokenType.SLASH: operator.truediv,
+}
+# 操作数必须是数字的比较运算
+COMPARISON = {
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+}
+
+
+# 静态推断哪些表达式的值一定是数字, 操作数都是数字的运算不用再检查类型
+# 一定是数字的表达式: 数字常量, - * / 和取负(操作数不是数字时会报错, 不会得到别的值),
+# 操作数都是数字的 +, 以及读下面这种局部变量
+# 局部变量的初始化表达式和所有给它赋值的表达式都是数字时, 它的值一定是数字
+# 变量之间互相依赖(比如 i = i + 1), 先假设所有变量都是数字, 再不断排除不满足条件的, 直到不再变化
+# 全局变量可以重复声明, 也可能在别处被赋值, 形参的类型取决于调用方, 都不推断
+# 结果写进interpreter.number_ops: 运算节点 -> 不检查类型的Python运算
+class NumberInference(ExprVisitor, StmtVisitor):
+    interpreter: Interpreter
+    # 和Resolver的作用域栈一一对应, 变量名 -> 声明它的Var语句(形参, 函数, 类, this, super为None)
+    scope_stack: list[dict[str, Var | None]]
+    # 局部变量 -> 初始化表达式和所有赋给它的表达式
+    values: dict[Var, list[Expr]]
+    # 读局部变量的节点 -> 声明这个变量的Var语句
+    binding: dict[Variable, Var]
+    # 可能在还没解析的函数体中被赋值的变量
+    unknown: set[Var]
+    # 所有的二元和一元运算
+    operations: list[Binary | Unary]
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.scope_stack = []
+        self.values = {}
+        self.binding = {}
+        self.unknown = set()
+        self.operations = []
+
+    def infer(self, stmts: list[Stmt]) -> list[Stmt]:
+        self._infer_stmts(stmts)
+        numbers = {v for v in self.values if v.initializer is not None and v not in self.unknown}
+        changed = True
+        while changed:
+            changed = False
+            for var in list(numbers):
+                if not all(self._is_number(e, numbers) for e in self.values[var]):
+                    numbers.discard(var)
+                    changed = True
+
+        number_ops = self.interpreter.number_ops
+        for expr in self.operations:
+            if isinstance(expr, Binary):
+                op = ARITHMETIC.get(expr.operator.type) or COMPARISON.get(expr.operator.type)
+                if op is not None and self._is_number(expr.left, numbers) and self._is_number(expr.right, numbers):
+                    number_ops[expr] = op
+            elif expr.operator.type == TokenType.MINUS and self._is_number(expr.right, numbers):
+                number_ops[expr] = operator.neg
+        return stmts
+
+    def _is_number(self, expr: Expr, numbers: set[Var]) -> bool:
+        if isinstance(expr, Literal):
+            return type(expr.value) is float
+        if isinstance(expr, Grouping):
+            return self._is_number(expr.expression, numbers)
+        if isinstance(expr, Unary):
+            return expr.operator.type == TokenType.MINUS
+        if isinstance(expr, Binary):
+            if expr.operator.type == TokenType.PLUS:
+                return self._is_number(expr.left, numbers) and self._is_number(expr.right, numbers)
+            return expr.operator.type in ARITHMETIC
+        if isinstance(expr, Variable):
+            return self.binding.get(expr) in numbers
+        if isinstance(expr, Assign):
+            return self._is_number(expr.value, numbers)
+        return False
+
+    def _infer_stmts(self, stmts: list[Stmt]) -> None:
+        for stmt in stmts:
+            stmt.accept(self)
+
+    def _begin_scope(self) -> None:
+        self.scope_stack.append({})
+
+    def _declare(self, name: Token, var: Var | None = None) -> None:
+        if self.scope_stack:
+            self.scope_stack[-1][name.lexeme] = var
+
+    # 局部变量的声明语句, 全局变量和不是Var声明的返回None
+    def _lookup(self, expr: Expr, name: Token) -> Var | None:
+        depth = self.interpreter.local_map.get(expr)
+        if depth is None:
+            return None
+        return self.scope_stack[len(self.scope_stack) - 1 - depth].get(name.lexeme)
+
+    def _infer_function(self, stmt: Function) -> None:
+        self._begin_scope()
+        for param in stmt.params:
+            self._declare(param)
+        if isinstance(stmt, LazyFunction) and not stmt.loaded:
+            # 函数体还没解析, 外层的变量都可能在里面被赋值
+            for scope in self.scope_stack:
+                self.unknown.update(v for v in scope.values() if v is not None)
+        else:
+            self._infer_stmts(stmt.body)
+        self.scope_stack.pop()
+
+    # 表达式
+
+    def visit_assign(self, expr: Assign) -> object:
+        expr.value.accept(self)
+        var = self._lookup(expr, expr.name)
+        if var is not None:
+            self.values[var].append(expr.value)
+        return None
+
+    def visit_binary(self, expr: Binary) -> object:
+        expr.left.accept(self)
+        expr.right.accept(self)
+        self.operations.append(expr)
+        return None
+
+    def visit_call(self, expr: Call) -> object:
+        expr.callee.accept(self)
+        for a in expr.arguments:
+            a.accept(self)
+        return None
+
+    def visit_get(self, expr: Get) -> object:
+        expr.object.accept(self)
+        return None
+
+    def visit_super(self, expr: Super) -> object:
+        return None
+
+    def visit_set(self, expr: Set) -> object:
+        expr.object.accept(self)
+        expr.value.accept(self)
+        return None
+
+    def visit_grouping(self, expr: Grouping) -> object:
+        expr.expression.accept(self)
+        return None
+
+    def visit_literal(self, expr: Literal) -> object:
+        return None
+
+    def visit_logical(self, expr: Logical) -> object:
+        expr.left.accept(self)
+        expr.right.accept(self)
+        return None
+
+    def visit_this(self, expr: This) -> object:
+        return None
+
+    def visit_unary(self, expr: Unary) -> object:
+        expr.right.accept(self)
+        self.operations.append(expr)
+        return None
+
+    def visit_variable(self, expr: Variable) -> object:
+        var = self._lookup(expr, expr.name)
+        if var is not None:
+            self.binding[expr] = var
+        return None
+
+    # 语句
+
+    def visit_block(self, stmt: Block) -> object:
+        self._begin_scope()
+        self._infer_stmts(stmt.statements)
+        self.scope_stack.pop()
+        return None
+
+    def visit_class(self, stmt: Class) -> object:
+        self._declare(stmt.name)
+        if stmt.super_class is not None:
+            stmt.super_class.accept(self)
+            self._begin_scope()
+            self.scope_stack[-1]['super'] = None
+        self._begin_scope()
+        self.scope_stack[-1]['this'] = None
+        for m in stmt.methods:
+            self._infer_function(m)
+        self.scope_stack.pop()
+        if stmt.super_class is not None:
+            self.scope_stack.pop()
+        return None
+
+    def visit_expression(self, stmt: Expression) -> object:
+        stmt.expression.accept(self)
+        return None
+
+    def visit_function(self, stmt: Function) -> object:
+        self._declare(stmt.name)
+        self._infer_function(stmt)
+        return None
+
+    def visit_break(self, stmt: Break) -> object:
+        return None
+
+    def visit_continue(self, stmt: Continue) -> object:
+        return None
+
+    def visit_if(self, stmt: If) -> object:
+        stmt.condition.accept(self)
+        stmt.then_branch.accept(self)
+        if stmt.else_branch is not None:
+            stmt.else_branch.accept(self)
+        return None
+
+    def visit_print(self, stmt: Print) -> object:
+        stmt.expression.accept(self)
+        return None
+
+    def visit_while(self, stmt: While) -> object:
+        stmt.condition.accept(self)
+        stmt.body.accept(self)
+        return None
+
+    def visit_return(self, stmt: Return) -> object:
+        if stmt.value is not None:
+            stmt.value.accept(self)
+        return None
+
+    def visit_var(self, stmt: Var) -> object:
+        if stmt.initializer is not None:
+            stmt.initializer.accept(self)
+        if self.scope_stack:
+            self.values[stmt] = [] if stmt.initializer is None else [stmt.initializer]
+        self._declare(stmt.name, stmt)
+        return None
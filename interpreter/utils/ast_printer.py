@@ -1,30 +1,113 @@
-from interpreter.expr import ExprVisitor, Unary, Literal, Grouping, Binary, Expr
+from __future__ import annotations
+from interpreter.expr import ExprVisitor, Unary, Literal, Grouping, Binary, Expr, Assign, Call, Get, Super, Set, \
+    Logical, This, Variable
+from interpreter.stmt import StmtVisitor, Stmt, Block, Class, Expression, Function, Break, Continue, If, Print, While, \
+    Return, Var
 
-# todo
-class AstPrinter(ExprVisitor):
-    def build(self, expr: Expr) -> str:
-        return str(expr.accept(self))
+
+# 把语法树打印成lisp风格的字符串, 也用来在测试里比较两棵树是否相同
+class AstPrinter(ExprVisitor, StmtVisitor):
+    def build(self, node: Expr | Stmt) -> str:
+        # 解析出错的语句会是None
+        if node is None:
+            return 'None'
+        return str(node.accept(self))
+
+    def build_stmts(self, stmts: list[Stmt]) -> str:
+        return '\n'.join(self.build(s) for s in stmts)
+
+    def visit_assign(self, expr: Assign) -> object:
+        return self.parenthesize('=', expr.name.lexeme, expr.value)
 
     def visit_binary(self, expr: Binary) -> object:
         return self.parenthesize(expr.operator.lexeme, expr.left, expr.right)
 
+    def visit_call(self, expr: Call) -> object:
+        return self.parenthesize('call', expr.callee, *expr.arguments)
+
+    def visit_get(self, expr: Get) -> object:
+        return self.parenthesize('.', expr.object, expr.name.lexeme)
+
+    def visit_super(self, expr: Super) -> object:
+        return self.parenthesize('super', expr.method.lexeme)
+
+    def visit_set(self, expr: Set) -> object:
+        return self.parenthesize('set', expr.object, expr.name.lexeme, expr.value)
+
     def visit_grouping(self, expr: Grouping) -> object:
-        return self.build(expr.expression)
+        return self.parenthesize('group', expr.expression)
 
     def visit_literal(self, expr: Literal) -> object:
         if expr.value is None:
             return 'nil'
+        if isinstance(expr.value, bool):
+            return str(expr.value).lower()
+        if isinstance(expr.value, str):
+            return f'"{expr.value}"'
         return str(expr.value)
 
+    def visit_logical(self, expr: Logical) -> object:
+        return self.parenthesize(expr.operator.lexeme, expr.left, expr.right)
+
+    def visit_this(self, expr: This) -> object:
+        return 'this'
+
     def visit_unary(self, expr: Unary) -> object:
         return self.parenthesize(expr.operator.lexeme, expr.right)
 
-    def parenthesize(self, name: str, *exprs) -> str:
+    def visit_variable(self, expr: Variable) -> object:
+        return expr.name.lexeme
+
+    def visit_block(self, stmt: Block) -> object:
+        return self.parenthesize('block', *stmt.statements)
+
+    def visit_class(self, stmt: Class) -> object:
+        parts = [stmt.name.lexeme]
+        if stmt.super_class is not None:
+            parts += ['<', stmt.super_class]
+        return self.parenthesize('class', *parts, *stmt.methods)
+
+    def visit_expression(self, stmt: Expression) -> object:
+        return self.parenthesize(';', stmt.expression)
+
+    def visit_function(self, stmt: Function) -> object:
+        params = '(' + ' '.join(p.lexeme for p in stmt.params) + ')'
+        return self.parenthesize('fun', stmt.name.lexeme, params, *stmt.body)
+
+    def visit_break(self, stmt: Break) -> object:
+        return '(break)'
+
+    def visit_continue(self, stmt: Continue) -> object:
+        return '(continue)'
+
+    def visit_if(self, stmt: If) -> object:
+        if stmt.else_branch is None:
+            return self.parenthesize('if', stmt.condition, stmt.then_branch)
+        return self.parenthesize('if', stmt.condition, stmt.then_branch, stmt.else_branch)
+
+    def visit_print(self, stmt: Print) -> object:
+        return self.parenthesize('print', stmt.expression)
+
+    def visit_while(self, stmt: While) -> object:
+        return self.parenthesize('while', stmt.condition, stmt.body)
+
+    def visit_return(self, stmt: Return) -> object:
+        if stmt.value is None:
+            return '(return)'
+        return self.parenthesize('return', stmt.value)
+
+    def visit_var(self, stmt: Var) -> object:
+        if stmt.initializer is None:
+            return self.parenthesize('var', stmt.name.lexeme)
+        return self.parenthesize('var', stmt.name.lexeme, stmt.initializer)
+
+    # 字符串原样输出, 节点递归打印
+    def parenthesize(self, name: str, *parts) -> str:
         ret = '('
         ret += name
-        for expr in exprs:
+        for part in parts:
             ret += ' '
-            ret += expr.accept(self)
+            ret += part if isinstance(part, str) else self.build(part)
 
         return ret + ')'
 
@@ -33,10 +116,10 @@ if __name__ == '__main__':
     from interpreter.parser import Parser
     from interpreter.scanner import Scanner
 
-    scanner = Scanner("((1 + 2) * (-3)) + 4 / 2")
+    scanner = Scanner("print ((1 + 2) * (-3)) + 4 / 2;")
     tokens = scanner.scan_tokens()
     print(tokens)
     parser = Parser(tokens)
-    expr = parser.parse()
+    stmts = parser.parse()
 
-    print(AstPrinter().build(expr))
+    print(AstPrinter().build_stmts(stmts))
@@ -1,7 +1,7 @@
 TAB_TEXT = '    '
 
 
-def define_ast(base_classname: str, types: list[str]) -> str:
+def define_ast(base_classname: str, types: list[str], imports: str = '') -> str:
     import datetime
     types_text = ''
     visitor_methods_text = ''
@@ -11,21 +11,28 @@ def define_ast(base_classname: str, types: list[str]) -> str:
         visitor_methods_text += define_visitor(base_classname, classname.strip())
 
     gen_date = datetime.datetime.strftime(datetime.datetime.now(), '%Y-%m-%d %H:%M:%S')
-    ast = f"""
-# generate time: {gen_date}
+    ast = f"""# generate time: {gen_date}
 from __future__ import annotations
 from abc import abstractmethod, ABCMeta
+{imports}
 from interpreter.token_ import Token
 
+
+# 节点类都用__slots__, 没有每个实例的__dict__, 大脚本的语法树能省一半内存
+# 子类(比如LazyFunction)不声明__slots__时仍然可以加属性
 class {base_classname}(metaclass=ABCMeta):
+    __slots__ = ()
+    # 子节点和token等字段的名字, 按构造函数参数的顺序; 遍历语法树的代码按它取字段
+    # 特化的子类(见quicken)和LazyFunction不加字段, 直接继承
+    FIELDS: tuple[str, ...] = ()
+
     @abstractmethod
     def accept(self, visitor: {base_classname}Visitor) -> object:
         pass
 
+
 class {base_classname}Visitor(metaclass=ABCMeta):
-{visitor_methods_text}
-{types_text}
-    """
+{visitor_methods_text}{types_text}"""
 
     return ast
 
@@ -35,7 +42,7 @@ def define_visitor(base_classname: str, classname: str) -> str:
     @abstractmethod
     def visit_{classname.lower()}(self, {base_classname.lower()}: {classname}) -> object:
         pass
-    """
+"""
     return ast
 
 
@@ -43,28 +50,34 @@ def define_type(base_classname: str, classname: str, fields_desc: str) -> str:
     fields = fields_desc.strip().split(',')
 
     fields_text = ''
+    slots_text = ''
     init_params_text = ''
     init_body_text = ''
 
     for f in fields:
         f = f.strip()
         if f == '':
-            init_body_text = f'{TAB_TEXT}{TAB_TEXT}pass'
+            init_body_text = f'{TAB_TEXT}{TAB_TEXT}pass\n'
             continue
         type, name = f.split(' ')
 
         fields_text += f'{TAB_TEXT}{name}: {type}\n'
+        slots_text += f"'{name}', "
         init_params_text += f'{name}: {type}, '
         init_body_text += f'{TAB_TEXT}{TAB_TEXT}self.{name} = {name}\n'
 
+    # 字段只有注解没有赋值, 不会和__slots__中的描述符冲突
     ast = f"""
+
 class {classname}({base_classname}):
+    __slots__ = ({slots_text})
+    FIELDS = __slots__
 {fields_text}
     def __init__(self, {init_params_text}):
 {init_body_text}
     def accept(self, visitor: {base_classname}Visitor) -> object:
         return visitor.visit_{classname.lower()}(self)
-    """
+"""
     return ast
 
 
@@ -86,7 +99,6 @@ if __name__ == '__main__':
     ])
 
     path = '../expr.py'
-    print(ast)
     with open(path, 'w') as f:
         f.write(ast)
 
@@ -103,11 +115,10 @@ if __name__ == '__main__':
         "While      : Expr condition, Stmt body",
         "Return     : Token keyword, Expr value",
         "Var        : Token name, Expr initializer",
-    ])
+    ], imports='\nfrom interpreter.expr import Expr, Variable')
 
     path = '../stmt.py'
-
-    # with open(path, 'w') as f:
-    #     f.write(ast)
+    with open(path, 'w') as f:
+        f.write(ast)
 
     print('ok!!')